@@ -5,7 +5,7 @@ from src.docker_client import DockerClient, ContainerLabels
 from src.ecr_registry_private import EcrRegistryPrivate
 from src.enums import ImageRegistryType, RunContainerAsUser, VALID_DOCKER_NETWORK_MODES, \
     DEFAULT_DOCKER_NETWORK_MODE, PropNames, DEFAULT_POOL, BridgeContainerName
-from src.lib.tc_api_client import TableauCloudLogin, TCApiClient
+from src.lib.tc_api_client import TableauCloudLogin, TCApiClient, TC_SESSION_CACHE
 from src.models import LoggerInterface, AppSettings
 from src.token_loader import TokenLoader
 
@@ -17,33 +17,40 @@ class BridgeContainerRunner:
         self.token: models.PatToken = token
         self.docker_client = DockerClient(self.logger)
 
-    def run_bridge_container_in_docker(self, app: AppSettings = None):
+    def resolve_local_image_id(self, app: AppSettings):
+        """ the local id of the selected bridge image, pulled first when the registry is ECR. None if unavailable """
+        if app.img_registry_type == ImageRegistryType.aws_ecr:
+            reg = EcrRegistryPrivate(self.logger, app.ecr_private_aws_account_id, app.ecr_private_repository_name, app.aws_region, app.aws_profile)
+            local_image_id = reg.pull_image_stream(app.selected_remote_image_tag, False, None)
+            if not local_image_id:
+                self.logger.info(f"unable to pull image from ecr.")
+            return local_image_id
+        img = self.docker_client.get_image_details(app.selected_image_tag)
+        if not img:
+            self.logger.info(f"Local Bridge image named {app.selected_image_tag} is missing. Please Build first.")
+            return None
+        return img.short_id
+
+    def run_bridge_container_in_docker(self, app: AppSettings = None, local_image_id: str = None):
+        """ local_image_id can be passed in when starting many containers, so the image is resolved once """
         req = self.req
         # STEP - Fill in user_email if not present
         if not self.token.user_email:
-            login_result = TableauCloudLogin.login(self.token, True)
-            api = TCApiClient(login_result)
+            login_result = TC_SESSION_CACHE.login(self.token, True)
+            api = TCApiClient(login_result, self.token)
             get_or_fetch_site_id(api, self.token, self.logger)
 
         # STEP - Validate input
         if not self.validate_input():
             return
 
-        if app.img_registry_type == ImageRegistryType.aws_ecr:
-            reg = EcrRegistryPrivate(self.logger, app.ecr_private_aws_account_id, app.ecr_private_repository_name, app.aws_region, app.aws_profile)
-            local_image_id = reg.pull_image_stream(app.selected_remote_image_tag, False, None)
+        if not local_image_id:
+            local_image_id = self.resolve_local_image_id(app)
             if not local_image_id:
-                self.logger.info(f"unable to pull image from ecr.")
-                return
-        else:
-            img = self.docker_client.get_image_details(app.selected_image_tag)
-            if not img:
-                self.logger.info(f"Local Bridge image named {app.selected_image_tag} is missing. Please Build first.")
                 return
-            else:
-                local_image_id = img.short_id
         # STEP - check that PAT token is valid
         login_result = TableauCloudLogin.is_token_valid(self.token)
+        TC_SESSION_CACHE.release(self.token) # the bridge agent will sign in with this PAT, which would end any session we hold
         if not login_result.is_success:
             self.logger.error(f"INVALID: PAT token {self.token.name} is not valid, please select a valid Personal Access Token name+secret")
             return
@@ -1,13 +1,21 @@
+import hashlib
+import json
 import os
 import re
-import shutil
+import threading
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import List
 
+from src.enums import SCRATCH_DIR
 from src.page.ui_lib.stream_logger import StreamLogger
 from src.models import BridgeRpmSource
 
+JSON_LOG_WINDOW_ROWS = 50000 # most recent matching rows shown on the Logs page
+LOG_DIR_INDEX_PATH = SCRATCH_DIR / "log_dir_index"
+LOG_DIR_INDEX_VERSION = 1
+
 
 class LogSourceType:
     docker = "docker"
@@ -35,15 +43,19 @@ class LogSourceType:
 
 @dataclass
 class BridgeLogFile:
-    def __init__(self, full_path: str):
+    def __init__(self, full_path: str, mod_time: float = None, size: int = None):
+        """ mod_time and size can be passed in from an existing stat, e.g. of a DirEntry, otherwise the file is stat'ed """
         self.name = os.path.basename(full_path)
         self.full_path = full_path
-        self.mod_time = os.path.getmtime(full_path)
+        if mod_time is None or size is None:
+            st = os.stat(full_path)
+            mod_time, size = st.st_mtime, st.st_size
+        self.mod_time = mod_time
         prefix = self.name.split("_")[0]
         if prefix == "TabBridgeCliJob":
             prefix = self.name.split("_")[0] + "_" + self.name.split("_")[1]
         self.prefix = prefix
-        self.size = os.path.getsize(full_path)
+        self.size = size
         self.content_type = self.set_content_type(self.name)
 
     name: str
@@ -54,6 +66,7 @@ class BridgeLogFile:
     content_type: str = None # ContentTypes
 
     def set_content_type(self, filename: str):
+        filename = filename.removesuffix(".gz") # archived logs
         if filename.startswith("jprotocolserver"):
             return ContentType.txt
         if filename.endswith(".log"):
@@ -84,9 +97,84 @@ class ContentType:
     unknown = "unknown"
 
 
+@dataclass
+class JsonLogScan:
+    df: object = None # pandas DataFrame with the most recent matching rows, oldest first
+    total_rows: int = 0
+    matched_rows: int = 0
+    severities: set = field(default_factory=set)
+    keys: set = field(default_factory=set)
+
+
 class BridgeLogs:
     number_log_files_to_keep = 10
 
+    @staticmethod
+    def scan_json_log(path: str, severity: str = None, keys: List[str] = None, search_text: str = None,
+                      window_rows: int = JSON_LOG_WINDOW_ROWS) -> JsonLogScan:
+        """
+        Filters a JSON lines log, parsed once into a parquet snapshot by PARSED_LOG_CACHE, and returns the last
+        window_rows matching rows with sev and k as categoricals. The snapshot is read newest first one row group at a
+        time: all columns until the window is full, then only the filtered columns to count the matches, so memory
+        stays proportional to the window. severity and search_text are case-insensitive regular expressions, like the
+        pandas str.contains filters they replace. The distinct severities and keys of the whole file come from the
+        snapshot state, for the filter options.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        from src.lib.parsed_log_cache import PARSED_LOG_CACHE, PARSED_LOG_COLUMNS
+        with PARSED_LOG_CACHE.open_snapshot(path) as snapshot:
+            state = snapshot.state
+            scan = JsonLogScan(total_rows=state.rows, severities=set(state.severities), keys=set(state.keys))
+            filter_columns = (["sev"] if severity else []) + (["k"] if keys else []) + (["v", "e"] if search_text else [])
+            window, window_count = [], 0 # row groups newest first
+            for _, read in snapshot.iter_row_groups(reverse=True):
+                if window_count >= window_rows and not filter_columns:
+                    scan.matched_rows = state.rows # nothing is filtered, the rest of the log doesn't need to be read
+                    break
+                if window_count >= window_rows:
+                    mask = BridgeLogs._json_log_mask(read(filter_columns), severity, keys, search_text)
+                    scan.matched_rows += pc.sum(mask).as_py() or 0
+                    continue
+                table = read(PARSED_LOG_COLUMNS)
+                if filter_columns:
+                    table = table.filter(BridgeLogs._json_log_mask(table, severity, keys, search_text))
+                scan.matched_rows += table.num_rows
+                window.append(table)
+                window_count += table.num_rows
+        table = pa.concat_tables(window[::-1]) if window else PARSED_LOG_CACHE.empty_table()
+        table = table.slice(max(table.num_rows - window_rows, 0))
+        table = table.select([c for c in table.column_names if table[c].null_count < table.num_rows]) # like read_json, no all-empty columns
+        scan.df = table.to_pandas()
+        return scan
+
+    @staticmethod
+    def _json_log_mask(table, severity: str, keys: List[str], search_text: str):
+        """ rows matching all given filters, nulls (missing values) don't match """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        masks = []
+        if severity:
+            masks.append(BridgeLogs._match_text(table["sev"].cast(pa.string()), severity))
+        if keys:
+            masks.append(pc.is_in(table["k"].cast(pa.string()), value_set=pa.array(keys, pa.string())))
+        if search_text:
+            masks.append(pc.or_kleene(BridgeLogs._match_text(table["v"], search_text), BridgeLogs._match_text(table["e"], search_text)))
+        mask = pc.fill_null(masks[0], False)
+        for m in masks[1:]:
+            mask = pc.and_(mask, pc.fill_null(m, False))
+        return mask
+
+    @staticmethod
+    def _match_text(column, pattern: str):
+        """ case-insensitive regular expression search, text that is not a valid expression is matched literally """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        try:
+            return pc.match_substring_regex(column, pattern, ignore_case=True)
+        except pa.ArrowInvalid:
+            return pc.match_substring(column, pattern, ignore_case=True)
+
     @staticmethod
     def list_log_files(path: str, include_pattern: str = None) -> List[BridgeLogFile]:
         """
@@ -99,12 +187,12 @@ class BridgeLogs:
         """
         pattern = re.compile(include_pattern) if include_pattern else None
         log_files = []
-        for item_name in os.listdir(path):
-            full_path = os.path.join(path, item_name)
-            if os.path.isfile(full_path) and not item_name.startswith("."):
-                if not pattern or pattern.search(item_name):
-                    lf = BridgeLogFile(full_path)
-                    log_files.append(lf)
+        with os.scandir(path) as entries:
+            for entry in entries: # is_file() uses the directory entry type and stat() is cached, one stat per file
+                if entry.is_file() and not entry.name.startswith("."):
+                    if not pattern or pattern.search(entry.name):
+                        st = entry.stat()
+                        log_files.append(BridgeLogFile(entry.path, st.st_mtime, st.st_size))
         log_files.sort(key=lambda x: x.name.lower())
         return log_files
 
@@ -128,41 +216,98 @@ class BridgeLogs:
 
     @staticmethod
     def archive_log_files(logger: StreamLogger, log_folder: str, groups: dict):
-        archive_subdir = "archive_logs"
-        archive_path = os.path.join(log_folder, archive_subdir)
-        if not os.path.exists(archive_path):
-            os.mkdir(archive_path)
-        # archive all but the newest N files from each group
-        count_archived = 0
-        for prefix, files in groups.items():
-            files = files[BridgeLogs.number_log_files_to_keep:]
-            for f in files:
-                try:
-                    shutil.move(f.full_path, os.path.join(archive_path, f.name))
-                except Exception as ex:
-                    logger.warning(str(ex))
-                count_archived += 1
-        return count_archived, archive_path
+        """ archives all but the newest N files (by modified date) from each group, compressed in the background by LOG_ARCHIVE """
+        from src.task.log_archive_task import LOG_ARCHIVE
+        files = []
+        for prefix, group_files in groups.items():
+            group_files = sorted(group_files, key=lambda x: x.mod_time, reverse=True)
+            files += group_files[BridgeLogs.number_log_files_to_keep:]
+        return LOG_ARCHIVE.archive_files(logger, log_folder, files)
 
     @staticmethod
     def archive_log_files_by_date(logger: StreamLogger, log_folder, log_files: List[BridgeLogFile], number_to_archive: int):
-        archive_subdir = "archive_logs"
+        """ archives the oldest number_to_archive files, compressed in the background by LOG_ARCHIVE """
+        from src.task.log_archive_task import LOG_ARCHIVE
         log_files.sort(key=lambda x: x.mod_time)
+        return LOG_ARCHIVE.archive_files(logger, log_folder, log_files[:number_to_archive])
+
 
-        archive_path = os.path.join(log_folder, archive_subdir)
-        if not os.path.exists(archive_path):
-            os.mkdir(archive_path)
-        # archive all but the newest N files from each group
-        count = 0
-        for f in log_files:
+class LogDirectoryListing:
+    def __init__(self, path: str, dir_mtime_ns: int, files: List[BridgeLogFile]):
+        self.path = path
+        self.dir_mtime_ns = dir_mtime_ns
+        self.files = files # sorted by name
+        self.groups = BridgeLogs.group_files_by_prefix(files, True)
+
+    def latest_per_group(self) -> List[BridgeLogFile]:
+        return [items[0] for items in self.groups.values()]
+
+    def filter(self, include_pattern: str) -> List[BridgeLogFile]:
+        pattern = re.compile(include_pattern)
+        return [f for f in self.files if pattern.search(f.name)]
+
+
+class LogDirectoryIndex:
+    """
+    Listings of log folders with precomputed prefix groups, kept in memory and in a json file per folder so they
+    survive restarts. A folder is only re-scanned when its mtime changes (a file was added, removed or renamed),
+    otherwise only the newest file of each group, the one the bridge is writing to, is stat'ed again.
+    """
+    def __init__(self, index_dir=LOG_DIR_INDEX_PATH):
+        self.index_dir = Path(index_dir)
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def get_listing(self, path: str) -> LogDirectoryListing:
+        path = os.path.abspath(path)
+        dir_mtime_ns = os.stat(path).st_mtime_ns
+        with self._lock:
+            listing = self._listings.get(path) or self._load(path)
+            if listing and listing.dir_mtime_ns == dir_mtime_ns and self._refresh_latest(listing):
+                self._listings[path] = listing
+                return listing
+            listing = LogDirectoryListing(path, dir_mtime_ns, BridgeLogs.list_log_files(path))
+            self._listings[path] = listing
+            self._save(listing)
+            return listing
+
+    @staticmethod
+    def _refresh_latest(listing: LogDirectoryListing) -> bool:
+        """ returns False if a file is gone, then the listing needs a re-scan """
+        for items in listing.groups.values():
+            latest = items[0]
             try:
-                shutil.move(f.full_path, os.path.join(archive_path, f.name))
-            except Exception as ex:
-                logger.warning(str(ex))
-            count += 1
-            if number_to_archive == count:
-                break
-        return count, archive_path
+                st = os.stat(latest.full_path)
+            except FileNotFoundError:
+                return False
+            latest.mod_time, latest.size = st.st_mtime, st.st_size
+        return True
+
+    def _index_file(self, path: str):
+        return self.index_dir / f"{hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]}.json"
+
+    def _load(self, path: str):
+        try:
+            with open(self._index_file(path)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != LOG_DIR_INDEX_VERSION or data.get("path") != path:
+            return None
+        files = [BridgeLogFile(os.path.join(path, name), mod_time, size) for name, mod_time, size in data["files"]]
+        return LogDirectoryListing(path, data["dir_mtime_ns"], files)
+
+    def _save(self, listing: LogDirectoryListing):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        data = {"version": LOG_DIR_INDEX_VERSION, "path": listing.path, "dir_mtime_ns": listing.dir_mtime_ns,
+                "files": [[f.name, f.mod_time, f.size] for f in listing.files]}
+        tmp_file = f"{self._index_file(listing.path)}.part"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self._index_file(listing.path))
+
+
+LOG_DIRECTORY_INDEX = LogDirectoryIndex()
 
 
 class BridgeContainerLogsPath:
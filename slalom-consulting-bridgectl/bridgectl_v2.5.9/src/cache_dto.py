@@ -1,4 +1,9 @@
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
+
 import yaml
 from dataclasses import dataclass, asdict, field
 from datetime import datetime
@@ -65,3 +70,88 @@ class CacheManagerEcrImageList:
                 sort_keys=False
             )
 
+
+class JobStatus:
+    completed = "Completed" # sent to bridge
+    bridge_extraction_completed = "BridgeExtractionCompleted"
+    failed = "Failed"
+    pending = "Pending"
+    in_progress = "InProgress"
+    terminal = (completed, bridge_extraction_completed, failed)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    entries: int = 0
+
+
+class JobDetailCache:
+    """
+    On-disk LRU cache of getBackgroundJobExtendedInfo results keyed by jobId. Jobs in a terminal status never change, so
+    they are never re-fetched. Pending and in progress jobs are re-fetched after ttl_seconds, or as soon as their status changes.
+    """
+    _cache_path = SCRATCH_DIR / "jobs_cache.json"
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries = None # OrderedDict, loaded on first use, least recently used first
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        if not os.path.exists(self._cache_path):
+            return
+        try:
+            with open(self._cache_path, 'r') as f:
+                self._entries.update(json.load(f))
+        except (ValueError, OSError) as ex:
+            print(f"Warning. ignoring unreadable job detail cache {self._cache_path}. {ex}")
+
+    def _is_fresh(self, entry: dict, status: str) -> bool:
+        if entry["status"] != status:
+            return False
+        return status in JobStatus.terminal or time.time() - entry["fetched"] < self.ttl_seconds
+
+    def get(self, job_id: str, status: str) -> Optional[dict]:
+        with self._lock:
+            self._load()
+            entry = self._entries.get(job_id)
+            if entry and self._is_fresh(entry, status):
+                self._entries.move_to_end(job_id)
+                self.stats.hits += 1
+                return entry["detail"]
+            self.stats.misses += 1
+            return None
+
+    def put(self, job_id: str, status: str, detail: dict):
+        with self._lock:
+            self._load()
+            self._entries[job_id] = {"status": status, "fetched": time.time(), "detail": detail}
+            self._entries.move_to_end(job_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        with self._lock:
+            if self._entries is None:
+                return
+            SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = f"{self._cache_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self._cache_path)
+
+    def get_stats(self) -> CacheStats:
+        with self._lock:
+            self._load()
+            self.stats.entries = len(self._entries)
+            return CacheStats(self.stats.hits, self.stats.misses, self.stats.entries)
+
+
+JOB_DETAIL_CACHE = JobDetailCache()
@@ -0,0 +1,161 @@
+"""
+Micro-benchmarks for the hot paths of bridgectl. Run from the bridgectl folder:
+    python -m src.cli.benchmarks job_parsing
+    python -m src.cli.benchmarks docker_client
+    python -m src.cli.benchmarks disk_usage
+    python -m src.cli.benchmarks container_inventory
+"""
+import re
+import sys
+import time
+
+from tabulate import tabulate
+
+from src.cli.bridge_status_logic import BridgeStatusLogic
+
+JOB_PARSING_SIZES = [10_000, 100_000]
+DOCKER_CLIENT_CALLS = 50
+
+
+class _NullLogger:
+    def info(self, msg): pass
+    def warning(self, msg): pass
+    def error(self, msg): pass
+
+
+def make_synthetic_jobs(count: int) -> dict:
+    jobs = []
+    for i in range(count):
+        if i % 4 == 3:
+            description = f"Bridge Client: agent-{i % 25} Failed to refresh data source: Sales Extract {i % 300} due to a timeout"
+        else:
+            description = f"Bridge Client: agent-{i % 25} refreshing datasource: Sales Extract {i % 300}"
+        jobs.append({"jobId": str(i), "status": "Completed", "jobDescription": description})
+    return {"result": {"backgroundJobs": jobs}}
+
+
+def _parse_jobs_loop(jobs: dict):
+    """ the previous implementation, compiling the patterns through the re module cache on every call, kept as the baseline """
+    for job in jobs['result']['backgroundJobs']:
+        description = job['jobDescription']
+        match = re.match(r'^Bridge Client:\s*(\S+)', description)
+        job["bridge_agent"] = match.group(1) if match else ""
+        match2 = re.search(r'datasource:\s*(.*)$', description)
+        if match2:
+            job["data_source_name"] = match2.group(1)
+        else:
+            match3 = re.search(r'Failed to refresh data source:\s*(.+)\sdue', description)
+            job["data_source_name"] = match3.group(1) if match3 else ""
+
+
+def _timed(func, arg) -> float:
+    start = time.perf_counter()
+    func(arg)
+    return time.perf_counter() - start
+
+
+def benchmark_job_parsing(sizes=None):
+    logic = BridgeStatusLogic(_NullLogger())
+    rows = []
+    for count in sizes or JOB_PARSING_SIZES:
+        baseline = make_synthetic_jobs(count)
+        compiled = make_synthetic_jobs(count)
+        t_loop = _timed(_parse_jobs_loop, baseline)
+        t_compiled = _timed(logic.add_bridge_agent_and_dsn, compiled)
+        assert baseline == compiled, "parsing with compiled patterns differs from the baseline"
+        rows.append([f"{count:,}", f"{t_loop:.3f}", f"{count / t_loop:,.0f}", f"{t_compiled:.3f}", f"{count / t_compiled:,.0f}"])
+    print(tabulate(rows, headers=["Jobs", "Loop sec", "Loop jobs/sec", "Compiled sec", "Compiled jobs/sec"]))
+
+
+def benchmark_docker_client(calls: int = DOCKER_CLIENT_CALLS):
+    """ per-call latency of a containers list with a new docker.from_env() client per call vs the shared client """
+    import docker
+    from docker.errors import DockerException
+    from src.docker_client import DockerClient
+
+    def new_client_per_call(n):
+        for _ in range(n):
+            client = docker.from_env()
+            client.containers.list(all=True)
+            client.close()
+
+    def shared_client(n):
+        docker_client = DockerClient(_NullLogger())
+        for _ in range(n):
+            docker_client.get_containers_list()
+
+    try:
+        shared_client(1) # warm up, creates the shared client
+    except DockerException as ex:
+        print(f"docker not available: {ex}")
+        return
+    t_new = _timed(new_client_per_call, calls)
+    t_shared = _timed(shared_client, calls)
+    rows = [["docker.from_env() per call", f"{t_new / calls * 1000:.2f}"], ["shared client", f"{t_shared / calls * 1000:.2f}"]]
+    print(tabulate(rows, headers=["Client", "ms per containers.list"]))
+
+
+def benchmark_disk_usage():
+    """ latency of disk usage per running bridge container: `du -sh /` exec vs the cached docker size accounting """
+    from docker.errors import DockerException
+    from src.docker_client import DockerClient, ContainerDiskUsageCache
+
+    try:
+        containers = [c for c in DockerClient(_NullLogger()).get_containers_list(DockerClient.bridge_prefix) if c.status == "running"]
+    except DockerException as ex:
+        print(f"docker not available: {ex}")
+        return
+    if not containers:
+        print("no running bridge containers")
+        return
+    cache = ContainerDiskUsageCache()
+    t_du = _timed(lambda cs: [c.exec_run(cmd="du -sh /", stderr=False) for c in cs], containers)
+    t_cold = _timed(lambda cs: [cache.get(c.name, wait_seconds=60) for c in cs], containers)
+    t_warm = _timed(lambda cs: [cache.get(c.name) for c in cs], containers)
+    n = len(containers)
+    rows = [["exec du -sh /", f"{t_du / n * 1000:.1f}"],
+            ["size accounting, cold cache", f"{t_cold / n * 1000:.1f}"],
+            ["size accounting, warm cache", f"{t_warm / n * 1000:.3f}"]]
+    print(tabulate(rows, headers=["Method", f"ms per container ({n} containers)"]))
+
+
+def benchmark_container_inventory(calls: int = DOCKER_CLIENT_CALLS):
+    """ latency of listing the bridge containers: list and inspect all containers per call vs the event-driven inventory """
+    from docker.errors import DockerException
+    from src.docker_client import DockerClient, DOCKER_SHARED_CLIENT
+    from src.task.container_inventory_task import CONTAINER_INVENTORY
+
+    def list_per_call(n):
+        for _ in range(n):
+            [c for c in DOCKER_SHARED_CLIENT.get().containers.list(all=True) if c.name.startswith(DockerClient.bridge_prefix)]
+
+    def inventory(n):
+        docker_client = DockerClient(_NullLogger())
+        for _ in range(n):
+            docker_client.get_containers_list(DockerClient.bridge_prefix)
+
+    try:
+        list_per_call(1)
+    except DockerException as ex:
+        print(f"docker not available: {ex}")
+        return
+    CONTAINER_INVENTORY.get_snapshot() # waits for the first listing
+    t_list = _timed(list_per_call, calls)
+    t_inventory = _timed(inventory, calls)
+    CONTAINER_INVENTORY.stop()
+    rows = [["containers.list(all=True) per call", f"{t_list / calls * 1000:.2f}"], ["inventory snapshot", f"{t_inventory / calls * 1000:.3f}"]]
+    print(tabulate(rows, headers=["Method", "ms per bridge container list"]))
+
+
+BENCHMARKS = {
+    "job_parsing": benchmark_job_parsing,
+    "docker_client": benchmark_docker_client,
+    "disk_usage": benchmark_disk_usage,
+    "container_inventory": benchmark_container_inventory,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        print(f"## {name}")
+        BENCHMARKS[name]()
@@ -1,10 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from tabulate import tabulate
 import re
-from src.lib.tc_api_client import TableauCloudLogin, TCApiClient, TCApiLogic
+from src.cache_dto import JOB_DETAIL_CACHE
+from src.lib.tc_api_client import TCApiClient, TCApiLogic, TC_SESSION_CACHE
+from src.lib.job_store import JobStore, JobSyncState
 from src.lib.tc_api_client_jobs import TCApiClientJobs
 from src.models import PatToken, LoggerInterface
 from src.token_loader import TokenLoader
 
+JOB_DETAILS_MAX_WORKERS = 8 # keep at or below TC_API_POOL_MAXSIZE so every worker gets a pooled connection
+JOB_DETAILS_TIMEOUT = (5, 30) # (connect, read) seconds per job detail request
+JOBS_SYNC_PAGE_SIZE = 1000
+JOBS_SYNC_MAX_ITEMS = 20000 # jobs fetched per sync, also the history kept by the first (full) sync of a busy site
+JOBS_SYNC_RESUME_OVERLAP = 100 # jobs read again above the position where a capped sync stopped, in case the list shifted
+JOBS_REPORT_MAX_ROWS = 1000
+
+JOB_AGENT_PATTERN = re.compile(r'^Bridge Client:\s*(\S+)')
+JOB_DSN_PATTERN = re.compile(r'datasource:\s*(.*)$')
+JOB_FAILED_DSN_PATTERN = re.compile(r'Failed to refresh data source:\s*(.+)\sdue')
+
 
 def get_or_fetch_site_id(api: TCApiClient, token: PatToken, logger) -> str:
     ### get site id from token or fetch from API.
@@ -27,59 +42,103 @@ def dict_to_str(d):
 
 
 def display_bridge_status(token: PatToken, logger, data_only: bool = False):
-    login_result = TableauCloudLogin.login(token, True)
-    logic = TCApiLogic(login_result)
+    login_result = TC_SESSION_CACHE.login(token, True)
+    logic = TCApiLogic(login_result, token)
     site_id = get_or_fetch_site_id(logic.api, token, logger)
-    try:
-        rows = logic.get_bridge_status(site_id)
-        headers = ["Agent Name", "Pool", "Owner", "Version", "Connection Status", "Last Connected"] #, "Needs Upgrade", "ExtractCnt"]
-        if data_only:
-            return rows, headers
-        return tabulate(rows, headers=headers)
-    finally:
-        TableauCloudLogin.logout(token.get_pod_url(), login_result.session_token)
+    rows = logic.get_bridge_status(site_id)
+    headers = ["Agent Name", "Pool", "Owner", "Version", "Connection Status", "Last Connected"] #, "Needs Upgrade", "ExtractCnt"]
+    if data_only:
+        return rows, headers
+    return tabulate(rows, headers=headers)
 
 
 class BridgeStatusLogic:
     def __init__(self, logger):
         self.logger = logger
 
-    def calculate_jobs_report(self, token: PatToken, logger: LoggerInterface, jobs_details_amount: int):
-        login_result = TableauCloudLogin.login(token)
+    def calculate_jobs_report(self, token: PatToken, logger: LoggerInterface, jobs_details_amount: int, max_rows: int = JOBS_REPORT_MAX_ROWS):
+        login_result = TC_SESSION_CACHE.login(token)
         if not login_result.is_success:
             raise Exception(f"Login failed: {login_result.error}")
-        try:
-            api = TCApiClientJobs(login_result)
-            site_id = get_or_fetch_site_id(api, token, logger)
-            jobs = api.get_jobs_sorted(site_id)
-            self.add_job_details(jobs, jobs_details_amount, api)
-            self.add_bridge_agent_and_dsn(jobs)
-            return jobs
-        finally:
-            TableauCloudLogin.logout(token.get_pod_url(), login_result.session_token)
+        api = TCApiClientJobs(login_result, token)
+        site_id = get_or_fetch_site_id(api, token, logger)
+        store = JobStore()
+        self.sync_jobs(api, site_id, store)
+        jobs = {"result": {
+            "backgroundJobs": store.get_latest_jobs(site_id, max_rows),
+            "totalCount": store.count_jobs(site_id)}}
+        self.add_job_details(jobs, jobs_details_amount, api)
+        self.add_bridge_agent_and_dsn(jobs)
+        return jobs
+
+    def sync_jobs(self, api: TCApiClientJobs, site_id: str, store: JobStore, max_items: int = JOBS_SYNC_MAX_ITEMS) -> int:
+        """
+        Fetch jobs newest first down to the watermark of the last complete sync, so a refresh costs O(new jobs) instead
+        of a full page. The watermark only moves once every job above it is stored: a sync that stops at max_items saves
+        where it stopped, and the next sync fetches the new jobs and then continues from there. Jobs stored while still
+        pending or in progress are fetched again by id. Bridge agent and data source are parsed once here and stored in
+        indexed columns for the job history queries. Returns the number of jobs fetched.
+        """
+        state = store.get_sync_state(site_id)
+        stop_at = state.pending_watermark or state.watermark
+        fetched, complete, position = self._fetch_jobs_until(api, site_id, 0, stop_at, max_items)
+        newest = fetched[0].get("jobRequestedTime") if fetched else stop_at
+        if complete and state.pending_watermark:
+            # continue the capped sync below the jobs it already stored, the new jobs above it moved it down by len(fetched)
+            start_index = max(state.resume_index + len(fetched) - JOBS_SYNC_RESUME_OVERLAP, 0)
+            older, complete, position = self._fetch_jobs_until(api, site_id, start_index, state.watermark, max_items - len(fetched))
+            fetched += older
+        if complete or not stop_at: # the first sync is complete at max_items, that is the history kept
+            new_state = JobSyncState(newest)
+        else:
+            new_state = JobSyncState(state.watermark, newest, position)
+            self.logger.info(f"job sync stopped after {len(fetched)} jobs, it continues on the next refresh")
+
+        fetched_ids = {j["jobId"] for j in fetched}
+        running_ids = [i for i in store.get_running_job_ids(site_id) if i not in fetched_ids]
+        if running_ids:
+            fetched += api.get_jobs_by_ids(site_id, running_ids)
+        self.add_bridge_agent_and_dsn({"result": {"backgroundJobs": fetched}})
+        store.upsert_jobs(site_id, fetched)
+        store.save_sync_state(site_id, new_state)
+        return len(fetched)
+
+    @staticmethod
+    def _fetch_jobs_until(api: TCApiClientJobs, site_id: str, start_index: int, stop_at: str, max_items: int) -> (list, bool, int):
+        """
+        Jobs from start_index down to (and including) those requested at stop_at. Returns the jobs, whether stop_at or the
+        end of the list was reached within max_items, and the list position after the last job read.
+        """
+        jobs = []
+        position = start_index
+        for job in api.iter_jobs(site_id, JOBS_SYNC_PAGE_SIZE, start_index):
+            if stop_at and job.get("jobRequestedTime", "") < stop_at:
+                return jobs, True, position
+            if len(jobs) >= max_items:
+                return jobs, False, position
+            jobs.append(job)
+            position += 1
+        return jobs, True, position
 
     def show_jobs_report_commandline(self, token: PatToken, logger):
-        login_result = TableauCloudLogin.login(token)
+        login_result = TC_SESSION_CACHE.login(token)
         if not login_result.is_success:
             raise Exception(f"Login failed: {login_result.error}")
 
-        try:
-            api = TCApiClientJobs(login_result)
-            site_id = get_or_fetch_site_id(api, token, logger)
-            jobs = api.get_jobs_sorted(site_id)
-
-            ms = ""
-            if "moreItems" in jobs['result']:
-                if jobs['result']['moreItems']:
-                    ms = ' (more)'
-                tc = jobs['result']['totalCount']
-                self.logger.info(f"total records: {tc}{ms}")
-                self.print_jobs_as_table(jobs)
-            else:
-                self.logger.info("invalid format")
-            return jobs
-        finally:
-            TableauCloudLogin.logout(token.get_pod_url(), login_result.session_token)
+        api = TCApiClientJobs(login_result, token)
+        site_id = get_or_fetch_site_id(api, token, logger)
+        jobs = api.get_jobs_sorted(site_id)
+
+        ms = ""
+        if "moreItems" in jobs['result']:
+            if jobs['result']['moreItems']:
+                ms = ' (more)'
+            tc = jobs['result']['totalCount']
+            self.logger.info(f"total records: {tc}{ms}")
+            self.print_jobs_as_table(jobs)
+        else:
+            self.logger.info("invalid format")
+        return jobs
 
     def print_jobs_as_table(self, jobs: dict):
         # background_jobs = jobs_result.jobs["backgroundJobs"]["backgroundJob"]
@@ -98,17 +157,14 @@ class BridgeStatusLogic:
         self.logger.info(tabulate(table_data, headers=headers))
 
     def show_jobs_report_public(self, token: PatToken):
-        login_result = TableauCloudLogin.login(token)
-        try:
-            api = TCApiClientJobs(login_result)
-            jobs = api.get_jobs_public()
-            return jobs
-        finally:
-            TableauCloudLogin.logout(token.get_pod_url(), login_result.session_token)
+        login_result = TC_SESSION_CACHE.login(token)
+        api = TCApiClientJobs(login_result, token)
+        jobs = api.get_jobs_public()
+        return jobs
 
     def remove_agent_with_tc_api(self, token, agent_name, agent_sitename, logger):
-        login_result = TableauCloudLogin.login(token, True)
-        api = TCApiClient(login_result)
+        login_result = TC_SESSION_CACHE.login(token, True)
+        api = TCApiClient(login_result, token)
         site_id = get_or_fetch_site_id(api, token, logger)
         
         if token.sitename != agent_sitename and agent_sitename:
@@ -134,29 +190,41 @@ class BridgeStatusLogic:
         self.logger.warning(f"agent name '{agent_name}' not found when calling Tableau Cloud API.")
         return False
 
-    def add_job_details(self, jobs: list, jobs_details_amount: int, api: TCApiClientJobs):
+    def add_job_details(self, jobs: list, jobs_details_amount: int, api: TCApiClientJobs,
+                        max_workers: int = JOB_DETAILS_MAX_WORKERS, timeout=JOB_DETAILS_TIMEOUT):
         if jobs_details_amount <= 0:
             return
-        for job in jobs['result']['backgroundJobs'][:jobs_details_amount]:
-            job_id = job["jobId"]
-            detail = api.get_job_detail(job_id).get("result")
-            d = dict_to_str(detail)
-            job["jobDetails"] = d
-            match = re.search(r"contentName:\s*(.+)", d) # match text from 'contentName: ' until the end of the line.
-            job["data_source_name"] = match.group(1) if match else "" #note, this may get overwritten below from the jobDescription column. this should be the same value but some failed jobs don't have the jobDescription.
+        detail_jobs = jobs['result']['backgroundJobs'][:jobs_details_amount]
+        failed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # only new or still running jobs are fetched, finished jobs come from the on-disk cache
+            cached = [JOB_DETAIL_CACHE.get(job["jobId"], job.get("status")) for job in detail_jobs]
+            futures = [executor.submit(api.get_job_detail, job["jobId"], timeout) if c is None else None
+                       for job, c in zip(detail_jobs, cached)]
+            for job, detail, future in zip(detail_jobs, cached, futures): # zip keeps the results in the original job order
+                if future:
+                    try:
+                        detail = future.result().get("result")
+                    except Exception as ex:
+                        failed.append(job["jobId"])
+                        job["jobDetails"] = f"unable to fetch job details: {ex}"
+                        job["data_source_name"] = ""
+                        continue
+                    JOB_DETAIL_CACHE.put(job["jobId"], job.get("status"), detail)
+                job["jobDetails"] = dict_to_str(detail)
+                job["data_source_name"] = str(detail.get("contentName") or "") #note, this may get overwritten below from the jobDescription column. this should be the same value but some failed jobs don't have the jobDescription.
+        JOB_DETAIL_CACHE.save()
+        if failed:
+            self.logger.warning(f"unable to fetch details for {len(failed)} of {len(detail_jobs)} jobs")
 
     def add_bridge_agent_and_dsn(self, jobs):
+        """
+        Parse bridge_agent and data_source_name from the jobDescription of each job with the module-level compiled patterns.
+        """
         for job in jobs['result']['backgroundJobs']:
             if 'jobDescription' in job:
                 description = job['jobDescription']
-                match = re.match(r'^Bridge Client:\s*(\S+)', description)
+                match = JOB_AGENT_PATTERN.match(description)
                 job["bridge_agent"] = match.group(1) if match else ""
-                match2 = re.search(r'datasource:\s*(.*)$', description)
-                if match2:
-                    job["data_source_name"] = match2.group(1)
-                else:
-                    match3 = re.search(r'Failed to refresh data source:\s*(.+)\sdue', description)
-                    if match3:
-                        job["data_source_name"] = match3.group(1)
-                    else:
-                        job["data_source_name"] = ""
+                match = JOB_DSN_PATTERN.search(description) or JOB_FAILED_DSN_PATTERN.search(description)
+                job["data_source_name"] = match.group(1) if match else ""
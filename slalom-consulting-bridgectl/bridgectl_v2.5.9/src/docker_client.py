@@ -1,24 +1,44 @@
+import atexit
+import gzip
 import json
 import os
 import platform
 import tempfile
 import re
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dataclasses import dataclass
 from pathlib import Path
 from time import sleep
-from typing import List
+from typing import List, Iterator, Tuple
 from datetime import datetime
 
 import docker
+import requests
 from docker.errors import NotFound, DockerException, APIError
 from docker.models.containers import Container
 from docker.models.images import Image
 
 from src.enums import AMD64_PLATFORM, SCRATCH_DIR
-from src.lib.general_helper import FileHelper, StringUtils
+from src.lib.general_helper import FileHelper, StringUtils, ChunkStream
+from src.lib.log_tail_sync import LogTailSync, LogSyncState, RemoteFileStat
 from src.models import LoggerInterface, BridgeImageName
 from src.os_type import current_os, OsType
 
+DOCKER_API_TIMEOUT = 60 # seconds, same as the docker sdk default
+DOCKER_API_MAX_POOL_SIZE = 16 # keep-alive connections to the docker socket, shared by the streamlit threads and background tasks
+CONTAINER_DETAILS_MAX_WORKERS = 8 # keep below DOCKER_API_MAX_POOL_SIZE
+CONTAINER_DETAILS_TIMEOUT = 20 # seconds per container, counted from when its worker starts
+DISK_USAGE_TTL_SECONDS = 300 # container disk usage changes slowly, and measuring it makes the docker daemon walk the writable layers
+DISK_USAGE_WAIT_SECONDS = 2 # how long a details request waits for the first measurement before showing it as pending
+LOG_SEARCH_BLOCK_BYTES = 1024 * 1024 # log files are scanned in blocks, only matching lines are split out
+LOG_SEARCH_MAX_LINE_BYTES = 4 * 1024 * 1024 # longer lines are matched in pieces, so one huge line can't exhaust memory
+DISK_USAGE_MISSING_TTL_SECONDS = 30 # refresh sooner when asked for a container that wasn't in the last measurement, e.g. a new one
+LOG_FOLLOW_MAX_STREAMS = 16 # connections held open by followed logs on the Logs page
+LOG_FOLLOW_BACKFILL_LINES = 200 # lines already in the log that are shown when following starts
+
 
 class ContainerLabels:
     tableau_bridge_agent_name = "tableau_bridge_agent_name"
@@ -46,6 +66,7 @@ class ContainerDetails:
     status: str = None
     started: str = None
     started_ago: str = None
+    error: str = None # set when only part of the details could be collected
     jdbc_drivers = ""
     odbc_drivers = ""
     volume_mounts = None
@@ -73,6 +94,29 @@ class ContainerDetails:
         }
 
 
+@dataclass
+class ContainerSummary:
+    """ one row of the docker container list, available without inspecting the container """
+    id: str = None
+    name: str = None
+    image: str = None # image reference the container was created from, a name or an id
+    image_id: str = None
+    status: str = None # running, exited, ... like Container.status
+    status_text: str = None # e.g. "Up 2 hours"
+    created: int = 0 # unix time
+    labels: dict = None
+
+    @classmethod
+    def from_api(cls, row: dict):
+        names = row.get("Names") or [""]
+        return cls(row.get("Id"), names[0].lstrip("/"), row.get("Image"), row.get("ImageID"), row.get("State"),
+                   row.get("Status"), row.get("Created", 0), row.get("Labels") or {})
+
+    def project(self, fields: List[str]) -> dict:
+        """ only the given fields, names that are not summary fields are read from the labels """
+        return {f: getattr(self, f) if f in self.__dataclass_fields__ else self.labels.get(f) for f in fields}
+
+
 @dataclass
 class ImageDetail:
     short_id: str = None
@@ -106,7 +150,92 @@ class TempCacheDir:
             os.makedirs(self.tmp_path, exist_ok=True)
 
 
-# one_time_check_docker = None
+class SharedDockerClient:
+    """
+    One long-lived docker sdk client for the process. docker.from_env() opens a new connection pool and calls /version
+    to negotiate the API version every time, so the client is created once on first use, with the negotiated version
+    then pinned, and reused by all DockerClient instances. The underlying requests session is thread-safe.
+    """
+    def __init__(self, timeout: int = DOCKER_API_TIMEOUT, max_pool_size: int = DOCKER_API_MAX_POOL_SIZE):
+        self.timeout = timeout
+        self.max_pool_size = max_pool_size
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self) -> docker.DockerClient:
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None: # raises DockerException if docker is not running, the next call tries again
+                self._client = docker.from_env(version="auto", timeout=self.timeout, max_pool_size=self.max_pool_size)
+            return self._client
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+
+DOCKER_SHARED_CLIENT = SharedDockerClient()
+atexit.register(DOCKER_SHARED_CLIENT.close)
+# separate client without a read timeout for followed logs and the container events stream, they can be quiet for minutes
+# and hold their connection open
+DOCKER_FOLLOW_CLIENT = SharedDockerClient(timeout=None, max_pool_size=LOG_FOLLOW_MAX_STREAMS)
+atexit.register(DOCKER_FOLLOW_CLIENT.close)
+
+
+class ContainerDiskUsageCache:
+    """
+    Disk usage of all bridge containers from the docker API size accounting (one container list call with size=true),
+    cached for ttl_seconds and refreshed on a background thread, so readers never wait on a filesystem walk.
+    Values are (SizeRw, SizeRootFs): bytes written by the container, and total size including the image.
+    """
+    def __init__(self, ttl_seconds: float = DISK_USAGE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._sizes = {}
+        self._updated = 0
+        self._refresh_thread = None
+        self._lock = threading.Lock()
+
+    def is_stale(self, ttl_seconds: float = None) -> bool:
+        return time.monotonic() - self._updated > (ttl_seconds or self.ttl_seconds)
+
+    def refresh_if_stale(self, ttl_seconds: float = None) -> threading.Thread or None:
+        if not self.is_stale(ttl_seconds):
+            return None
+        with self._lock:
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._refresh_thread = threading.Thread(target=self.refresh, daemon=True, name="container_disk_usage")
+                self._refresh_thread.start()
+            return self._refresh_thread
+
+    def refresh(self):
+        try:
+            rows = DOCKER_SHARED_CLIENT.get().api.containers(all=True, size=True, filters={"label": ContainerLabels.tableau_bridge_agent_name})
+        except Exception as ex:
+            print(f"Warning. unable to get container disk usage. {ex}")
+            return
+        sizes = {}
+        for r in rows:
+            for name in r.get("Names", []):
+                sizes[name.lstrip("/")] = (r.get("SizeRw", 0), r.get("SizeRootFs", 0))
+        self._sizes = sizes
+        self._updated = time.monotonic()
+
+    def get(self, container_name: str, wait_seconds: float = DISK_USAGE_WAIT_SECONDS) -> str:
+        is_missing = container_name not in self._sizes
+        thread = self.refresh_if_stale(DISK_USAGE_MISSING_TTL_SECONDS if is_missing else None)
+        if thread and is_missing:
+            thread.join(wait_seconds)
+        size = self._sizes.get(container_name)
+        if not size:
+            return "pending"
+        return f"{StringUtils.format_bytes(size[0])} (total {StringUtils.format_bytes(size[1])})"
+
+
+CONTAINER_DISK_USAGE = ContainerDiskUsageCache()
 
 
 class DockerClient:
@@ -115,12 +244,16 @@ class DockerClient:
     def __init__(self, logger: LoggerInterface):
         self.logger = logger
 
+    @property
+    def client(self) -> docker.DockerClient:
+        return DOCKER_SHARED_CLIENT.get()
+
     def is_docker_available(self) -> bool:
         """
         Check if docker is installed and running with OsType=linux.
         """
         try:
-            client = docker.from_env()
+            client = self.client
             client.version()
             if current_os() != OsType.win:
                 return True
@@ -132,18 +265,60 @@ class DockerClient:
                     f"ERROR: Docker OSType = {docker_os_type} which is not supported for building bridge linux images."
                 )
                 return False
-        except DockerException as ex:
+        except (DockerException, requests.exceptions.ConnectionError) as ex: # the shared client raises ConnectionError if docker stopped after it was created
             self.logger.error(f"ERROR: Docker not ready on host. Please start it. {ex}")
             self.show_install_info()
             return False
 
     def get_containers_list(self, name_prefix=None) -> List[Container]:
-        client = docker.from_env()
-        containers = client.containers.list(all=True)
+        if name_prefix and name_prefix.startswith(self.bridge_prefix): # bridge containers are served from the event-driven inventory
+            from src.task.container_inventory_task import CONTAINER_INVENTORY
+            snapshot = CONTAINER_INVENTORY.get_snapshot(wait_seconds=0) # while it starts, list from docker instead of waiting
+            if snapshot is not None:
+                return [c for c in snapshot.containers if c.name.startswith(name_prefix)]
+        client = self.client
+        containers = client.containers.list(all=True, filters={"name": name_prefix} if name_prefix else None) # the daemon matches substrings
         if name_prefix:
             containers = [c for c in containers if c.name.startswith(name_prefix)]
         return containers
 
+    def query_containers(self, sitename: str = None, pool_id: str = None, agent_name: str = None, rpm_version: str = None,
+                         image: str = None, status: str = None, bridge_only: bool = True,
+                         fields: List[str] = None) -> List[ContainerSummary] or List[dict]:
+        """
+        Containers matching all given filters, filtered by the docker daemon on labels, image (ancestor) and status, so
+        unrelated containers on the host are never transferred. Returns summaries from one list call without inspecting
+        each container, or with fields only those fields (see ContainerSummary.project) as dicts.
+        """
+        labels = [ContainerLabels.tableau_bridge_agent_name] if bridge_only else []
+        for label, value in ((ContainerLabels.tableau_sitename, sitename), (ContainerLabels.tableau_pool_id, pool_id),
+                             (ContainerLabels.tableau_bridge_agent_name, agent_name),
+                             (ContainerLabels.tableau_bridge_rpm_version, rpm_version)): # image labels are inherited by the container
+            if value:
+                labels.append(f"{label}={value}")
+        filters = {}
+        if labels:
+            filters["label"] = labels
+        if image:
+            filters["ancestor"] = image
+        if status:
+            filters["status"] = status
+        summaries = [ContainerSummary.from_api(row) for row in self.client.api.containers(all=True, filters=filters)]
+        if fields:
+            return [s.project(fields) for s in summaries]
+        return summaries
+
+    def get_image_names(self, image_ids) -> dict:
+        """ image id -> first tag (or the short id of an untagged image), one lookup per distinct image """
+        names = {}
+        for image_id in set(image_ids):
+            try:
+                image = self.client.images.get(image_id)
+                names[image_id] = image.tags[0] if image.tags else image.short_id
+            except NotFound:
+                names[image_id] = None
+        return names
+
     def get_bridge_container_names(self):
         return self.get_container_names(self.bridge_prefix)
 
@@ -156,7 +331,7 @@ class DockerClient:
         return names
 
     def get_container_by_name(self, name):
-        client = docker.from_env()
+        client = self.client
         try:
             container = client.containers.get(name)
             return container
@@ -164,15 +339,17 @@ class DockerClient:
             return None
 
     def stop_and_remove_container(self, name):
-        client = docker.from_env()
+        client = self.client
         container = client.containers.get(container_id=name)
         self.logger.info(f"stopping container {name}")
         container.stop()
         self.logger.info(f"removing container {name}")
         container.remove(force=True)
+        from src.task.container_inventory_task import CONTAINER_INVENTORY
+        CONTAINER_INVENTORY.discard(name)
 
     def get_stdout_logs(self, name):
-        client = docker.from_env()
+        client = self.client
         try:
             container = client.containers.get(container_id=name)
             logs = container.logs(timestamps=True)
@@ -181,17 +358,37 @@ class DockerClient:
             self.logger.error(f"Container not found: {name}")
         except APIError as e:
             self.logger.error(f"Docker API error: {e}")
-        finally:
-            client.close()
+
+    def follow_stdout_logs(self, name: str, tail: int = LOG_FOLLOW_BACKFILL_LINES):
+        """
+        Returns a stream of stdout log chunks of the container that stays open for new output, close() it to stop.
+        """
+        container = DOCKER_FOLLOW_CLIENT.get().containers.get(name)
+        return container.logs(stream=True, follow=True, timestamps=True, tail=tail)
+
+    def follow_log_file(self, container_name: str, logfile_name: str, tail: int = LOG_FOLLOW_BACKFILL_LINES):
+        """
+        Returns a stream of chunks from `tail -F` of a bridge log file in the container, close() it to stop.
+        tail -F keeps following the file name when the bridge rotates the log.
+        """
+        container = DOCKER_FOLLOW_CLIENT.get().containers.get(container_name)
+        logs_path = container.labels.get(ContainerLabels.tableau_bridge_logs_path)
+        if not logs_path:
+            raise Exception(
+                f"container does not have label {ContainerLabels.tableau_bridge_logs_path}"
+            )
+        result = container.exec_run(["tail", "-n", str(tail), "-F", f"{logs_path}/{logfile_name}"], stream=True, stderr=False)
+        return result.output
 
     def get_all_bridge_logs_as_tar(self, name):
-        client = docker.from_env()
+        client = self.client
         try:
             container = client.containers.get(container_id=name)
             logs_path = container.labels[ContainerLabels.tableau_bridge_logs_path]
             bits, _ = container.get_archive(logs_path, encode_stream=True)
-            tmp_file = tempfile.NamedTemporaryFile(delete=False)
-            with open(tmp_file.name, "wb") as f:
+            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".tgz")
+            tmp_file.close()
+            with gzip.open(tmp_file.name, "wb") as f: # compressed while streaming, the logs are mostly repetitive json
                 for chunk in bits:
                     f.write(chunk)
             return tmp_file.name
@@ -199,94 +396,103 @@ class DockerClient:
             self.logger.error(f"Container not found: {name}")
         except APIError as e:
             self.logger.error(f"Docker API error: {e}")
-        finally:
-            client.close()
 
-    def search_all_logs_for_text(self, name: str, search_text: str, max_records: int = 10000) -> List[dict]: #FutureDev: finish implementation
+    def search_all_logs_for_text(self, name: str, search_text: str, max_records: int = 10000,
+                                 case_sensitive: bool = False, is_regex: bool = False) -> Iterator[dict]:
         """Search through all log files in the container for given text.
-        
+
+        The logs folder is streamed out of the container once as a tar archive and matched line by line on this host,
+        so memory use does not depend on the size of the logs. Files are searched in archive order.
+
         Args:
             name: Container name
-            search_text: Text to search for
-            max_records: Maximum number of records to return (default 10000)
-            
-        Returns:
-            List of matching log entries or None if error
+            search_text: Text (or regex if is_regex) to search for
+            max_records: Stop after this many matches (default 10000)
+
+        Yields:
+            Matching log entries as dicts with a 'filename' field. Lines that are not json are returned as {'v': line}.
         """
-        client = docker.from_env()
         try:
-            container = client.containers.get(name)
-            logs_path = container.labels.get(ContainerLabels.tableau_bridge_logs_path)
-            if not logs_path:
-                raise Exception(f"Container does not have label {ContainerLabels.tableau_bridge_logs_path}")
-
-            # Create search script
-            script = f"""
-                #!/bin/bash
-                set -e
-                
-                # Initialize output file
-                echo "[]" > /tmp/bridge_logs_search.json
-                
-                # Find all files in log directory, sort by modification time (newest first)
-                find {logs_path} -type f -printf "%T@ %p\\n" | sort -nr | cut -d' ' -f2- | while read -r file; do
-                    # Skip if not a regular file
-                    [ ! -f "$file" ] && continue
-                    
-                    # Process each line
-                    while IFS= read -r line; do
-                        if echo "$line" | grep -q "{search_text}"; then
-                            # Try to parse as JSON
-                            if echo "$line" | jq . >/dev/null 2>&1; then
-                                # Add filename field and append to results
-                                echo "$line" | jq --arg file "$file" '. + {{"filename": $file}}' >> /tmp/bridge_logs_search.json
-                                
-                                # Check record count
-                                count=$(wc -l < /tmp/bridge_logs_search.json)
-                                if [ $count -ge {max_records} ]; then
-                                    break 2
-                                fi
-                            fi
-                        fi
-                    done < "$file"
-                done
-            """
-
-            # Write and execute search script
-            exit_code, output = container.exec_run(
-                cmd=["bash", "-c", script],
-                environment={"LANG": "C.UTF-8"},
-                workdir="/tmp"
-            )
-            
-            if exit_code != 0:
-                self.logger.error(f"Search script failed: {output.decode()}")
-                return None
-                
-            # Get results file from container
-            # bits, stat = container.get_archive("/tmp/bridge_logs_search.json")
-            
-            # # Write to local temp file
-            # tmp_file = Path(tempfile.gettempdir()) / "bridge_logs_search.json"
-            # with open(tmp_file, "wb") as f:
-            #     for chunk in bits:
-            #         f.write(chunk)
-                
-            # # Read and parse results
-            # with open(tmp_file) as f:
-            #     results = [json.loads(line) for line in f if line.strip()]
-                
-            # self.logger.info(f"Found {len(results)} matching records")
-            # return results
+            container = self.client.containers.get(name)
+        except NotFound:
+            self.logger.error(f"Container not found: {name}")
+            return
+        logs_path = container.labels.get(ContainerLabels.tableau_bridge_logs_path)
+        if not logs_path:
+            self.logger.error(f"Container does not have label {ContainerLabels.tableau_bridge_logs_path}")
+            return
+        if not is_regex and case_sensitive:
+            needle = search_text.encode("utf-8")
+            find = lambda block, pos: block.find(needle, pos)
+        else:
+            flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+            pattern = re.compile((search_text if is_regex else re.escape(search_text)).encode("utf-8"), flags)
+            def find(block, pos):
+                m = pattern.search(block, pos)
+                return m.start() if m else -1
+
+        count = 0
+        try:
+            bits, _ = container.get_archive(logs_path)
+            with tarfile.open(fileobj=ChunkStream(bits), mode="r|") as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    filename = os.path.basename(member.name)
+                    f = tar.extractfile(member)
+                    for line in self._iter_matching_lines(f, find):
+                        text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                        try:
+                            record = json.loads(text)
+                            if not isinstance(record, dict):
+                                record = {"v": record}
+                        except ValueError:
+                            record = {"v": text}
+                        record["filename"] = filename
+                        yield record
+                        count += 1
+                        if count >= max_records:
+                            return
+        except APIError as e:
+            self.logger.error(f"Docker API error: {e}")
+        except tarfile.TarError as e:
+            self.logger.error(f"Error reading logs archive: {e}")
 
-        except Exception as e:
-            self.logger.error(f"Error searching logs: {str(e)}")
-            return None
-        finally:
-            client.close()
+    @staticmethod
+    def _iter_matching_lines(f, find) -> Iterator[bytes]:
+        """
+        Scan a binary file object block by block and yield the lines containing a match. find(block, pos) returns the
+        offset of the next match or -1.
+        """
+        tail = b""
+        while True:
+            chunk = f.read(LOG_SEARCH_BLOCK_BYTES)
+            block = tail + chunk if tail else chunk
+            if chunk:
+                cut = block.rfind(b"\n") + 1
+                if cut == 0: # no complete line yet
+                    if len(block) < LOG_SEARCH_MAX_LINE_BYTES:
+                        tail = block
+                        continue
+                    cut = len(block)
+                block, tail = block[:cut], block[cut:]
+            elif not block:
+                return
+            pos = 0
+            while True:
+                i = find(block, pos)
+                if i < 0:
+                    break
+                start = block.rfind(b"\n", 0, i) + 1
+                end = block.find(b"\n", i)
+                end = len(block) if end < 0 else end + 1
+                yield block[start:end]
+                pos = end
+            if not chunk:
+                return
 
     def list_tableau_container_log_filenames(self, name):
-        client = docker.from_env()
+        client = self.client
         try:
             container = client.containers.get(name)
             logs_path = container.labels.get(ContainerLabels.tableau_bridge_logs_path)
@@ -319,34 +525,76 @@ class DockerClient:
             self.logger.error(f"Container not found: {name}")
         except APIError as e:
             self.logger.error(f"Docker API error: {e}")
-        finally:
-            client.close()
 
     def download_single_file_to_disk(
         self, container_name: str, logfile_name: str, is_client_config: bool = False
     ):
-        client = docker.from_env()
+        client = self.client
+        container = client.containers.get(container_name)
+        TempLogsSettings().create_path()
+        logs_path = container.labels.get(ContainerLabels.tableau_bridge_logs_path)
+        if not logs_path:
+            raise Exception(
+                f"container does not have label {ContainerLabels.tableau_bridge_logs_path}"
+            )
+        if is_client_config:
+            logs_path = logs_path.replace("/Logs", "/Configuration")
+        bits, _ = container.get_archive(f"{logs_path}/{logfile_name}")
+        tmp_text_file = TempLogsSettings.temp_bridge_logs_path / logfile_name
+        LogTailSync.clear_state(tmp_text_file)
+        FileHelper.extract_single_tar_stream_to_file(bits, tmp_text_file)
+        return str(tmp_text_file)
+
+    def sync_single_file_to_disk(self, container_name: str, logfile_name: str):
+        """
+        Brings the local copy of a bridge log file up to date. Bridge logs are append-only, so only the bytes added since
+        the last sync are fetched with `tail -c`. Falls back to a full download when there is no local copy, the log was
+        rotated or the incremental fetch failed, and raises if the full download fails too (e.g. the file no longer exists).
+        """
+        container = self.client.containers.get(container_name)
+        TempLogsSettings().create_path()
+        logs_path = container.labels.get(ContainerLabels.tableau_bridge_logs_path)
+        if not logs_path:
+            raise Exception(
+                f"container does not have label {ContainerLabels.tableau_bridge_logs_path}"
+            )
+        remote_path = f"{logs_path}/{logfile_name}"
+        tmp_text_file = TempLogsSettings.temp_bridge_logs_path / logfile_name
+        remote = None
         try:
-            container = client.containers.get(container_name)
-            TempLogsSettings().create_path()
-            logs_path = container.labels.get(ContainerLabels.tableau_bridge_logs_path)
-            if not logs_path:
-                raise Exception(
-                    f"container does not have label {ContainerLabels.tableau_bridge_logs_path}"
-                )
-            if is_client_config:
-                logs_path = logs_path.replace("/Logs", "/Configuration")
-            bits, _ = container.get_archive(f"{logs_path}/{logfile_name}")
-            tmp_tar = TempLogsSettings.temp_bridge_logs_path / f"{logfile_name}.tar"
-            with open(tmp_tar, "wb") as f:
-                for chunk in bits:
-                    f.write(chunk)
-            tmp_text_file = TempLogsSettings.temp_bridge_logs_path / logfile_name
-            FileHelper.extract_single_tar_content_to_text(tmp_tar, tmp_text_file)
-            tmp_tar.unlink()
-            return str(tmp_text_file)
-        finally:
-            client.close()
+            exit_code, out = container.exec_run(["stat", "-c", "%i %s", remote_path], stderr=False)
+            if exit_code != 0:
+                raise Exception(f"stat exit code {exit_code}")
+            remote = RemoteFileStat.parse(out.decode("utf-8", errors="replace"))
+            state = LogTailSync.load_state(tmp_text_file)
+            if LogTailSync.can_append(state, tmp_text_file, container_name, remote):
+                if remote.size > state.offset:
+                    chunks = self._exec_stream_checked(container, ["tail", "-c", f"+{state.offset + 1}", remote_path])
+                    LogTailSync.append(tmp_text_file, chunks, state)
+                return str(tmp_text_file)
+        except Exception as ex:
+            self.logger.warning(f"incremental sync of {remote_path} failed, downloading the whole file. {ex}")
+        LogTailSync.clear_state(tmp_text_file)
+        try:
+            bits, _ = container.get_archive(remote_path)
+            size = FileHelper.extract_single_tar_stream_to_file(bits, tmp_text_file)
+        except Exception as ex:
+            raise Exception(f"unable to download log file {remote_path} from container {container_name}. {ex}") from ex
+        if remote:
+            LogTailSync.save_state(tmp_text_file, LogSyncState(container_name, remote.inode, size))
+        return str(tmp_text_file)
+
+    def _exec_stream_checked(self, container: Container, cmd: List[str]):
+        """
+        Yields the stdout chunks of a command run in the container, and raises at the end if its exit code is not 0, so
+        a failed command's output is not used. exec_run(stream=True) doesn't report the exit code, so the exec is inspected.
+        """
+        api = self.client.api
+        exec_id = api.exec_create(container.id, cmd, stdout=True, stderr=False)["Id"]
+        yield from api.exec_start(exec_id, stream=True)
+        exit_code = api.exec_inspect(exec_id).get("ExitCode")
+        if exit_code != 0:
+            raise Exception(f"{cmd[0]} exit code {exit_code}")
 
     def calc_cpu_usage_pct(self, stats):
         if not stats.get("cpu_stats") or not stats.get("precpu_stats"):
@@ -369,7 +617,7 @@ class DockerClient:
             return 0
 
     def get_image_details(self, image_name) -> ImageDetail:
-        client = docker.from_env()
+        client = self.client
         image: Image
         try:
             image = client.images.get(image_name)
@@ -378,8 +626,6 @@ class DockerClient:
         except APIError as e:
             self.logger.error(f"Docker API error: {e}")
             return None
-        finally:
-            client.close()
         img_detail = ImageDetail()
         img_detail.labels = image.labels
         img_detail.tableau_bridge_rpm_version = image.labels.get(
@@ -405,22 +651,21 @@ class DockerClient:
         return bool(img)
 
     def is_image_in_use(self, image_name: str) -> List[str]:
-        client = docker.from_env()
+        """
+        Names of the containers created from exactly this image. The daemon's ancestor filter narrows the list to the
+        image and the images built on it, the descendants are then dropped by comparing the image id.
+        """
         try:
-            containers = client.containers.list(all=True)
-            used_by = []
-            for container in containers:
-                if container.image.tags and image_name in container.image.tags:
-                    used_by.append(container.name)
-            return used_by
+            image_id = self.client.images.get(image_name).id
+            return [s.name for s in self.query_containers(image=image_id, bridge_only=False) if s.image_id == image_id]
+        except NotFound:
+            return []
         except APIError as e:
             self.logger.error(f"Docker API error: {e}")
             return []
-        finally:
-            client.close()
 
     def remove_image(self, image_name: str) -> bool:
-        client = docker.from_env()
+        client = self.client
         containers = self.is_image_in_use(image_name)
         if containers:
             self.logger.error(f"Image {image_name} is in use. First remove the containers: {', '.join(containers)}")
@@ -435,11 +680,9 @@ class DockerClient:
         except APIError as e:
             self.logger.error(f"Docker API error during image removal: {e}")
             return False
-        finally:
-            client.close()
 
     def get_container_details(self, container_name: str, include_hardware_stats: bool) -> ContainerDetails:
-        client = docker.from_env()
+        client = self.client
         container: Container
         try:
             container = client.containers.get(container_id=container_name)
@@ -449,9 +692,14 @@ class DockerClient:
         except APIError as e:
             self.logger.error(f"Docker API error: {e}")
             return None
-        finally:
-            client.close()
         details = ContainerDetails()
+        self._fill_container_details(container, include_hardware_stats, details)
+        return details
+
+    def _fill_container_details(self, container: Container, include_hardware_stats: bool, details: ContainerDetails):
+        """
+        Fills details in place, so a caller that gives up waiting still has the fields collected so far.
+        """
         details.status = container.status
         details.labels = container.labels
         image_tags = container.image.attrs.get("RepoTags")
@@ -464,25 +712,62 @@ class DockerClient:
                 details.volume_mounts.append(f"{m['Source']} => {m['Destination']}")
         details.network_mode = container.attrs.get("HostConfig", {}).get("NetworkMode")
         if include_hardware_stats:
-            stats = container.stats(stream=False)
+            from src.task.container_stats_task import CONTAINER_STATS_TASK
+            sample = CONTAINER_STATS_TASK.get_latest(container.name)
+            stats = None if sample else container.stats(stream=False) # the stats collector avoids the 1-2s sampling delay
             if container.status == "running":
-                if not details.volume_mounts:
-                    ext_code, du_logs = container.exec_run(cmd="du -sh /", stderr=False)
-                    details.disk_usage = du_logs.decode("utf-8").split("\t")[0]
-                else:
-                    details.disk_usage = "N/A (mounted disk)"
+                details.disk_usage = CONTAINER_DISK_USAGE.get(container.name) # mounted volumes are not included
                 details.started = container.attrs.get("State", {}).get("StartedAt", "")
                 started_time = StringUtils.parse_time_string(details.started)
                 details.started_ago = StringUtils.short_time_ago(started_time)
                 self.inspect_drivers(container, details)
-            details.cpu_usage_pct = self.calc_cpu_usage_pct(stats)
-            details.mem_usage_mb = (
-                stats.get("memory_stats", {}).get("usage", 0) / 1024 / 1024
-            )
-        return details
+            if sample:
+                details.cpu_usage_pct = sample.cpu_usage_pct
+                details.mem_usage_mb = sample.mem_usage_mb
+            else:
+                details.cpu_usage_pct = self.calc_cpu_usage_pct(stats)
+                details.mem_usage_mb = (
+                    stats.get("memory_stats", {}).get("usage", 0) / 1024 / 1024
+                )
+
+    def iter_container_details(self, containers: List[Container], include_hardware_stats: bool,
+                               max_workers: int = CONTAINER_DETAILS_MAX_WORKERS,
+                               timeout: float = CONTAINER_DETAILS_TIMEOUT) -> Iterator[Tuple[Container, ContainerDetails]]:
+        """
+        Collect details for many containers concurrently and yield (container, details) as each one completes.
+        A container that fails or runs longer than timeout is yielded with the fields collected so far and details.error set.
+        """
+        if not containers:
+            return
+        details = {c.name: ContainerDetails(labels=c.labels, status=c.status) for c in containers}
+        started = {}
+
+        def collect(c: Container):
+            started[c.name] = time.monotonic()
+            self._fill_container_details(c, include_hardware_stats, details[c.name])
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="container_details")
+        try:
+            pending = {executor.submit(collect, c): c for c in containers}
+            while pending:
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for f in done:
+                    c = pending.pop(f)
+                    if f.exception():
+                        details[c.name].error = str(f.exception())
+                    yield c, details[c.name]
+                now = time.monotonic()
+                for f, c in list(pending.items()):
+                    if c.name in started and now - started[c.name] > timeout:
+                        pending.pop(f)
+                        details[c.name].error = f"timed out after {timeout}s"
+                        self.logger.warning(f"container {c.name} details timed out after {timeout}s, showing partial details")
+                        yield c, details[c.name]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True) # timed out workers finish in the background
 
     def run_build_bridge_image(self, bridge_image_name: str, buildimg_path: str, build_args: dict, labels: dict, nocache: bool = True):
-        client = docker.from_env()
+        client = self.client
         try:
             tag_val = f"{bridge_image_name}:latest"
             image, logs = client.images.build(
@@ -507,8 +792,6 @@ class DockerClient:
             else:
                 self.logger.error(f"Docker Image build error: {e}") #do we need to look at a different attribute for error details?
             return None
-        finally:
-            client.close()
 
     def run_bridge_container(
         self,
@@ -520,7 +803,7 @@ class DockerClient:
         dns_mappings,
         network_mode,
     ):
-        client = docker.from_env()
+        client = self.client
         container = client.containers.run(
             image_id,
             labels=labels,
@@ -532,15 +815,17 @@ class DockerClient:
             environment=env_vars,
             network_mode=network_mode,
         )
+        from src.task.container_inventory_task import CONTAINER_INVENTORY
+        CONTAINER_INVENTORY.apply(container)
         return container
 
     def restart_container(self, name):
-        client = docker.from_env()
+        client = self.client
         container = client.containers.get(container_id=name)
         container.restart()
 
     def edit_client_config_v2(self, container_name: str, client_config: dict):
-        client = docker.from_env()
+        client = self.client
         container = client.containers.get(container_name)
         logs_path = container.labels.get(ContainerLabels.tableau_bridge_logs_path)
         if not logs_path:
@@ -591,13 +876,13 @@ EOF'"""
             details.odbc_drivers = odbc_exec_output.replace("\n", " ")
 
     def test_db_connection(self, name, cmd):
-        client = docker.from_env()
+        client = self.client
         container = client.containers.get(container_id=name)
         exit_code, out = container.exec_run(cmd=cmd)
         return exit_code, out.decode("utf-8")
 
     def get_tableau_bridge_image_names(self):
-        client = docker.from_env()
+        client = self.client
         images = client.images.list()
         image_names = []
         for img in images:
@@ -1,4 +1,3 @@
-import io
 import os
 import re
 from dataclasses import dataclass
@@ -12,8 +11,11 @@ from kubernetes.client.rest import ApiException
 import yaml
 
 from src.bridge_logs import BridgeContainerLogsPath
-from src.docker_client import TempLogsSettings, ContainerLabels
+from src.docker_client import TempLogsSettings, ContainerLabels, LOG_FOLLOW_BACKFILL_LINES
 from src.lib.general_helper import FileHelper, StringUtils
+from src.lib.log_tail_sync import LogTailSync, LogSyncState, RemoteFileStat
+
+K8S_EXEC_TIMEOUT_SECONDS = 30 # for short commands run in a pod, like stat
 
 
 class K8sSettings:
@@ -83,6 +85,20 @@ class K8sPod:
     started_ago: str = None
     status: str = None
 
+class K8sExecStream:
+    """
+    Iterable over the stdout chunks of a pod exec opened with binary=True and _preload_content=False.
+    """
+    def __init__(self, resp):
+        self.resp = resp
+
+    def __iter__(self):
+        return K8sClient._iter_exec_stdout(self.resp)
+
+    def close(self):
+        self.resp.close()
+
+
 class K8sClient:
     def __init__(self):
         if not K8sSettings.does_kube_config_exist():
@@ -263,27 +279,114 @@ class K8sClient:
                              command=exec_command,
                              stderr=True, stdin=False,
                              stdout=True, tty=False,
+                             binary=True, # tar output is binary, reading it as text corrupts non-ascii bytes
                              _preload_content=False)
+        TempLogsSettings().create_path() #futuredev: maybe use separate path for k8s temp log files
+        tmp_text_file = TempLogsSettings.temp_bridge_logs_path / logfile_name
+        LogTailSync.clear_state(tmp_text_file)
+        try:
+            FileHelper.extract_single_tar_stream_to_file(self._iter_exec_stdout_checked(resp), tmp_text_file)
+        finally:
+            resp.close()
+        return str(tmp_text_file)
 
-        tar_output = io.BytesIO()
+    def sync_single_file_to_disk(self, namespace: str, pod_name: str, logfile_name: str):
+        """
+        Brings the local copy of a bridge log file up to date, fetching only the bytes appended since the last sync with
+        `tail -c`. Falls back to a full download when there is no local copy, the log was rotated or the incremental
+        fetch failed, and raises if the full download fails too (e.g. the file no longer exists).
+        """
+        detail = self.get_pod_detail(namespace, pod_name, pod_name)
+        rpm_source = detail.labels[ContainerLabels.tableau_bridge_rpm_source]
+        user_as_tableau = bool(detail.labels[ContainerLabels.user_as_tableau])
+        remote_path = BridgeContainerLogsPath.get_logs_path(rpm_source, user_as_tableau) + "/" + logfile_name
+        tmp_text_file = TempLogsSettings.temp_bridge_logs_path / logfile_name
+        remote = None
+        try:
+            exit_code, out, err = self._exec(namespace, pod_name, ["stat", "-c", "%i %s", remote_path])
+            if exit_code != 0:
+                raise Exception(f"stat exit code {exit_code}. {err.decode('utf-8', errors='replace').strip()}")
+            remote = RemoteFileStat.parse(out.decode("utf-8", errors="replace"))
+            state = LogTailSync.load_state(tmp_text_file)
+            if LogTailSync.can_append(state, tmp_text_file, pod_name, remote):
+                if remote.size > state.offset:
+                    resp = stream.stream(self.client.connect_get_namespaced_pod_exec, pod_name, namespace,
+                                         command=["tail", "-c", f"+{state.offset + 1}", remote_path],
+                                         stderr=True, stdin=False,
+                                         stdout=True, tty=False,
+                                         binary=True,
+                                         _preload_content=False)
+                    try:
+                        LogTailSync.append(tmp_text_file, self._iter_exec_stdout_checked(resp), state)
+                    finally:
+                        resp.close()
+                return str(tmp_text_file)
+        except Exception as ex:
+            print(f"Warning. incremental sync of {remote_path} failed, downloading the whole file. {ex}")
+        try:
+            path = self.download_single_file_to_disk(namespace, pod_name, logfile_name)
+        except Exception as ex:
+            raise Exception(f"unable to download log file {remote_path} from pod {pod_name}. {ex}") from ex
+        if remote:
+            LogTailSync.save_state(tmp_text_file, LogSyncState(pod_name, remote.inode, os.path.getsize(path)))
+        return path
+
+    def _exec(self, namespace: str, pod_name: str, command: List[str]) -> (int, bytes, bytes):
+        """ runs a short command in the pod and returns (exit code, stdout, stderr), exit code None if not reported """
+        resp = stream.stream(self.client.connect_get_namespaced_pod_exec, pod_name, namespace,
+                             command=command,
+                             stderr=True, stdin=False,
+                             stdout=True, tty=False,
+                             binary=True,
+                             _preload_content=False)
+        try:
+            resp.run_forever(timeout=K8S_EXEC_TIMEOUT_SECONDS)
+            return self._exec_returncode(resp), resp.read_stdout() or b"", resp.read_stderr() or b""
+        finally:
+            resp.close()
+
+    @staticmethod
+    def _exec_returncode(resp):
+        try:
+            return resp.returncode
+        except (TypeError, ValueError, KeyError, IndexError, yaml.YAMLError): # no or unexpected status on the error channel
+            return None
+
+    @staticmethod
+    def _iter_exec_stdout(resp):
         while resp.is_open():
             resp.update(timeout=1)
             if resp.peek_stdout():
-                x = resp.read_stdout()
-                tar_output.write(x.encode('ascii'))
+                yield resp.read_stdout()
             if resp.peek_stderr():
-                print("STDERR: %s" % resp.read_stderr())
-        tar_output.seek(0)
-        TempLogsSettings().create_path() #futuredev: maybe use separate path for k8s temp log files
-        tmp_tar = TempLogsSettings.temp_bridge_logs_path / f"{logfile_name}.tar"
-        with open(tmp_tar, "wb") as f:
-            for chunk in tar_output:
-                f.write(chunk)
-        resp.close()
-        tmp_text_file = TempLogsSettings.temp_bridge_logs_path / logfile_name
-        FileHelper.extract_single_tar_content_to_text(tmp_tar, tmp_text_file)
-        tmp_tar.unlink()
-        return str(tmp_text_file)
+                print("STDERR: %s" % resp.read_stderr().decode("utf-8", errors="replace"))
+        remaining = resp.read_stdout() # data received together with the close frame
+        if remaining:
+            yield remaining
+
+    @classmethod
+    def _iter_exec_stdout_checked(cls, resp):
+        """ like _iter_exec_stdout, and raises at the end if the command did not exit with 0, so the output is not used """
+        yield from cls._iter_exec_stdout(resp)
+        exit_code = cls._exec_returncode(resp)
+        if exit_code != 0:
+            raise Exception(f"{' '.join(resp.read_stderr().decode('utf-8', errors='replace').split())} exit code {exit_code}".strip())
+
+    def follow_log_file(self, namespace: str, pod_name: str, logfile_name: str, tail: int = LOG_FOLLOW_BACKFILL_LINES):
+        """
+        Returns a stream of chunks from `tail -F` of a bridge log file in the pod, close() it to stop.
+        """
+        detail = self.get_pod_detail(namespace, pod_name, pod_name)
+        rpm_source = detail.labels[ContainerLabels.tableau_bridge_rpm_source]
+        user_as_tableau = bool(detail.labels[ContainerLabels.user_as_tableau])
+        remote_path = BridgeContainerLogsPath.get_logs_path(rpm_source, user_as_tableau) + "/" + logfile_name
+        resp = stream.stream(self.client.connect_get_namespaced_pod_exec, pod_name, namespace,
+                             command=["tail", "-n", str(tail), "-F", remote_path],
+                             stderr=True, stdin=False,
+                             stdout=True, tty=False,
+                             binary=True,
+                             _preload_content=False)
+        return K8sExecStream(resp)
 
     @staticmethod
     def encode_for_k8s_label(value: str):
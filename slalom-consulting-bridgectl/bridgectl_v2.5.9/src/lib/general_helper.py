@@ -1,5 +1,7 @@
 import base64
+import gzip
 import hashlib
+import io
 import os
 import random
 import re
@@ -13,6 +15,32 @@ from typing import List
 import yaml
 
 
+class ChunkStream(io.RawIOBase):
+    """
+    Read-only file object over an iterator of byte chunks (e.g. docker get_archive or a k8s exec stream), so tarfile can
+    read it in streaming mode ('r|') without the whole archive in memory or on disk.
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos >= len(self._buffer):
+            try:
+                self._buffer = memoryview(next(self._chunks))
+                self._pos = 0
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer) - self._pos)
+        b[:n] = self._buffer[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
 class FileHelper:
     @staticmethod
     def replace_text(template_file: str or Path, out_file: str or Path, replace: dict):
@@ -40,6 +68,21 @@ class FileHelper:
                         break
                 f.write(line)
 
+    @staticmethod
+    def hash_file_head(path, length: int, max_length: int = 4096) -> str:
+        """
+        Hash of the first min(length, max_length) bytes, used to tell an appended file from one rewritten in place.
+        """
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read(min(length, max_length))).hexdigest()
+
+    @staticmethod
+    def open_log(path):
+        """ opens a log file for reading bytes, a .gz file (an archived log) is decompressed while it is read """
+        if str(path).endswith(".gz"):
+            return gzip.open(path, "rb")
+        return open(path, "rb")
+
     @staticmethod
     def encode_file_to_base64(file_path):
         with open(file_path, 'rb') as file:
@@ -105,19 +148,21 @@ class FileHelper:
         # return sorted(files, key=os.path.getmtime)
 
     @staticmethod
-    def extract_single_tar_content_to_text(tar_path, output_text_path):
-        with tarfile.open(tar_path, 'r') as tar:
-            member = tar.getmembers()[0]
-            if not member.isfile():
-                raise Exception(f"tar file {tar_path} does not contain a file")
-            file_object = tar.extractfile(member)
-            if not file_object:
-                raise Exception(f"tar file {tar_path} does not contain a file")
-            file_content = file_object.read()
-            # Open the output text file
-            # Use 'wb' for binary file types, 'w' for text files
-            with open(output_text_path, 'wb') as output_file:
-                output_file.write(file_content)
+    def extract_single_tar_stream_to_file(chunks, output_path) -> int:
+        """
+        Write the first file of a tar archive given as an iterator of byte chunks to output_path, without a temp tar file
+        and with constant memory. The file is written next to the target and renamed into place, so readers never see a
+        partial file. Returns the number of bytes written.
+        """
+        tmp_path = f"{output_path}.part"
+        with tarfile.open(fileobj=ChunkStream(chunks), mode="r|") as tar:
+            member = tar.next()
+            if not member or not member.isfile():
+                raise Exception(f"tar stream for {output_path} does not contain a file")
+            with tar.extractfile(member) as src, open(tmp_path, 'wb') as output_file:
+                shutil.copyfileobj(src, output_file, 1024 * 1024)
+        os.replace(tmp_path, output_path)
+        return member.size
 
     @staticmethod
     def validate_yaml(yaml_content):
@@ -215,6 +260,15 @@ class StringUtils:
         gBits = bits / 1000 / 1000 / 1000
         return round(gBits, 1)
 
+    @staticmethod
+    def format_bytes(num_bytes: int) -> str:
+        size = float(num_bytes or 0)
+        for unit in ["B", "KB", "MB", "GB"]:
+            if size < 1024:
+                return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+            size /= 1024
+        return f"{size:.1f}TB"
+
     @staticmethod
     def now_utc() -> datetime:
         return datetime.now(timezone.utc)
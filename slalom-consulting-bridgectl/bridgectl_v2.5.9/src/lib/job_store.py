@@ -0,0 +1,187 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import List, Optional
+
+from src.cache_dto import JobStatus
+from src.enums import SCRATCH_DIR
+
+JOB_STORE_PATH = SCRATCH_DIR / "jobs_store.db"
+RUNNING_JOB_LOOKBACK_DAYS = 2 # pending/in progress jobs older than this are not re-synced (they are most likely abandoned)
+CURRENT_JOB_STORE_SCHEMA_VERSION = 3
+
+
+@dataclass
+class JobSyncState:
+    watermark: str = None # jobRequestedTime of the newest job of the last complete sync, all jobs up to it are stored
+    pending_watermark: str = None # newest job of a sync that stopped at the item cap before reaching the watermark
+    resume_index: int = 0 # position in the newest-first job list where that sync stopped
+
+
+class JobStore:
+    """
+    Local SQLite history of Tableau Cloud background jobs, one row per jobId. Lets the Jobs page sync incrementally
+    instead of re-downloading the latest 1000 jobs on every refresh, and holds the parsed bridge agent, data source,
+    status and run/queue times with indexes on time and agent, so filters and aggregations over months of history
+    are indexed queries instead of a re-parse of the jobs json.
+    """
+    def __init__(self, db_path=JOB_STORE_PATH):
+        self.db_path = db_path
+        SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            JobStoreSchemaUpgrade.upgrade_schema(con)
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.db_path, timeout=30)
+        con.row_factory = sqlite3.Row
+        try:
+            con.execute("PRAGMA journal_mode=WAL") # readers on the streamlit thread don't block the writer
+            with con: # commit on success, rollback on error
+                yield con
+        finally:
+            con.close()
+
+    def get_sync_state(self, site_id: str) -> JobSyncState:
+        with self._connect() as con:
+            row = con.execute("SELECT watermark, pending_watermark, resume_index FROM sync_state WHERE site_id = ?",
+                              (site_id,)).fetchone()
+        return JobSyncState(*row) if row else JobSyncState()
+
+    def save_sync_state(self, site_id: str, state: JobSyncState):
+        with self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO sync_state (site_id, watermark, pending_watermark, resume_index) VALUES (?, ?, ?, ?)",
+                        (site_id, state.watermark, state.pending_watermark, state.resume_index))
+
+    def get_running_job_ids(self, site_id: str) -> List[str]:
+        """
+        Recent jobs that were still pending or in progress when they were stored, their status has to be fetched again.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=RUNNING_JOB_LOOKBACK_DAYS)).strftime("%Y-%m-%dT%H:%M:%S")
+        terminal = ",".join("?" * len(JobStatus.terminal))
+        with self._connect() as con:
+            rows = con.execute(
+                f"SELECT job_id FROM jobs WHERE site_id = ? AND job_requested_time >= ? AND status NOT IN ({terminal})",
+                (site_id, cutoff, *JobStatus.terminal)).fetchall()
+        return [r[0] for r in rows]
+
+    def upsert_jobs(self, site_id: str, jobs: List[dict]):
+        """
+        jobs are expected to already have bridge_agent and data_source_name parsed, see BridgeStatusLogic.add_bridge_agent_and_dsn
+        """
+        rows = [(j["jobId"], site_id, j.get("jobRequestedTime"), j.get("status"), j.get("taskType"),
+                 j.get("bridge_agent") or None, j.get("data_source_name") or None,
+                 self._to_int(j.get("currentRunTime")), self._to_int(j.get("currentQueueTime")), json.dumps(j))
+                for j in jobs]
+        with self._connect() as con:
+            con.executemany("""INSERT OR REPLACE INTO jobs (job_id, site_id, job_requested_time, status, task_type,
+                bridge_agent, data_source_name, run_time_sec, queue_time_sec, raw_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+
+    @staticmethod
+    def _to_int(value) -> Optional[int]:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def get_latest_jobs(self, site_id: str, limit: int) -> List[dict]:
+        with self._connect() as con:
+            rows = con.execute("SELECT raw_json FROM jobs WHERE site_id = ? ORDER BY job_requested_time DESC LIMIT ?",
+                               (site_id, limit)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def count_jobs(self, site_id: str) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM jobs WHERE site_id = ?", (site_id,)).fetchone()[0]
+
+    @staticmethod
+    def _since(days: int) -> str:
+        return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+
+    def query_jobs(self, site_id: str, days: int, status: str = None, bridge_agent: str = None,
+                   data_source_name: str = None, limit: int = 5000) -> List[dict]:
+        sql = """SELECT job_id, status, task_type, job_requested_time, bridge_agent, data_source_name, run_time_sec, queue_time_sec
+                 FROM jobs WHERE site_id = ? AND job_requested_time >= ?"""
+        params = [site_id, self._since(days)]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        if bridge_agent:
+            sql += " AND bridge_agent = ?"
+            params.append(bridge_agent)
+        if data_source_name:
+            sql += " AND data_source_name = ?"
+            params.append(data_source_name)
+        sql += " ORDER BY job_requested_time DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as con:
+            return [dict(r) for r in con.execute(sql, params)]
+
+    def get_distinct_values(self, site_id: str, column: str, days: int) -> List[str]:
+        if column not in ("status", "bridge_agent", "data_source_name"):
+            raise ValueError(f"invalid column {column}")
+        with self._connect() as con:
+            rows = con.execute(f"SELECT DISTINCT {column} FROM jobs WHERE site_id = ? AND job_requested_time >= ? AND {column} IS NOT NULL ORDER BY {column}",
+                               (site_id, self._since(days))).fetchall()
+        return [r[0] for r in rows]
+
+    def failure_rate_per_agent_per_day(self, site_id: str, days: int) -> List[dict]:
+        with self._connect() as con:
+            rows = con.execute("""SELECT substr(job_requested_time, 1, 10) AS day, bridge_agent,
+                    COUNT(*) AS jobs, SUM(status = ?) AS failed, ROUND(100.0 * SUM(status = ?) / COUNT(*), 1) AS failure_pct
+                FROM jobs WHERE site_id = ? AND job_requested_time >= ? AND bridge_agent IS NOT NULL
+                GROUP BY day, bridge_agent ORDER BY day DESC, bridge_agent""",
+                (JobStatus.failed, JobStatus.failed, site_id, self._since(days))).fetchall()
+        return [dict(r) for r in rows]
+
+    def run_time_p95_per_data_source(self, site_id: str, days: int) -> List[dict]:
+        # nearest-rank percentile using window functions, sqlite has no percentile aggregate
+        with self._connect() as con:
+            rows = con.execute("""WITH ranked AS (
+                    SELECT data_source_name, run_time_sec,
+                        ROW_NUMBER() OVER (PARTITION BY data_source_name ORDER BY run_time_sec) AS rn,
+                        COUNT(*) OVER (PARTITION BY data_source_name) AS cnt
+                    FROM jobs WHERE site_id = ? AND job_requested_time >= ? AND data_source_name IS NOT NULL AND run_time_sec IS NOT NULL)
+                SELECT data_source_name, MAX(cnt) AS jobs, MIN(CASE WHEN rn >= 0.95 * cnt THEN run_time_sec END) AS p95_run_time_sec,
+                    MAX(run_time_sec) AS max_run_time_sec
+                FROM ranked GROUP BY data_source_name ORDER BY p95_run_time_sec DESC""",
+                (site_id, self._since(days))).fetchall()
+        return [dict(r) for r in rows]
+
+
+class JobStoreSchemaUpgrade:
+    @staticmethod
+    def upgrade_schema(con: sqlite3.Connection):
+        """
+        Upgrades the job store schema to the latest version, tracked in sqlite's user_version.
+        """
+        current_version = con.execute("PRAGMA user_version").fetchone()[0]
+        if current_version == CURRENT_JOB_STORE_SCHEMA_VERSION:
+            return
+        if current_version < 2:
+            # version 1 rows have no parsed columns. The store is a local cache, so rebuild it and let the next sync re-fill it.
+            con.execute("DROP TABLE IF EXISTS jobs")
+            con.execute("""CREATE TABLE jobs (
+                job_id TEXT PRIMARY KEY,
+                site_id TEXT NOT NULL,
+                job_requested_time TEXT,
+                status TEXT,
+                task_type TEXT,
+                bridge_agent TEXT,
+                data_source_name TEXT,
+                run_time_sec INTEGER,
+                queue_time_sec INTEGER,
+                raw_json TEXT NOT NULL)""")
+            con.execute("CREATE INDEX ix_jobs_site_requested ON jobs (site_id, job_requested_time)")
+            con.execute("CREATE INDEX ix_jobs_site_agent ON jobs (site_id, bridge_agent, job_requested_time)")
+            con.execute("CREATE INDEX ix_jobs_site_dsn ON jobs (site_id, data_source_name, job_requested_time)")
+            con.execute("CREATE INDEX ix_jobs_site_status ON jobs (site_id, status, job_requested_time)")
+        if current_version < 3:
+            con.execute("""CREATE TABLE IF NOT EXISTS sync_state (
+                site_id TEXT PRIMARY KEY,
+                watermark TEXT,
+                pending_watermark TEXT,
+                resume_index INTEGER NOT NULL DEFAULT 0)""")
+        con.execute(f"PRAGMA user_version = {CURRENT_JOB_STORE_SCHEMA_VERSION}")
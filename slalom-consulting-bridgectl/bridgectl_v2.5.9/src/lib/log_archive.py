@@ -0,0 +1,230 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List
+
+from src.bridge_logs import BridgeLogFile
+from src.models import LoggerInterface
+
+LOG_ARCHIVE_SUBDIR = "archive_logs"
+LOG_ARCHIVE_MANIFEST = "manifest.json"
+LOG_ARCHIVE_MANIFEST_VERSION = 1
+LOG_ARCHIVE_WORKERS = 2 # files compressed in parallel, zlib releases the GIL while compressing
+LOG_ARCHIVE_COMPRESS_LEVEL = 6
+LOG_ARCHIVE_MAX_GROUP_BYTES = 1024 * 1024 * 1024 # compressed bytes kept per prefix group, the oldest archives beyond this are deleted
+LOG_ARCHIVE_MAX_AGE_DAYS = 90 # archives are deleted this long after they were archived, however old the log itself is
+
+
+@dataclass
+class ArchivedLog:
+    name: str = None # original file name
+    archive_name: str = None # file name in the archive folder, name + .gz, or name for logs archived before compression
+    prefix: str = None
+    size: int = 0 # original bytes
+    compressed_size: int = 0
+    mod_time: float = 0 # of the original file
+    archived_time: float = 0 # when the file was moved to the archive, the age budget counts from this
+
+    def to_bridge_log_file(self, archive_path: str) -> BridgeLogFile:
+        return BridgeLogFile(os.path.join(archive_path, self.archive_name), self.mod_time, self.compressed_size)
+
+
+@dataclass
+class ArchiveBatch:
+    """ files being archived into one archive folder, their manifest is kept in memory until the last one is done """
+    manifest: dict
+    archived: set = field(default_factory=set) # archive names added by the batch, retention doesn't delete these
+    reserved: set = field(default_factory=set) # archive names of files being compressed
+    pending: int = 0
+
+
+class LogArchive:
+    """
+    Archive of older log files in the archive_logs subfolder of a log folder. Files are gzip-compressed by a small
+    background worker pool, so archiving returns right away, and each archive is recorded in a json manifest with its
+    original name, prefix group, sizes and modification time. The manifest keeps listing and retention cheap. While
+    files are queued the manifest of their folder is loaded once and updated in memory, and when the last queued file
+    is done the oldest archives beyond the size and age budgets of the prefix groups are deleted, never the files of
+    that batch, and the manifest is written once. Archives left out of the manifest by an interrupted batch are picked
+    up from the folder by the next load.
+    Archived logs are read back with FileHelper.open_log, which decompresses while reading. Failures of the background
+    workers are reported to logger, the caller's logger only gets the queued count.
+    """
+    def __init__(self, logger: LoggerInterface, max_group_bytes: int = LOG_ARCHIVE_MAX_GROUP_BYTES,
+                 max_age_days: int = LOG_ARCHIVE_MAX_AGE_DAYS, workers: int = LOG_ARCHIVE_WORKERS):
+        self.max_group_bytes = max_group_bytes
+        self.max_age_days = max_age_days
+        self.workers = workers
+        self.logger = logger
+        self._executor = None
+        self._pending = set()
+        self._batches: Dict[str, ArchiveBatch] = {} # archive path -> files being archived there
+        self._lock = threading.Lock() # guards the executor, pending set, batches and manifest files
+
+    @staticmethod
+    def get_archive_path(log_folder: str) -> str:
+        return os.path.join(log_folder, LOG_ARCHIVE_SUBDIR)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def archive_files(self, logger: LoggerInterface, log_folder: str, files: List[BridgeLogFile]) -> (int, str):
+        """
+        Queues the files for compression into the archive folder. Returns the number of queued files and the archive path.
+        """
+        archive_path = self.get_archive_path(log_folder)
+        os.makedirs(archive_path, exist_ok=True)
+        count = 0
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="log_archive")
+            batch = self._batches.get(archive_path) or ArchiveBatch(self._load_manifest(archive_path))
+            for f in files:
+                if f.full_path in self._pending:
+                    continue
+                self._pending.add(f.full_path)
+                batch.pending += 1
+                future = self._executor.submit(self._archive_file, archive_path, batch, f)
+                future.add_done_callback(lambda fut, path=f.full_path: self._on_done(fut, path, archive_path, batch))
+                count += 1
+            if batch.pending:
+                self._batches[archive_path] = batch
+        logger.info(f"archiving {count} files to {archive_path} in the background")
+        return count, archive_path
+
+    def _on_done(self, future: Future, path: str, archive_path: str, batch: ArchiveBatch):
+        with self._lock:
+            self._pending.discard(path)
+            batch.pending -= 1
+            if not future.exception():
+                entry = future.result()
+                batch.manifest[entry.archive_name] = entry
+                batch.archived.add(entry.archive_name)
+            if not batch.pending:
+                del self._batches[archive_path]
+                try:
+                    for prefix in {batch.manifest[n].prefix for n in batch.archived}:
+                        self._enforce_retention(archive_path, batch.manifest, prefix, keep=batch.archived)
+                    self._save_manifest(archive_path, batch.manifest)
+                except OSError as ex:
+                    self.logger.warning(f"unable to update the archive manifest in {archive_path}. {ex}")
+        if future.exception():
+            self.logger.warning(f"archive of {path} failed. {future.exception()}")
+
+    def _archive_file(self, archive_path: str, batch: ArchiveBatch, f: BridgeLogFile) -> ArchivedLog:
+        st = os.stat(f.full_path)
+        with self._lock:
+            archive_name = self._unique_archive_name(archive_path, f.name + ".gz", batch)
+            batch.reserved.add(archive_name)
+        try:
+            target = os.path.join(archive_path, archive_name)
+            with open(f.full_path, "rb") as src, gzip.open(target + ".part", "wb", compresslevel=LOG_ARCHIVE_COMPRESS_LEVEL) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.utime(target + ".part", (st.st_atime, st.st_mtime))
+            os.replace(target + ".part", target)
+            os.remove(f.full_path) # after the archive is complete, so an interrupted archive leaves the original
+            return ArchivedLog(f.name, archive_name, f.prefix, st.st_size, os.path.getsize(target), st.st_mtime, time.time())
+        finally:
+            with self._lock:
+                batch.reserved.discard(archive_name)
+
+    @staticmethod
+    def _unique_archive_name(archive_path: str, archive_name: str, batch: ArchiveBatch) -> str:
+        """ a name that is not in the manifest, the folder or being written by another worker """
+        name, count = archive_name, 1
+        while (name in batch.manifest or name in batch.reserved or os.path.exists(os.path.join(archive_path, name))
+               or os.path.exists(os.path.join(archive_path, name + ".part"))):
+            name = re.sub(r"\.gz$", f".{count}.gz", archive_name)
+            count += 1
+        return name
+
+    def list_archived(self, log_folder: str, search_text: str = None) -> List[ArchivedLog]:
+        """
+        Archived logs of the folder from the manifest, newest first, optionally only those with search_text in the name.
+        """
+        archive_path = self.get_archive_path(log_folder)
+        if not os.path.isdir(archive_path):
+            return []
+        with self._lock:
+            batch = self._batches.get(archive_path)
+            entries = list((batch.manifest if batch else self._load_manifest(archive_path)).values())
+        if search_text:
+            entries = [e for e in entries if search_text.lower() in e.name.lower()]
+        entries.sort(key=lambda e: e.mod_time, reverse=True)
+        return entries
+
+    def enforce_retention(self, log_folder: str) -> int:
+        """
+        Deletes the archives beyond the size and age budgets of every prefix group. Returns the number deleted.
+        """
+        archive_path = self.get_archive_path(log_folder)
+        if not os.path.isdir(archive_path):
+            return 0
+        with self._lock:
+            batch = self._batches.get(archive_path)
+            manifest = batch.manifest if batch else self._load_manifest(archive_path)
+            count = len(manifest)
+            for prefix in {e.prefix for e in manifest.values()}:
+                self._enforce_retention(archive_path, manifest, prefix, keep=batch.archived if batch else frozenset())
+            self._save_manifest(archive_path, manifest)
+            return count - len(manifest)
+
+    def _enforce_retention(self, archive_path: str, manifest: dict, prefix: str, keep: set = frozenset()):
+        """ keep: archive names that count towards the size budget but are not deleted, e.g. the files just archived """
+        min_archived_time = time.time() - self.max_age_days * 24 * 3600
+        group = sorted((e for e in manifest.values() if e.prefix == prefix), key=lambda e: e.mod_time, reverse=True)
+        total = 0
+        for e in group:
+            total += e.compressed_size
+            if e.archive_name in keep:
+                continue
+            if total > self.max_group_bytes or e.archived_time < min_archived_time:
+                try:
+                    os.remove(os.path.join(archive_path, e.archive_name))
+                except FileNotFoundError:
+                    pass
+                del manifest[e.archive_name]
+                total -= e.compressed_size
+
+    def _load_manifest(self, archive_path: str) -> dict:
+        """
+        archive_name -> ArchivedLog. Files in the folder that are not in the manifest, e.g. moved there uncompressed by
+        earlier versions, are added so they are listed and count towards the budgets. When they were archived is not
+        known, their age budget starts when they are first seen.
+        """
+        manifest = {}
+        try:
+            with open(os.path.join(archive_path, LOG_ARCHIVE_MANIFEST)) as f:
+                data = json.load(f)
+            if data.get("version") == LOG_ARCHIVE_MANIFEST_VERSION:
+                manifest = {e["archive_name"]: ArchivedLog(**e) for e in data["files"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        with os.scandir(archive_path) as entries:
+            names = {entry.name: entry for entry in entries if entry.is_file()}
+        for archive_name in [n for n in manifest if n not in names]: # deleted outside of the archive
+            del manifest[archive_name]
+        now = time.time()
+        for name, entry in names.items():
+            if name not in manifest and name != LOG_ARCHIVE_MANIFEST and not name.endswith(".part") and not name.startswith("."):
+                st = entry.stat()
+                original = re.sub(r"(\.\d+)?\.gz$", "", name)
+                manifest[name] = ArchivedLog(original, name, BridgeLogFile(entry.path, st.st_mtime, st.st_size).prefix,
+                                             st.st_size, st.st_size, st.st_mtime, now)
+        return manifest
+
+    @staticmethod
+    def _save_manifest(archive_path: str, manifest: dict):
+        path = os.path.join(archive_path, LOG_ARCHIVE_MANIFEST)
+        with open(path + ".part", "w") as f:
+            json.dump({"version": LOG_ARCHIVE_MANIFEST_VERSION, "files": [asdict(e) for e in manifest.values()]}, f)
+        os.replace(path + ".part", path)
+
+
@@ -0,0 +1,253 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.enums import SCRATCH_DIR
+from src.lib.general_helper import FileHelper
+
+LOG_INDEX_PATH = SCRATCH_DIR / "log_index.db"
+CURRENT_LOG_INDEX_SCHEMA_VERSION = 2
+LOG_INDEX_BATCH_LINES = 5000 # lines inserted per transaction, the indexed offset is saved with each batch so indexing can resume
+LOG_INDEX_OFFSET_BITS = 40 # rowid = file_id << 40 | line offset, so files up to 1 TB
+LOG_INDEX_MAX_LINE_BYTES = 64 * 1024 # only the start of longer lines is indexed
+LOG_INDEX_REBUILD_DEAD_RATIO = 0.5 # rebuild when more than this share of the indexed lines belong to rotated or removed files
+LOG_INDEX_MAX_RESULTS = 500
+
+
+@dataclass
+class LogSearchHit:
+    path: str
+    offset: int
+    ts: str = None
+    k: str = None
+    sev: str = None
+    v: str = None
+    e: str = None
+
+
+class LogIndex:
+    """
+    Persistent full-text index of the k, v and e fields of bridge log lines across files, in an SQLite FTS5 table.
+    The index is contentless, it maps terms to (file, line offset) and the matching lines are read back from the log
+    files, so it doesn't duplicate the logs. Files are indexed incrementally from the last indexed offset as they grow.
+    A rotated or rewritten file gets a new file id, lines of the old id are skipped in results and removed when the
+    index is rebuilt. Archived .gz logs are indexed once and read back decompressed.
+    """
+    def __init__(self, db_path=LOG_INDEX_PATH):
+        self.db_path = db_path
+        self._update_thread = None
+        self._lock = threading.Lock()
+        self.progress = "" # status of the running update, shown on the Logs page
+        self._is_schema_upgraded = False
+
+    @contextmanager
+    def _connect(self):
+        if not self._is_schema_upgraded: # on first use, so importing the module doesn't create the database
+            SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(self.db_path, timeout=30)
+        con.row_factory = sqlite3.Row
+        try:
+            con.execute("PRAGMA journal_mode=WAL") # searches don't block a running update
+            with con: # commit on success, rollback on error
+                if not self._is_schema_upgraded:
+                    LogIndexSchemaUpgrade.upgrade_schema(con)
+                    self._is_schema_upgraded = True
+                yield con
+        finally:
+            con.close()
+
+    def is_updating(self) -> bool:
+        return self._update_thread is not None and self._update_thread.is_alive()
+
+    def update_in_background(self, paths: List[str]) -> threading.Thread:
+        with self._lock:
+            if not self.is_updating():
+                self._update_thread = threading.Thread(target=self.update, args=(paths,), daemon=True, name="log_index_update")
+                self._update_thread.start()
+            return self._update_thread
+
+    def update(self, paths: List[str]) -> int:
+        """
+        Brings the index up to date with paths, which is the full list of log files to index. Files no longer in the
+        list are dropped from results. Returns the number of newly indexed lines.
+        """
+        paths = [os.path.abspath(p) for p in paths]
+        with self._connect() as con:
+            live = {r["path"]: r for r in con.execute("SELECT * FROM files WHERE is_live = 1")}
+            for path in live.keys() - set(paths):
+                con.execute("UPDATE files SET is_live = 0 WHERE file_id = ?", (live[path]["file_id"],))
+        count = 0
+        for i, path in enumerate(paths):
+            self.progress = f"indexing {i + 1} of {len(paths)} files"
+            try:
+                count += self._update_file(path, live.get(path))
+            except OSError: # removed since it was listed
+                pass
+        self.progress = ""
+        if self._get_dead_ratio() > LOG_INDEX_REBUILD_DEAD_RATIO:
+            self.rebuild()
+            count = self.update(paths)
+        return count
+
+    def _update_file(self, path: str, row: Optional[sqlite3.Row]) -> int:
+        st = os.stat(path)
+        is_archive = path.endswith(".gz") # offsets are in the decompressed log, an archive doesn't grow
+        if row and is_archive and row["inode"] == st.st_ino and row["size"] == st.st_size:
+            return 0
+        if row and not is_archive and row["inode"] == st.st_ino and st.st_size >= row["offset"] and row["head"] == FileHelper.hash_file_head(path, row["offset"]):
+            if st.st_size == row["offset"]:
+                return 0
+            file_id, offset = row["file_id"], row["offset"]
+        else: # new, rotated, rewritten or archived file
+            with self._connect() as con:
+                if row:
+                    con.execute("UPDATE files SET is_live = 0 WHERE file_id = ?", (row["file_id"],))
+                file_id = con.execute("INSERT INTO files (path, inode, offset, lines, is_live) VALUES (?, ?, 0, 0, 1)",
+                                      (path, st.st_ino)).lastrowid
+            offset = 0
+        count = 0
+        with FileHelper.open_log(path) as f:
+            f.seek(offset)
+            batch = []
+            for line in f:
+                if not line.endswith(b"\n"): # partly written, indexed on the next update
+                    break
+                text = self._line_text(line[:LOG_INDEX_MAX_LINE_BYTES])
+                if text:
+                    batch.append(((file_id << LOG_INDEX_OFFSET_BITS) | offset, text))
+                offset += len(line)
+                if len(batch) >= LOG_INDEX_BATCH_LINES:
+                    self._insert(file_id, batch, offset, path, st.st_size)
+                    count += len(batch)
+                    batch = []
+            self._insert(file_id, batch, offset, path, st.st_size)
+            count += len(batch)
+        return count
+
+    def _insert(self, file_id: int, batch: list, offset: int, path: str, size: int):
+        head = FileHelper.hash_file_head(path, offset)
+        with self._connect() as con:
+            con.executemany("INSERT INTO log_fts (rowid, text) VALUES (?, ?)", batch)
+            con.execute("UPDATE files SET offset = ?, size = ?, head = ?, lines = lines + ? WHERE file_id = ?",
+                        (offset, size, head, len(batch), file_id))
+
+    @staticmethod
+    def _line_text(line: bytes) -> str:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            return line.decode("utf-8", errors="replace").strip()
+        values = [record.get(c) for c in ("k", "v", "e")]
+        return " ".join(v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for v in values if v is not None)
+
+    def _get_dead_ratio(self) -> float:
+        with self._connect() as con:
+            total, dead = con.execute("SELECT SUM(lines), SUM(CASE WHEN is_live = 0 THEN lines ELSE 0 END) FROM files").fetchone()
+        return dead / total if total else 0
+
+    def rebuild(self):
+        with self._connect() as con:
+            con.execute("INSERT INTO log_fts (log_fts) VALUES ('delete-all')")
+            con.execute("DELETE FROM files")
+
+    @staticmethod
+    def to_fts_query(search_text: str) -> Optional[str]:
+        """
+        All words of the search text must match, a trailing * matches words starting with the prefix.
+        """
+        terms = re.findall(r"[^\W_]+\*?", search_text) # split like the unicode61 tokenizer, so each term is one token
+        return " ".join(f'"{t[:-1]}"*' if t.endswith("*") else f'"{t}"' for t in terms) or None
+
+    def search(self, search_text: str, max_results: int = LOG_INDEX_MAX_RESULTS) -> List[LogSearchHit]:
+        """
+        Matching lines across the indexed files, from the most recently indexed file and the end of each file first.
+        """
+        query = self.to_fts_query(search_text)
+        if not query:
+            return []
+        hits = []
+        with self._connect() as con:
+            live = {r["file_id"]: r["path"] for r in con.execute("SELECT file_id, path FROM files WHERE is_live = 1")}
+            for (rowid,) in con.execute("SELECT rowid FROM log_fts WHERE log_fts MATCH ? ORDER BY rowid DESC", (query,)):
+                path = live.get(rowid >> LOG_INDEX_OFFSET_BITS)
+                if path:
+                    hits.append(LogSearchHit(path, rowid & ((1 << LOG_INDEX_OFFSET_BITS) - 1)))
+                    if len(hits) >= max_results:
+                        break
+        for path in {h.path for h in hits}:
+            try:
+                with FileHelper.open_log(path) as f:
+                    for h in sorted((h for h in hits if h.path == path), key=lambda h: h.offset): # forward seeks only, for .gz
+                        f.seek(h.offset)
+                        self._fill_hit(h, f.readline())
+            except OSError:
+                pass
+        return hits
+
+    @staticmethod
+    def _fill_hit(hit: LogSearchHit, line: bytes):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            hit.v = line.decode("utf-8", errors="replace").rstrip("\r\n")
+            return
+        for c in ("ts", "k", "sev", "v", "e"):
+            value = record.get(c)
+            setattr(hit, c, value if value is None or isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+
+    @staticmethod
+    def read_context(path: str, offset: int, lines_before: int = 20, lines_after: int = 20) -> List[str]:
+        """
+        The lines around a hit, the hit is at index lines_before (or less at the start of the file).
+        """
+        with FileHelper.open_log(path) as f:
+            start = max(offset - lines_before * 2048, 0)
+            f.seek(start)
+            before = f.read(offset - start).split(b"\n")[:-1] # the last element is the empty rest before the hit
+            if start > 0:
+                before = before[1:] # partial line
+            lines = before[-lines_before:] if lines_before else []
+            for _ in range(lines_after + 1):
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line.rstrip(b"\r\n"))
+        return [line.decode("utf-8", errors="replace") for line in lines]
+
+
+class LogIndexSchemaUpgrade:
+    @staticmethod
+    def upgrade_schema(con: sqlite3.Connection):
+        """
+        Upgrades the log index schema to the latest version, tracked in sqlite's user_version.
+        """
+        current_version = con.execute("PRAGMA user_version").fetchone()[0]
+        if current_version == CURRENT_LOG_INDEX_SCHEMA_VERSION:
+            return
+        if current_version < 1:
+            con.execute("""CREATE TABLE files (
+                file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL,
+                inode INTEGER,
+                offset INTEGER NOT NULL,
+                head TEXT,
+                lines INTEGER NOT NULL,
+                is_live INTEGER NOT NULL)""")
+            con.execute("CREATE INDEX ix_files_live_path ON files (is_live, path)")
+            # contentless with detail=none: only term -> rowid is stored, no copy of the text and no positions
+            con.execute("CREATE VIRTUAL TABLE log_fts USING fts5(text, content='', detail=none)")
+        if current_version < 2:
+            con.execute("ALTER TABLE files ADD COLUMN size INTEGER") # file size when last indexed, to skip unchanged archives
+        con.execute(f"PRAGMA user_version = {CURRENT_LOG_INDEX_SCHEMA_VERSION}")
+
+
+LOG_INDEX = LogIndex()
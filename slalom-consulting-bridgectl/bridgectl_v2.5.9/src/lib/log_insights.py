@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field, asdict
+from typing import List
+
+import pandas as pd
+import pyarrow as pa
+
+INSIGHTS_ERROR_SEVERITIES = ["error", "fatal"]
+INSIGHTS_MAX_BUCKETS = 200 # the time bucket is the smallest of INSIGHTS_BUCKETS giving at most this many buckets
+INSIGHTS_BUCKETS = ["1min", "5min", "15min", "1h", "6h", "1D"]
+INSIGHTS_TOP_KEYS = 50
+INSIGHTS_TOP_DURATIONS = 30
+INSIGHTS_PAIRED_EVENT_PATTERN = r"^(begin|end)[-_](.+)$" # e.g. begin-query / end-query
+
+
+@dataclass
+class LogInsights:
+    total_rows: int = 0
+    error_rows: int = 0
+    first_ts: str = None
+    last_ts: str = None
+    bucket: str = None
+    key_counts: List[dict] = field(default_factory=list) # k, count, errors
+    severity_counts: List[dict] = field(default_factory=list) # sev, count
+    error_rate: List[dict] = field(default_factory=list) # time, count, errors, error_pct
+    durations: List[dict] = field(default_factory=list) # event, count, mean_ms, p95_ms, max_ms, total_ms
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**data)
+
+
+def compute_log_insights(table: pa.Table) -> LogInsights:
+    """
+    Aggregates of a parsed log table (see ParsedLogCache) in one vectorized pass: counts per key and severity, the
+    error rate per time bucket, and durations between paired begin-x / end-x events. An end event is paired with the
+    latest begin event of the same name before it.
+    """
+    df = table.select(["ts", "k", "sev"]).to_pandas()
+    insights = LogInsights(total_rows=len(df))
+    if df.empty:
+        return insights
+    df["ts"] = pd.to_datetime(df["ts"], format="ISO8601", errors="coerce", utc=True)
+    df["k"] = df["k"].astype(str).fillna("")
+    df["is_error"] = df["sev"].astype(str).str.lower().isin(INSIGHTS_ERROR_SEVERITIES)
+    insights.error_rows = int(df["is_error"].sum())
+
+    keys = df.groupby("k", observed=True)["is_error"].agg(count="size", errors="sum").sort_values("count", ascending=False)
+    insights.key_counts = keys.head(INSIGHTS_TOP_KEYS).reset_index().to_dict("records")
+    severities = df["sev"].astype(str).value_counts()
+    insights.severity_counts = [{"sev": sev, "count": int(n)} for sev, n in severities.items()]
+
+    timed = df.dropna(subset=["ts"])
+    if not timed.empty:
+        first, last = timed["ts"].min(), timed["ts"].max()
+        insights.first_ts, insights.last_ts = first.isoformat(), last.isoformat()
+        insights.bucket = next((b for b in INSIGHTS_BUCKETS if (last - first) / pd.Timedelta(b) <= INSIGHTS_MAX_BUCKETS), INSIGHTS_BUCKETS[-1])
+        buckets = timed.groupby(timed["ts"].dt.floor(insights.bucket))["is_error"].agg(count="size", errors="sum")
+        buckets["error_pct"] = (100 * buckets["errors"] / buckets["count"]).round(2)
+        buckets.index = buckets.index.map(lambda t: t.isoformat())
+        insights.error_rate = buckets.reset_index(names="time").to_dict("records")
+        insights.durations = _paired_event_durations(timed)
+    for rows in (insights.key_counts, insights.error_rate, insights.durations): # numpy scalars to python, for json
+        for r in rows:
+            for c, v in r.items():
+                r[c] = v.item() if hasattr(v, "item") else v
+    return insights
+
+
+def _paired_event_durations(df: pd.DataFrame) -> List[dict]:
+    events = df["k"].str.extract(INSIGHTS_PAIRED_EVENT_PATTERN, flags=2) # 2 = re.IGNORECASE
+    events.columns = ["kind", "event"]
+    events = events.dropna()
+    if events.empty:
+        return []
+    events["kind"] = events["kind"].str.lower()
+    events["ts"] = df.loc[events.index, "ts"]
+    events["order"] = events.index
+    begins = events[events["kind"] == "begin"][["order", "event", "ts"]]
+    ends = events[events["kind"] == "end"][["order", "event", "ts"]]
+    if begins.empty or ends.empty:
+        return []
+    pairs = pd.merge_asof(ends, begins, on="order", by="event", direction="backward", allow_exact_matches=False, suffixes=("", "_begin"))
+    pairs["ms"] = (pairs["ts"] - pairs["ts_begin"]).dt.total_seconds() * 1000
+    pairs = pairs[pairs["ms"] >= 0]
+    if pairs.empty:
+        return []
+    stats = pairs.groupby("event")["ms"].agg(count="size", mean_ms="mean", p95_ms=lambda x: x.quantile(0.95), max_ms="max", total_ms="sum")
+    stats = stats.sort_values("total_ms", ascending=False).head(INSIGHTS_TOP_DURATIONS).round(1)
+    return stats.reset_index().to_dict("records")
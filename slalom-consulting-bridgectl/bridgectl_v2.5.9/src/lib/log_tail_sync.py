@@ -0,0 +1,86 @@
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import Iterable, Optional
+
+LOG_SYNC_STATE_SUFFIX = ".sync.json" # sync state file kept next to each local copy
+
+
+@dataclass
+class RemoteFileStat:
+    inode: int = 0
+    size: int = 0
+
+    @classmethod
+    def parse(cls, stat_output: str):
+        """ parses the output of `stat -c "%i %s" <file>` """
+        try:
+            inode, size = stat_output.split()
+            return cls(int(inode), int(size))
+        except ValueError:
+            raise ValueError(f"unexpected stat output: {stat_output.strip()[:200]}")
+
+
+@dataclass
+class LogSyncState:
+    source: str = None # container or pod name the local copy was downloaded from
+    inode: int = 0 # inode of the remote file, changes when the bridge rotates the log
+    offset: int = 0 # number of bytes of the remote file held in the local copy
+
+
+class LogTailSync:
+    """
+    Bookkeeping for incremental downloads of append-only remote log files. The sync state of a local copy is kept in a
+    small json file next to it, so a refresh only fetches the bytes appended since the last sync.
+    """
+    @staticmethod
+    def _state_path(local_path) -> str:
+        return f"{local_path}{LOG_SYNC_STATE_SUFFIX}"
+
+    @classmethod
+    def load_state(cls, local_path) -> Optional[LogSyncState]:
+        try:
+            with open(cls._state_path(local_path)) as f:
+                return LogSyncState(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    @classmethod
+    def save_state(cls, local_path, state: LogSyncState):
+        with open(cls._state_path(local_path), "w") as f:
+            json.dump(asdict(state), f)
+
+    @classmethod
+    def clear_state(cls, local_path):
+        if os.path.exists(cls._state_path(local_path)):
+            os.remove(cls._state_path(local_path))
+
+    @staticmethod
+    def can_append(state: Optional[LogSyncState], local_path, source: str, remote: RemoteFileStat) -> bool:
+        """
+        The local copy can be extended with the remote suffix only if it is unchanged since the last sync and the remote
+        file is still the same file (same inode) that has not shrunk, otherwise it was rotated and needs a full download.
+        """
+        if not state or state.source != source or not os.path.exists(local_path):
+            return False
+        return os.path.getsize(local_path) == state.offset and remote.inode == state.inode and remote.size >= state.offset
+
+    @classmethod
+    def append(cls, local_path, chunks: Iterable[bytes], state: LogSyncState) -> int:
+        """
+        Appends the chunks to the local copy and advances the offset by the bytes written. Returns the number of bytes.
+        If the chunks raise, e.g. the remote command failed, the local copy is truncated back to the synced offset and the
+        error is raised; if the process is interrupted, the state is not saved and can_append forces a full download.
+        """
+        written = 0
+        with open(local_path, "ab") as f:
+            try:
+                for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+            except BaseException:
+                f.truncate(state.offset)
+                raise
+        state.offset += written
+        cls.save_state(local_path, state)
+        return written
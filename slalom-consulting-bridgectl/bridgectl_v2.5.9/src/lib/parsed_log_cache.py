@@ -0,0 +1,228 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.docker_client import TempLogsSettings
+from src.lib.general_helper import FileHelper
+from src.lib.log_insights import LogInsights, compute_log_insights
+
+PARSED_LOG_COLUMNS = ["ts", "k", "v", "sev", "e"] # columns shown on the Logs page, the others are not stored
+PARSED_LOG_BATCH_LINES = 20000 # lines parsed at a time, also the parquet row group size, the unit that is read back
+PARSED_LOG_MAX_PARTS = 20 # small parts from appended lines are compacted into one when there are more than this
+PARSED_LOG_HEAD_BYTES = 4096 # start of the file that is compared to detect a file rewritten in place
+PARSED_LOG_SNAPSHOT_VERSION = 3
+
+
+@dataclass
+class ParsedLogState:
+    path: str = None
+    inode: int = 0
+    offset: int = 0 # bytes of the log parsed into the snapshot, always at a line end
+    size: int = 0 # size of the file at the last sync, for an archived .gz log the compressed size
+    head: str = None # hash of the first PARSED_LOG_HEAD_BYTES (or offset) bytes
+    parts: int = 0
+    rows: int = 0
+    severities: List[str] = field(default_factory=list) # distinct values of the whole log, for the filter options
+    keys: List[str] = field(default_factory=list)
+    version: int = PARSED_LOG_SNAPSHOT_VERSION
+
+
+class ParsedLogSnapshot:
+    def __init__(self, snapshot_dir: Path, state: ParsedLogState):
+        self.snapshot_dir = snapshot_dir
+        self.state = state
+
+    def iter_row_groups(self, reverse: bool = False):
+        """
+        Yields (rows, read) for the row groups of up to PARSED_LOG_BATCH_LINES rows, in file order or newest first with
+        reverse. read(columns=None) reads the row group, only the given columns from disk.
+        """
+        parts = range(self.state.parts - 1, -1, -1) if reverse else range(self.state.parts)
+        for i in parts:
+            pf = pq.ParquetFile(self.snapshot_dir / f"part-{i:05d}.parquet")
+            groups = range(pf.num_row_groups - 1, -1, -1) if reverse else range(pf.num_row_groups)
+            for g in groups:
+                yield pf.metadata.row_group(g).num_rows, functools.partial(pf.read_row_group, g)
+
+
+class ParsedLogCache:
+    """
+    Parsed JSON lines logs as columnar parquet snapshots, keyed by file identity (path, inode, start of file) and parsed
+    offset, stored under the temp logs folder so a Streamlit rerun or filter change doesn't re-parse the file. Only the
+    snapshot state is held in memory: readers go through the row groups of PARSED_LOG_BATCH_LINES rows one at a time,
+    reading only the columns they need, so memory stays proportional to the rows kept, not to the log. When a log grows
+    only the appended lines are parsed and added to the snapshot as a new part, a rotated or rewritten log is parsed
+    from the start.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir or TempLogsSettings.temp_bridge_logs_path / "parsed")
+        self._states = {} # path -> ParsedLogState
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open_snapshot(self, path: str):
+        """
+        Parses the new lines of the log into its snapshot and yields the ParsedLogSnapshot, which other threads don't
+        change (e.g. by compacting the parts) until the block exits.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(path, threading.Lock())
+        with key_lock: # concurrent reruns wait for one parse instead of each parsing the file
+            with self._lock:
+                state = self._states.get(path)
+            state = self._sync(path, state or self._load_state(path))
+            with self._lock:
+                self._states[path] = state
+            yield ParsedLogSnapshot(self._snapshot_dir(path), state)
+
+    def get_insights(self, path: str) -> LogInsights:
+        """
+        Aggregates of the parsed log, stored next to the snapshot and recomputed only when new lines were parsed.
+        """
+        with self.open_snapshot(path) as snapshot:
+            insights_file = snapshot.snapshot_dir / "insights.json"
+            try:
+                with open(insights_file) as f:
+                    data = json.load(f)
+                if data["offset"] == snapshot.state.offset:
+                    return LogInsights.from_dict(data["insights"])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+            # only the small columns, not the values and errors that make up most of the log
+            columns = ["ts", "k", "sev"]
+            tables = [read(columns) for _, read in snapshot.iter_row_groups()]
+            insights = compute_log_insights(pa.concat_tables(tables) if tables else self.empty_table().select(columns))
+            insights_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(insights_file, "w") as f:
+                json.dump({"offset": snapshot.state.offset, "insights": insights.to_dict()}, f)
+            return insights
+
+    def _snapshot_dir(self, path: str):
+        return self.cache_dir / hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+
+    def _load_state(self, path: str) -> ParsedLogState:
+        try:
+            with open(self._snapshot_dir(path) / "state.json") as f:
+                state = ParsedLogState(**json.load(f))
+            if state.version == PARSED_LOG_SNAPSHOT_VERSION and state.path == path:
+                return state
+        except (OSError, ValueError, TypeError):
+            pass
+        return ParsedLogState(path)
+
+    def _sync(self, path: str, state: ParsedLogState) -> ParsedLogState:
+        st = os.stat(path)
+        is_archive = path.endswith(".gz") # offsets are in the decompressed log, so a changed archive is parsed from the start
+        is_same_file = (state.inode == st.st_ino and (st.st_size == state.size if is_archive else st.st_size >= state.offset)
+                        and state.head == FileHelper.hash_file_head(path, state.offset, PARSED_LOG_HEAD_BYTES))
+        if is_same_file and st.st_size == state.size:
+            return state
+        snapshot_dir = self._snapshot_dir(path)
+        if not is_same_file: # new, rotated or rewritten log
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            state = ParsedLogState(path, st.st_ino)
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        severities, keys = set(state.severities), set(state.keys)
+        with FileHelper.open_log(path) as f:
+            f.seek(state.offset)
+            for batch, end_offset in self._iter_line_batches(f, state.offset):
+                part = self._parse_lines(batch)
+                pq.write_table(part, snapshot_dir / f"part-{state.parts:05d}.parquet")
+                severities.update(self._distinct(part["sev"]))
+                keys.update(self._distinct(part["k"]))
+                state.parts += 1
+                state.rows += part.num_rows
+                state.offset = end_offset
+        state.severities, state.keys = sorted(severities), sorted(keys)
+        state.head = FileHelper.hash_file_head(path, state.offset, PARSED_LOG_HEAD_BYTES)
+        state.size = st.st_size
+        if state.parts > PARSED_LOG_MAX_PARTS:
+            self._compact(snapshot_dir, state)
+        with open(snapshot_dir / "state.json", "w") as f:
+            json.dump(asdict(state), f)
+        return state
+
+    def _compact(self, snapshot_dir: Path, state: ParsedLogState):
+        """ rewrites the parts as one file of full row groups, holding one row group at a time """
+        target = snapshot_dir / "compacted.parquet.part"
+        pending, pending_rows = [], 0
+        with pq.ParquetWriter(target, self.empty_table().schema) as writer:
+            for i in range(state.parts):
+                pf = pq.ParquetFile(snapshot_dir / f"part-{i:05d}.parquet")
+                for g in range(pf.num_row_groups):
+                    pending.append(pf.read_row_group(g))
+                    pending_rows += pending[-1].num_rows
+                    if pending_rows >= PARSED_LOG_BATCH_LINES:
+                        writer.write_table(pa.concat_tables(pending).combine_chunks(), row_group_size=PARSED_LOG_BATCH_LINES)
+                        pending, pending_rows = [], 0
+            if pending:
+                writer.write_table(pa.concat_tables(pending).combine_chunks(), row_group_size=PARSED_LOG_BATCH_LINES)
+        for i in range(state.parts):
+            os.remove(snapshot_dir / f"part-{i:05d}.parquet")
+        os.replace(target, snapshot_dir / "part-00000.parquet")
+        state.parts = 1
+
+    @staticmethod
+    def _distinct(column) -> List[str]:
+        return [x for chunk in column.chunks for x in chunk.dictionary.to_pylist() if x is not None]
+
+    @staticmethod
+    def _iter_line_batches(f, offset: int):
+        """
+        Yields (lines, offset after the last line) of complete lines, a partly written last line is left for the next sync.
+        """
+        batch = []
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            batch.append(line)
+            offset += len(line)
+            if len(batch) >= PARSED_LOG_BATCH_LINES:
+                yield batch, offset
+                batch = []
+        if batch:
+            yield batch, offset
+
+    @classmethod
+    def _parse_lines(cls, lines: list) -> pa.Table:
+        columns = {c: [] for c in PARSED_LOG_COLUMNS}
+        loads = json.loads
+        for line in lines:
+            try:
+                record = loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                if not line.strip():
+                    continue
+                record = {"v": line.decode("utf-8", errors="replace").rstrip("\r\n")}
+            for c in PARSED_LOG_COLUMNS:
+                columns[c].append(cls._to_text(record.get(c)))
+        return pa.table({c: pa.array(values, pa.string()).dictionary_encode() if c in ("k", "sev") else pa.array(values, pa.string())
+                         for c, values in columns.items()})
+
+    @staticmethod
+    def _to_text(value):
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False) # v and e are often objects, stored as their json text
+
+    @staticmethod
+    def empty_table() -> pa.Table:
+        return pa.table({c: pa.array([], pa.string()).dictionary_encode() if c in ("k", "sev") else pa.array([], pa.string())
+                         for c in PARSED_LOG_COLUMNS})
+
+
+PARSED_LOG_CACHE = ParsedLogCache()
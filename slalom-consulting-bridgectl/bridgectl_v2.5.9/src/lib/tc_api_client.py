@@ -1,15 +1,23 @@
+import atexit
 import json
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from http.client import responses
-from typing import List
-
-import requests
+from typing import List, Dict
 
+from src.lib.general_helper import StringUtils
+from src.lib.tc_api_transport import TC_API_TRANSPORT
 from src.models import PatToken
 
 tc_api_version = "3.24"
 # information about api versions: https://help.tableau.com/current/api/rest_api/en-us/REST/rest_api_concepts_versions.htm
 
+TC_SESSION_MAX_AGE_MINUTES = 90 # re-authenticate before the Tableau Cloud session times out
+TC_SESSION_CACHE_MAX_ENTRIES = 32
+SITE_TOPOLOGY_TTL_SECONDS = 30 # agents, pools and connection status are shared by all pages and tasks for this long
+
 
 @dataclass
 class LoginResult:
@@ -47,7 +55,7 @@ class TableauCloudLogin:
         headers = {
             'accept': 'application/json',
         }
-        r = requests.post(f"{pat.get_pod_url()}/api/{tc_api_version}/auth/signin", json=body, headers=headers, timeout=10)
+        r = TC_API_TRANSPORT.post(f"{pat.get_pod_url()}/api/{tc_api_version}/auth/signin", json=body, headers=headers, timeout=10)
         status_text = f"{responses[r.status_code]}"
         result = LoginResult()
         result.is_success = r.status_code == 200
@@ -73,50 +81,175 @@ class TableauCloudLogin:
             'accept': 'application/json',
             'X-tableau-auth': session_token
         }
-        res_signout = requests.post(f"{pod_url}/api/{tc_api_version}/auth/signout", headers=headers)
+        res_signout = TC_API_TRANSPORT.post(f"{pod_url}/api/{tc_api_version}/auth/signout", headers=headers)
         if not res_signout.ok:
             print(f"Warning. unable to signout. status_code: {res_signout.status_code}, status_text: {res_signout.text}")
 
     @staticmethod
     def is_token_valid(pat: PatToken) -> LoginResult:
+        r = TC_SESSION_CACHE.get_cached(pat)
+        if r:
+            return r
+        # not cached: don't keep the session open, the PAT is usually about to be handed to a bridge agent.
         r=TableauCloudLogin.login(pat)
         if r.is_success:
             TableauCloudLogin.logout(pat.get_pod_url(), r.session_token)
         return r
 
 
+@dataclass
+class CachedSession:
+    login_result: LoginResult
+    secret_hash: str
+    created: float
+
+
+class TableauSessionCache:
+    """
+    Process wide cache of Tableau Cloud sign-in sessions keyed by (pod_url, sitename, token name), shared by the
+    streamlit script threads and the background tasks. Sessions are reused until they reach max age, and are only signed
+    out when evicted, released, or at process shutdown.
+    """
+    def __init__(self, max_age_minutes: float = TC_SESSION_MAX_AGE_MINUTES, max_entries: int = TC_SESSION_CACHE_MAX_ENTRIES):
+        self.max_age_seconds = max_age_minutes * 60
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(pat: PatToken):
+        return pat.get_pod_url(), pat.sitename, pat.name
+
+    def _is_live(self, entry: CachedSession, pat: PatToken) -> bool:
+        return (time.monotonic() - entry.created < self.max_age_seconds
+                and entry.secret_hash == StringUtils.hash_string(pat.secret or ""))
+
+    def get_cached(self, pat: PatToken) -> LoginResult or None:
+        key = self._key(pat)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry and self._is_live(entry, pat):
+                self._sessions.move_to_end(key)
+                return entry.login_result
+        return None
+
+    def login(self, pat: PatToken, raise_if_not_success: bool = False) -> LoginResult:
+        r = self.get_cached(pat)
+        if r:
+            return r
+        key = self._key(pat)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock: # only one thread signs in per token, the others wait and reuse its session
+            r = self.get_cached(pat)
+            if r:
+                return r
+            r = TableauCloudLogin.login(pat, raise_if_not_success)
+            if not r.is_success:
+                return r
+            self._put(key, CachedSession(r, StringUtils.hash_string(pat.secret), time.monotonic()))
+            return r
+
+    def _put(self, key, entry: CachedSession):
+        evicted = []
+        with self._lock:
+            old = self._sessions.pop(key, None)
+            if old:
+                evicted.append(old)
+            self._sessions[key] = entry
+            while len(self._sessions) > self.max_entries:
+                _, e = self._sessions.popitem(last=False)
+                evicted.append(e)
+        for e in evicted:
+            self._logout(e)
+
+    def renew(self, pat: PatToken, stale_session_token: str) -> LoginResult:
+        """
+        Called after a 401. Drops the cached session if it still holds the stale token (another thread may already have
+        renewed it) and signs in again.
+        """
+        key = self._key(pat)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry and entry.login_result.session_token == stale_session_token:
+                self._sessions.pop(key)
+        return self.login(pat, True)
+
+    def release(self, pat: PatToken):
+        """
+        Sign out and forget the cached session for this PAT. A PAT can only hold one session, so this must be called before
+        the PAT is handed to a bridge agent.
+        """
+        with self._lock:
+            entry = self._sessions.pop(self._key(pat), None)
+        if entry:
+            self._logout(entry)
+
+    @staticmethod
+    def _logout(entry: CachedSession):
+        try:
+            TableauCloudLogin.logout(entry.login_result.tc_pod_url, entry.login_result.session_token)
+        except Exception as ex:
+            print(f"Warning. unable to signout. {ex}")
+
+    def close(self):
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for e in entries:
+            self._logout(e)
+
+
+TC_SESSION_CACHE = TableauSessionCache()
+atexit.register(TC_SESSION_CACHE.close)
+
+
 class TCApiClient:
     _headers = {'Accept': 'application/json',
                 'Content-Type': 'application/json'}
     xsrf_value = "9f3WV3ekuJmVEA" # this can be any string, it is used by the server to prevent cross-site scripting attacks.
 
-    def __init__(self, login_result: LoginResult):
+    def __init__(self, login_result: LoginResult, pat: PatToken = None):
         self.session_token = login_result.session_token
         self.tc_pod_url = login_result.tc_pod_url
         self.site_luid = login_result.site_luid
+        self.pat = pat # when set, an expired session (401) is renewed through TC_SESSION_CACHE and the call is retried once
 
-    def _post_private(self, url_part: str, body: dict):
-        header_values = {**self._headers, **{
+    def _private_headers(self):
+        return {**self._headers, **{
             "X-Xsrf-Token": self.xsrf_value,
             "Cookie": f"workgroup_session_id={self.session_token}; XSRF-TOKEN={self.xsrf_value}"
         }}
-        r = requests.post(f"{self.tc_pod_url}{url_part}", headers=header_values, json=body)
+
+    def _public_headers(self):
+        return {**self._headers, **{
+            "X-tableau-auth": self.session_token
+        }}
+
+    def _send(self, method: str, url_part: str, get_headers, timeout=None, idempotent: bool = False, **kwargs):
+        url = f"{self.tc_pod_url}{url_part}"
+        r = TC_API_TRANSPORT.request(method, url, timeout, idempotent, headers=get_headers(), **kwargs)
+        if r.status_code == 401 and self.pat:
+            login_result = TC_SESSION_CACHE.renew(self.pat, self.session_token)
+            self.session_token = login_result.session_token
+            self.site_luid = login_result.site_luid
+            r = TC_API_TRANSPORT.request(method, url, timeout, idempotent, headers=get_headers(), **kwargs)
+        return r
+
+    def _post_private(self, url_part: str, body: dict, timeout=None, idempotent: bool = False):
+        """ idempotent: the call only reads, so the transport may retry it after a 5xx or a read error """
+        r = self._send("POST", url_part, self._private_headers, timeout, idempotent, json=body)
         r.raise_for_status()
         return json.loads(r.content)
     
-    def _get_public(self, url_part: str):
-        header_values = {**self._headers, **{
-            "X-tableau-auth": self.session_token
-        }}
-        r = requests.get(f"{self.tc_pod_url}{url_part}", headers=header_values)
+    def _get_public(self, url_part: str, timeout=None):
+        r = self._send("GET", url_part, self._public_headers, timeout)
         r.raise_for_status()
         return json.loads(r.content)
 
-    def _post_public(self, url_part: str, payload: dict):
-        header_values = {**self._headers, **{
-            "X-tableau-auth": self.session_token
-        }}
-        r = requests.post(f"{self.tc_pod_url}{url_part}", headers=header_values, json=payload)
+    def _post_public(self, url_part: str, payload: dict, timeout=None, idempotent: bool = False):
+        r = self._send("POST", url_part, self._public_headers, timeout, idempotent, json=payload)
         if r.status_code != 200:
             error_message = f"Status code: {r.status_code}. Response: {r.text}"
             raise RuntimeError(error_message)
@@ -132,13 +265,13 @@ class TCApiClient:
                 "id": site_id
             }
         }
-        return self._post_private("/vizportal/api/web/v1/getSiteBridgeSettingsForSiteAdmin", body)
+        return self._post_private("/vizportal/api/web/v1/getSiteBridgeSettingsForSiteAdmin", body, idempotent=True)
 
     def get_agent_connection_status(self):
         body = {
             "method": "getSiteRemoteAgentsConnectionStatus",
             "params": {}}
-        return self._post_private("/vizportal/api/web/v1/getSiteRemoteAgentsConnectionStatus", body)
+        return self._post_private("/vizportal/api/web/v1/getSiteRemoteAgentsConnectionStatus", body, idempotent=True)
 
     def get_edge_pools(self, site_id: str):
         body = {
@@ -147,7 +280,7 @@ class TCApiClient:
                 "siteId": site_id
             }
         }
-        return self._post_private("/vizportal/api/web/v1/getEdgePools", body)
+        return self._post_private("/vizportal/api/web/v1/getEdgePools", body, idempotent=True)
 
     def delete_bridge_agent(self, owner_id: str, device_id: str):
         body = {"method": "deleteUserRemoteAgents",
@@ -155,14 +288,16 @@ class TCApiClient:
                     "ownerId": owner_id,
                     "deviceIds": [device_id]
                 }}
-        return self._post_private("/vizportal/api/web/v1/deleteUserRemoteAgents", body)
+        ret = self._post_private("/vizportal/api/web/v1/deleteUserRemoteAgents", body)
+        SITE_TOPOLOGY_CACHE.invalidate(self.tc_pod_url)
+        return ret
 
     def get_session_info(self):
         body = {
             "method": "getSessionInfo",
             "params": {}
         }
-        return self._post_private(f'/vizportal/api/web/v1/getSessionInfo', body)
+        return self._post_private(f'/vizportal/api/web/v1/getSessionInfo', body, idempotent=True)
 
 
 @dataclass
@@ -177,115 +312,119 @@ class BridgeAgentPool:
     pool_id: str = None
     pool_name: str = None
 
-class TCApiLogic:
-    def __init__(self, login_result: LoginResult):
-        self.api = TCApiClient(login_result)
-
-    def get_pools_for_site(self, site_id):
-        pass
+@dataclass
+class SiteTopologySnapshot:
+    """
+    Bridge agents, pools and agent connection status of a site, built from one getEdgePools and one
+    getSiteRemoteAgentsConnectionStatus response. Lookups are dicts keyed by agent name and pool id.
+    """
+    agents: Dict[str, dict] # agentName -> agent dict from getEdgePools with poolId and poolName added
+    pools: Dict[str, BridgePool] # pool id -> user defined pool
+    agent_pools: Dict[str, BridgeAgentPool] # agentName -> pool mapping, including (default) and (unassigned)
+    connection_status: Dict[str, str] # agentName -> connectionStatus
+    created: float = 0
 
-    def get_bridge_status(self, site_id):
-        # Get connection status
-        status_ret = self.api.get_agent_connection_status()
-        status = {}
+    @staticmethod
+    def from_responses(pools_ret: dict, status_ret: dict) -> 'SiteTopologySnapshot':
+        snapshot = SiteTopologySnapshot({}, {}, {}, {}, time.monotonic())
         if "result" in status_ret and "agents" in status_ret["result"]:
             for b in status_ret["result"]["agents"]:
-                status[b["agentName"]] = b["connectionStatus"]
-
-        # Get pools information
-        pools_ret = self.api.get_edge_pools(site_id)
-        agents = []
-        
-        # Safely extract pool information
-        if "result" in pools_ret:
-            result = pools_ret["result"]
-            success_data = result.get("success", {})
-            user_pools = success_data.get("userDefinedPools", {})
-            for pool in user_pools.values():
-                for agent in pool.get("agents", {}).values():
-                    agent["poolName"] = pool.get("displayName", "Unknown Pool")
-                    agents.append(agent)
-            default_agents = success_data.get("defaultPoolAgents", {})
-            for agent in default_agents.values():
-                agent["poolName"] = "(default)"
-                agents.append(agent)
-            unassigned_agents = success_data.get("unassignedAgents", {})
-            for agent in unassigned_agents.values():
-                agent["poolName"] = "(unassigned)"
-                agents.append(agent)
-
-        # Create rows with safe dictionary access
-        rows = []
-        for b in agents:
-            rows.append([
+                snapshot.connection_status[b["agentName"]] = b["connectionStatus"]
+
+        success = pools_ret.get("result", {}).get("success", {})
+        for pool_id, pool in success.get("userDefinedPools", {}).items():
+            pool_name = pool.get("displayName", "Unknown Pool")
+            snapshot.pools[pool_id] = BridgePool(pool.get("id", pool_id), pool_name)
+            for agent_id, agent in pool.get("agents", {}).items():
+                snapshot._add_agent(agent_id, agent, pool_id, pool_name)
+        for agent_id, agent in success.get("defaultPoolAgents", {}).items():
+            snapshot._add_agent(agent_id, agent, "default", "(default)")
+        for agent_id, agent in success.get("unassignedAgents", {}).items():
+            snapshot._add_agent(agent_id, agent, "unassigned", "(unassigned)")
+        return snapshot
+
+    def _add_agent(self, agent_id: str, agent: dict, pool_id: str, pool_name: str):
+        agent = {**agent, "poolId": pool_id, "poolName": pool_name}
+        name = agent.get("agentName") or agent_id
+        self.agents[name] = agent
+        self.agent_pools[name] = BridgeAgentPool(agent_id, name, pool_id, pool_name)
+
+    def get_pool_name(self, agent_name: str) -> str or None:
+        bap = self.agent_pools.get(agent_name)
+        return bap.pool_name if bap else None
+
+    def get_status_rows(self) -> list:
+        return [[
                 b.get("agentName", "Unknown"),
                 b.get("poolName", "Unknown"),
                 b.get("ownerFriendlyName", "Unknown"),
                 b.get("version", ""),
-                status.get(b.get("agentName", ""), "Unknown"),
+                self.connection_status.get(b.get("agentName", ""), "Unknown"),
                 b.get("lastUsed", "")
-            ])
-        
-        return rows
+            ] for b in self.agents.values()]
+
+
+class SiteTopologyCache:
+    """
+    Process wide, short lived cache of SiteTopologySnapshot keyed by (pod url, site id), so the Status, Jobs and Health
+    Monitor pages and the health monitor task share one pair of API calls instead of each calling getEdgePools.
+    """
+    def __init__(self, ttl_seconds: float = SITE_TOPOLOGY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._snapshots = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _get_fresh(self, key) -> SiteTopologySnapshot or None:
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot and time.monotonic() - snapshot.created < self.ttl_seconds:
+            return snapshot
+        return None
+
+    def get(self, api: TCApiClient, site_id: str) -> SiteTopologySnapshot:
+        key = (api.tc_pod_url, site_id)
+        snapshot = self._get_fresh(key)
+        if snapshot:
+            return snapshot
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock: # concurrent callers wait for one fetch instead of each calling the API
+            snapshot = self._get_fresh(key)
+            if snapshot:
+                return snapshot
+            snapshot = SiteTopologySnapshot.from_responses(api.get_edge_pools(site_id), api.get_agent_connection_status())
+            with self._lock:
+                self._snapshots[key] = snapshot
+            return snapshot
+
+    def invalidate(self, pod_url: str = None):
+        with self._lock:
+            for key in [k for k in self._snapshots if pod_url is None or k[0] == pod_url]:
+                del self._snapshots[key]
+
+
+SITE_TOPOLOGY_CACHE = SiteTopologyCache()
+
+
+class TCApiLogic:
+    def __init__(self, login_result: LoginResult, pat: PatToken = None):
+        self.api = TCApiClient(login_result, pat)
+
+    def get_pools_for_site(self, site_id):
+        pass
+
+    def get_site_topology(self, site_id) -> SiteTopologySnapshot:
+        return SITE_TOPOLOGY_CACHE.get(self.api, site_id)
+
+    def get_bridge_status(self, site_id):
+        return self.get_site_topology(site_id).get_status_rows()
 
     def get_pool_list(self, site_id) -> List[BridgePool]:
-        pool_response = self.api.get_edge_pools(site_id)
-        pool_list = []
-        if "success" not in pool_response["result"] or "userDefinedPools" not in pool_response["result"]["success"]:
-            return pool_list
-        for k, v in pool_response["result"]["success"]["userDefinedPools"].items():
-            bp = BridgePool(v["id"], v["displayName"])
-            pool_list.append(bp)
-        return pool_list
+        return list(self.get_site_topology(site_id).pools.values())
 
     def get_bridge_pool_mapping(self, site_id) -> List[BridgeAgentPool]:
-        pool_response = self.api.get_edge_pools(site_id)
-        mappings = []
-        
-        if "success" not in pool_response["result"]:
-            return mappings
-            
-        success = pool_response["result"]["success"]
-        
-        # Process user-defined pools
-        if "userDefinedPools" in success:
-            for pool_id, pool_data in success["userDefinedPools"].items():
-                pool_name = pool_data["displayName"]
-                
-                # Process agents in this pool
-                if "agents" in pool_data:
-                    for agent_id, agent_data in pool_data["agents"].items():
-                        mapping = BridgeAgentPool(
-                            agent_id=agent_id,
-                            agent_name=agent_data["agentName"],
-                            pool_id=pool_id,
-                            pool_name=pool_name
-                        )
-                        mappings.append(mapping)
-        
-        # Process default pool agents
-        if "defaultPoolAgents" in success:
-            for agent_id, agent_data in success["defaultPoolAgents"].items():
-                mapping = BridgeAgentPool(
-                    agent_id=agent_id,
-                    agent_name=agent_data["agentName"],
-                    pool_id="default",
-                    pool_name="(default)"
-                )
-                mappings.append(mapping)
-                
-        # Process unassigned agents
-        if "unassignedAgents" in success:
-            for agent_id, agent_data in success["unassignedAgents"].items():
-                mapping = BridgeAgentPool(
-                    agent_id=agent_id,
-                    agent_name=agent_data["agentName"],
-                    pool_id="unassigned",
-                    pool_name="(unassigned)"
-                )
-                mappings.append(mapping)
-                
-        return mappings
+        return list(self.get_site_topology(site_id).agent_pools.values())
 
     def does_token_have_site_admin_privileges(self) -> (bool, str):
         ret = self.api.get_session_info()
@@ -1,8 +1,6 @@
 import json
 from http.client import responses
-from typing import List
-
-import requests
+from typing import List, Iterator
 
 from src.lib.tc_api_client import tc_api_version, TCApiClient
 
@@ -11,10 +9,7 @@ from src.lib.tc_api_client import tc_api_version, TCApiClient
 
 class TCApiClientJobs(TCApiClient):
     def get_jobs_public(self) -> dict:
-        headers = {**self._headers, **{
-            'X-Tableau-Auth': self.session_token
-        }}
-        r = requests.get(f"{self.tc_pod_url}/api/{tc_api_version}/sites/{self.site_luid}/jobs", headers=headers)
+        r = self._send("GET", f"/api/{tc_api_version}/sites/{self.site_luid}/jobs", self._public_headers)
         status_text = f"{responses[r.status_code]}"
         if r.status_code != 200:
             raise Exception(f"unable to get jobs. {status_text}, {r.content}")
@@ -22,22 +17,25 @@ class TCApiClientJobs(TCApiClient):
         response = json.loads(r.content)
         return response
 
-    def get_jobs_sorted(self, site_id):
+    def get_jobs_sorted(self, site_id, start_index: int = 0, max_items: int = 1000, job_ids: List[str] = None):
         """
-        get jobs from Tableau Cloud Private api
+        get one page of jobs from Tableau Cloud Private api, newest first, optionally only the jobs with the given ids
         """
+        clauses = [
+            {"operator": "in", "field": "taskType", "values":
+                [   "Extract",
+                    "Bridge"]},
+            {"operator": "eq", "field": "siteId", "value": site_id}
+        ]
+        if job_ids:
+            clauses.append({"operator": "in", "field": "id", "values": job_ids})
         body = {
             "method": "getBackgroundJobs",
             "params": {"filter":
                 {"operator": "and",
-                 "clauses": [
-                    {"operator": "in", "field": "taskType", "values":
-                        [   "Extract",
-                            "Bridge"]},
-                    {"operator": "eq", "field": "siteId", "value": site_id}
-                ]},
+                 "clauses": clauses},
                "order": [{"field": "jobRequestedTime", "ascending": False}],
-               "page": {"startIndex": 0, "maxItems": 1000}}
+               "page": {"startIndex": start_index, "maxItems": max_items}}
         }
         # ["Extract",
         #  "Flow",
@@ -47,10 +45,33 @@ class TCApiClientJobs(TCApiClient):
         #  "Bridge",
         #  "Acceleration"]
 
-        return self._post_private("/vizportal/api/web/v1/getBackgroundJobs", body)
+        return self._post_private("/vizportal/api/web/v1/getBackgroundJobs", body, idempotent=True)
+
+    def iter_jobs_pages(self, site_id, page_size: int = 1000, start_index: int = 0) -> Iterator[List[dict]]:
+        """
+        lazily yield pages of jobs, newest first, following moreItems until the last page.
+        """
+        while True:
+            result = self.get_jobs_sorted(site_id, start_index, page_size).get("result", {})
+            page = result.get("backgroundJobs", [])
+            if page:
+                yield page
+            if not result.get("moreItems") or not page:
+                return
+            start_index += len(page)
+
+    def iter_jobs(self, site_id, page_size: int = 1000, start_index: int = 0) -> Iterator[dict]:
+        for page in self.iter_jobs_pages(site_id, page_size, start_index):
+            yield from page
+
+    def get_jobs_by_ids(self, site_id, job_ids: List[str], batch_size: int = 100) -> List[dict]:
+        jobs = []
+        for i in range(0, len(job_ids), batch_size):
+            batch = job_ids[i:i + batch_size]
+            jobs += self.get_jobs_sorted(site_id, 0, len(batch), batch).get("result", {}).get("backgroundJobs", [])
+        return jobs
 
-    # @json_file_cache("jobs_cache.json")
-    def get_job_detail(self, job_id):
+    def get_job_detail(self, job_id, timeout=None):
         """
         get job detail from Tableau Cloud Private api
         """
@@ -59,7 +80,7 @@ class TCApiClientJobs(TCApiClient):
             "params": {
                 "backgroundJobId": job_id}
         }
-        return self._post_private("/vizportal/api/web/v1/getBackgroundJobExtendedInfo", body)
+        return self._post_private("/vizportal/api/web/v1/getBackgroundJobExtendedInfo", body, timeout, idempotent=True)
 
     def start_tasks(self, task_ids: List[str]):
         body = {
@@ -95,7 +116,7 @@ class TCApiClientJobs(TCApiClient):
               "maxItems": 10
             }
         }
-        tasks_result = self._post_private("/vizportal/api/web/v1/getExtractTasks", body)
+        tasks_result = self._post_private("/vizportal/api/web/v1/getExtractTasks", body, idempotent=True)
         tasks = tasks_result.get("result", {}).get("tasks", [])
         datasources = tasks_result.get("result", {}).get("datasources", [])
         for task in tasks:
@@ -31,7 +31,7 @@ class TCApiClientVizQl(TCApiClient):
                 "datasourceLuid": datasource_luid
             }
         }
-        response = self._post_public("/api/v1/vizql-data-service/read-metadata", payload)
+        response = self._post_public("/api/v1/vizql-data-service/read-metadata", payload, idempotent=True)
         if json_response:
             return response["data"]
         else:
@@ -55,7 +55,7 @@ class TCApiClientVizQl(TCApiClient):
             "query": query
         }
         url_part = f"/api/v1/vizql-data-service/query-datasource"
-        r = self._post_public(url_part, payload)
+        r = self._post_public(url_part, payload, idempotent=True)
         return r
 
     def get_datasources_list(self) -> List[PublishedDataSource]:
@@ -0,0 +1,112 @@
+import atexit
+import threading
+from dataclasses import dataclass
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TC_API_POOL_MAXSIZE = 10 # max keep-alive connections held open per Tableau Cloud pod url
+TC_API_MAX_RETRIES = 3
+TC_API_BACKOFF_FACTOR = 0.5 # sleeps 0.5s, 1s, 2s between retries
+TC_API_RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+TC_API_IDEMPOTENT_METHODS = Retry.DEFAULT_ALLOWED_METHODS | {"POST"} # for POST calls the caller marked as read-only
+TC_API_TIMEOUT = (5, 60) # (connect, read) seconds
+
+
+@dataclass
+class TransportStats:
+    sessions: int = 0
+    requests: int = 0
+    connections_opened: int = 0
+
+    @property
+    def connections_reused(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+
+class TCApiTransport:
+    """
+    Shared HTTP transport for the Tableau Cloud APIs. Holds one keep-alive requests.Session per pod url so that
+    consecutive calls reuse the same TCP+TLS connection, and retries with backoff on 429/5xx responses.
+    POST is not retried after the request was sent, unless the caller passes idempotent=True (e.g. the vizportal list
+    and query calls), so calls that change state like signin or runExtractTasks are sent at most once.
+    """
+    def __init__(self, pool_maxsize: int = TC_API_POOL_MAXSIZE, max_retries: int = TC_API_MAX_RETRIES,
+                 backoff_factor: float = TC_API_BACKOFF_FACTOR, timeout=TC_API_TIMEOUT):
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _pod_key(url: str) -> str:
+        u = urlparse(url)
+        return f"{u.scheme}://{u.netloc}".lower()
+
+    def _new_session(self, idempotent: bool) -> requests.Session:
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=TC_API_RETRY_STATUS_CODES,
+            allowed_methods=TC_API_IDEMPOTENT_METHODS if idempotent else Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False # return the last response so callers can inspect the status code
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        # auth is passed explicitly per call, so don't let server cookies from one PAT session leak into calls made with another.
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get_session(self, url: str, idempotent: bool = False) -> requests.Session:
+        """ idempotent sessions also retry POST, the retry policy is set per adapter so they are kept separately """
+        key = (self._pod_key(url), idempotent)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._new_session(idempotent)
+                self._sessions[key] = session
+            return session
+
+    def request(self, method: str, url: str, timeout=None, idempotent: bool = False, **kwargs) -> requests.Response:
+        return self.get_session(url, idempotent).request(method, url, timeout=timeout or self.timeout, **kwargs)
+
+    def get(self, url: str, timeout=None, **kwargs) -> requests.Response:
+        return self.request("GET", url, timeout, **kwargs)
+
+    def post(self, url: str, timeout=None, idempotent: bool = False, **kwargs) -> requests.Response:
+        return self.request("POST", url, timeout, idempotent, **kwargs)
+
+    def get_stats(self) -> TransportStats:
+        stats = TransportStats()
+        with self._lock:
+            sessions = list(self._sessions.values())
+        stats.sessions = len(sessions)
+        for s in sessions:
+            for adapter in set(s.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    stats.requests += pool.num_requests
+                    stats.connections_opened += pool.num_connections
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for s in sessions:
+            s.close()
+
+
+TC_API_TRANSPORT = TCApiTransport()
+atexit.register(TC_API_TRANSPORT.close)
@@ -4,7 +4,7 @@ from typing import List
 
 import streamlit as st
 
-from src.lib.tc_api_client import TableauCloudLogin
+from src.lib.tc_api_client import TC_SESSION_CACHE
 from src.lib.tc_api_client_vizql import TCApiClientVizQl, PublishedDataSource
 from src.models import AppSettings, PatToken
 from src.page.ui_lib.page_util import PageUtil
@@ -110,8 +110,8 @@ def page_content():
         if not admin_pat:
             st.warning("Please add an admin PAT to your settings")
         else:
-            login_result = TableauCloudLogin.login(admin_pat, True)
-            tc_client = TCApiClientVizQl(login_result)
+            login_result = TC_SESSION_CACHE.login(admin_pat, True)
+            tc_client = TCApiClientVizQl(login_result, admin_pat)
             data_sources = tc_client.get_datasources_list()
             data_sources.sort(key=lambda ds: ds.name.lower())
             show_select_datasource_dialog(app, data_sources, tc_client, admin_pat)
@@ -3,6 +3,7 @@ import os
 from pathlib import Path
 import time
 
+import pandas as pd
 import streamlit as st
 
 from src.bridge_container_builder import bridge_client_config_filename, buildimg_path
@@ -12,7 +13,8 @@ from src.docker_client import DockerClient
 from src.lib.general_helper import StringUtils
 from src.page.ui_lib.page_util import PageUtil
 from src.page.ui_lib.stream_logger import StreamLogger
-from src.page.ui_lib.update_bridge_ui import show_upgrade_dialog, show_scale_up_dialog
+from src.page.ui_lib.update_bridge_ui import show_upgrade_dialog, show_scale_up_dialog, show_bulk_operation_progress
+from src.task.container_stats_task import CONTAINER_STATS_TASK
 
 
 @st.dialog("Remove Bridge Container", width="large")
@@ -148,6 +150,14 @@ def btn_detail(container_name):
     c1.metric("cpu", f"{details.cpu_usage_pct:.2f}%")
     c2.metric("mem", f"{details.mem_usage_mb:.2f}Mb")
     c3.metric("disk", details.disk_usage)
+    history = CONTAINER_STATS_TASK.get_history(container_name)
+    if history and len(history["timestamp"]) > 1:
+        df = pd.DataFrame(history)
+        df["time"] = pd.to_datetime(df["timestamp"], unit="s")
+        st.caption(f"last {len(df)} samples from the stats collector")
+        h1, h2 = st.columns(2)
+        h1.line_chart(df, x="time", y="cpu_usage_pct", height=180)
+        h2.line_chart(df, x="time", y="mem_usage_mb", height=180)
     st.markdown(f"JDBC Drivers: `{details.jdbc_drivers}`", help="list `.jar` files found in /opt/tableau/tableau_driver/jdbc")
     st.markdown(f"ODBC Drivers: `{details.odbc_drivers}`", help="ODBC entries returned by `odbcinst -q -d`")
     if details.network_mode:
@@ -157,6 +167,42 @@ def btn_detail(container_name):
         for vm in details.volume_mounts:
             st.markdown(f"  - `{vm}`")
 
+def show_container_row(c, details, idx: int, cols, status_cell, include_stats: bool):
+    # Container name and status with site/pool info
+    status_icon = "🟢" if c.status == "running" else "🔴"
+    site_name = details.labels.get(ContainerLabels.tableau_sitename, "")
+    pool_name = details.labels.get(ContainerLabels.tableau_pool_name, "")
+    status_text = f"{status_icon} {c.status}"
+    if site_name or pool_name:
+        status_text += f" 🌐 {site_name}"
+        if pool_name:
+            status_text += f" · {pool_name}"
+    cell = status_cell.container()
+    cell.markdown(status_text)
+    if include_stats:
+        cell.caption(f"cpu `{details.cpu_usage_pct:.2f}%` · mem `{details.mem_usage_mb:.0f}Mb` · disk `{details.disk_usage}`")
+    if details.error:
+        cell.caption(f"⚠️ partial details: {details.error}")
+
+    # Action buttons with consistent widths
+    if cols[2].button(":material/info: Detail", key=f"detail_{idx}", use_container_width=True):
+        btn_detail(c.name)
+    if cols[3].button(":material/web_stories: Log", key=f"logs_{idx}", use_container_width=True, help="Stdout logs"):
+        btn_stout_logs(c.name)
+
+    # Group additional actions in expander
+    with cols[4].expander("More Actions"):
+        col1, col2 = st.columns(2)
+        if col1.button(":material/delete: Remove", key=f"rm_{idx}", use_container_width=True):
+            remove_container_dialog(c.name)
+        if col2.button(":material/settings: Config", key=f"config_{idx}", use_container_width=True):
+            edit_bridge_client_configuration(c.name)
+        col1, col2 = st.columns(2)
+        if col1.button(":material/folder_zip: Zip Logs", key=f"zip_{idx}", use_container_width=True, help="Collect all bridge logs and download as a zip file"):
+            btn_zip_logs(c.name)
+        if col2.button(":material/refresh: Restart", key=f"restart_{idx}", use_container_width=True):
+            restart_container(c.name)
+
 def show_running_dockers():
     col1, col2 = st.columns([1,1])
     col1.markdown("### Local Bridge Containers")
@@ -166,57 +212,35 @@ def show_running_dockers():
         show_upgrade_dialog()
     if col2b.button(":material/trending_up: Scale Up", key="scale_up", use_container_width=True):
         show_scale_up_dialog()
+    show_bulk_operation_progress()
 
+    include_stats = st.columns([3,1])[1].toggle("cpu / mem / disk", help="Collect hardware stats and drivers for all containers. Containers are queried in parallel.")
     cont1 = st.container()
 
     with st.spinner(""):
         docker_client = DockerClient(StreamLogger(st.container()))
         if not docker_client.is_docker_available():
             return
+        CONTAINER_STATS_TASK.ensure_started()
         containers = docker_client.get_containers_list(DockerClient.bridge_prefix)
         if not containers:
             st.info("🔍 No local bridge containers found. Use the Run Bridge Container page to start one.")
             return
 
+        # create the rows in list order up front, then fill each one in as its details arrive
+        rows = {}
         for idx, c in enumerate(containers):
             cont = cont1.container()
             cols = cont.columns([2, 2, 1, 1, 2])
-            
-            # Container name and status with site/pool info
-            status_icon = "🟢" if c.status == "running" else "🔴"
             cols[0].markdown(f"**🐳 {c.name}**")
-            
-            # Get container details for labels
-            details = docker_client.get_container_details(c.name, False)
-            site_name = details.labels.get(ContainerLabels.tableau_sitename, "")
-            pool_name = details.labels.get(ContainerLabels.tableau_pool_name, "")
-            status_text = f"{status_icon} {c.status}"
-            if site_name or pool_name:
-                status_text += f" 🌐 {site_name}"
-                if pool_name:
-                    status_text += f" · {pool_name}"
-            cols[1].markdown(status_text)
-            
-            # Action buttons with consistent widths
-            if cols[2].button(":material/info: Detail", key=f"detail_{idx}", use_container_width=True):
-                btn_detail(c.name)
-            if cols[3].button(":material/web_stories: Log", key=f"logs_{idx}", use_container_width=True, help="Stdout logs"):
-                btn_stout_logs(c.name)
-            
-            # Group additional actions in expander
-            with cols[4].expander("More Actions"):
-                col1, col2 = st.columns(2)
-                if col1.button(":material/delete: Remove", key=f"rm_{idx}", use_container_width=True):
-                    remove_container_dialog(c.name)
-                if col2.button(":material/settings: Config", key=f"config_{idx}", use_container_width=True):
-                    edit_bridge_client_configuration(c.name)
-                col1, col2 = st.columns(2)
-                if col1.button(":material/folder_zip: Zip Logs", key=f"zip_{idx}", use_container_width=True, help="Collect all bridge logs and download as a zip file"):
-                    btn_zip_logs(c.name)
-                if col2.button(":material/refresh: Restart", key=f"restart_{idx}", use_container_width=True):
-                    restart_container(c.name)
-            
+            status_cell = cols[1].empty()
+            status_cell.caption("loading ...")
             cont.markdown("---")
+            rows[c.name] = (idx, cols, status_cell)
+
+        for c, details in docker_client.iter_container_details(containers, include_stats):
+            idx, cols, status_cell = rows[c.name]
+            show_container_row(c, details, idx, cols, status_cell, include_stats)
 
     st.markdown("")
     st.markdown("")
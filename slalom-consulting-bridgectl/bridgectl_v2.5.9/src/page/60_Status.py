@@ -8,6 +8,7 @@ from src.page.ui_lib.page_util import PageUtil
 from src.cli import bridge_status_logic
 from src.token_loader import TokenLoader
 from src.lib.general_helper import TimezoneOptions
+from src.lib.tc_api_transport import TC_API_TRANSPORT
 from src.models import AppSettings
 
 
@@ -85,6 +86,8 @@ def page_content():
         
         # Display the dataframe
         st.dataframe(df, hide_index=True, height=height)
+        ts = TC_API_TRANSPORT.get_stats()
+        st.caption(f"Tableau Cloud API connections: {ts.connections_opened} opened, {ts.connections_reused} reused for {ts.requests} requests")
 
 
 PageUtil.set_page_config("Bridge Agent Status", ":material/monitor_heart: Bridge Agent Status")
@@ -1,4 +1,6 @@
 import os
+import re
+import time
 import streamlit as st
 import pandas as pd
 import json
@@ -7,13 +9,30 @@ from src.enums import LOCALHOST
 from src.page.ui_lib.page_util import PageUtil
 from src.page.ui_lib.stream_logger import StreamLogger
 from src import os_type
-from src.bridge_logs import BridgeLogs, BridgeLogFile, ContentType, LogSourceType
+from src.bridge_logs import BridgeLogs, BridgeLogFile, ContentType, LogSourceType, LOG_DIRECTORY_INDEX
 from src.k8s_client import K8sClient, K8sSettings
 from src.docker_client import DockerClient, TempLogsSettings
 from src.lib.general_helper import FileHelper, StringUtils
+from src.lib.log_index import LOG_INDEX, LogIndex
+from src.lib.log_tail_sync import LOG_SYNC_STATE_SUFFIX
+from src.lib.parsed_log_cache import PARSED_LOG_CACHE
 from src.lib.usage_logger import USAGE_LOG, UsageMetric
 from src.models import AppSettings
 from src.os_type import OsType
+from src.task.background_task import BG_LOGGER
+from src.task.log_archive_task import LOG_ARCHIVE
+from src.task.log_follow_task import LogFollowTask, DiskLogStream, parse_json_log_line, parse_stdout_log_line, LOG_FOLLOW_REFRESH_SECONDS
+
+LOG_REMOVE_COLUMNS = ['pid', 'tid', 'req', 'sess', 'site', 'user']
+LOG_FILE_PATTERN = r'\.(log|txt|json)$'
+LOG_INDEX_WAIT_SECONDS = 2 # how long a search waits for the index update, so recently appended lines are included
+LOG_COLUMN_NAMES = {
+    'ts': 'Time',
+    'k': 'Key',
+    'v': 'Value',
+    'sev': 'Severity',
+    'e': 'Error'
+}
 
 
 def archive_older_files(app: AppSettings):
@@ -26,6 +45,8 @@ def archive_older_files(app: AppSettings):
         total_file_count = len(files)
         st.write(f"`{total_file_count}` log files in `{app.logs_disk_path}`")
         method = st.radio("archive method", ["by modified date", "group by prefix"])
+        st.caption(f"Archived files are gzip-compressed into `{LOG_ARCHIVE.get_archive_path(log_folder)}`. Per log group, the oldest archives beyond "
+                   f"{LOG_ARCHIVE.max_group_bytes / 1024 ** 3:g} GB compressed, and archives kept for more than {LOG_ARCHIVE.max_age_days} days, are deleted.")
         if method == "group by prefix":
             st.markdown("Log file counts by prefix:")
             st.markdown(f"All but the newest {BridgeLogs.number_log_files_to_keep} files (by modified date) from each group will be archived")
@@ -38,7 +59,7 @@ def archive_older_files(app: AppSettings):
             if col1.button("Confirm Archive"):
                 s_logger = StreamLogger(st.container())
                 count_archived, archive_path = BridgeLogs.archive_log_files(s_logger, log_folder, groups)
-                st.markdown(f"Archived {count_archived} files to {archive_path}")
+                st.markdown(f"Compressing {count_archived} files to {archive_path} in the background")
         else:
             col1, col2 = st.columns(2)
             default = int(total_file_count *.8)
@@ -47,7 +68,7 @@ def archive_older_files(app: AppSettings):
                 number_to_archive = total_file_count - count_keep
                 s_logger = StreamLogger(st.container())
                 count_archived, archive_path = BridgeLogs.archive_log_files_by_date(s_logger, log_folder, files, number_to_archive)
-                st.markdown(f"Archived {count_archived} files to {archive_path}")
+                st.markdown(f"Compressing {count_archived} files to {archive_path} in the background")
     else:
         st.markdown(f"path '{log_folder}' does not exist")
     if st.columns([1, 3])[1].button("Refresh 🔄"):
@@ -126,7 +147,11 @@ def _handle_docker_log_selection(app: AppSettings):
     
     if selected_log and st.button("Select", use_container_width=True):
         with st.spinner("Downloading log file..."):
-            docker_client.download_single_file_to_disk(selected_container, selected_log)
+            try:
+                docker_client.sync_single_file_to_disk(selected_container, selected_log)
+            except Exception as ex:
+                st.error(f"Unable to download the log. {ex}")
+                return
             app.logs_docker_file = selected_log
             app.logs_docker_container_name = selected_container
             app.save()
@@ -171,11 +196,21 @@ def _handle_disk_log_selection(app: AppSettings):
         st.warning(f"Directory '{ff}' does not exist")
         return
         
-    result_list = BridgeLogs.list_log_files(ff)
-    show_latest = st.checkbox("Filter to latest", value=True)
-    
-    if show_latest:
-        result_list = BridgeLogs.get_latest_per_group(result_list)
+    c1, c2 = st.columns([1,3])
+    show_archived = c1.checkbox("Archived logs", help="Compressed logs in the archive_logs subfolder")
+    if show_archived:
+        archive_search = c2.text_input("Search archived file names", label_visibility="collapsed", placeholder="search archived file names")
+        archived = LOG_ARCHIVE.list_archived(ff, archive_search)
+        result_list = [a.to_bridge_log_file(LOG_ARCHIVE.get_archive_path(ff)) for a in archived]
+        original_mb = sum(a.size for a in archived) / (1024 * 1024)
+        compressed_mb = sum(a.compressed_size for a in archived) / (1024 * 1024)
+        st.caption(f"{original_mb:,.1f} MB of logs in {compressed_mb:,.1f} MB, read without extracting"
+                   + (f" • {LOG_ARCHIVE.pending_count()} files being archived" if LOG_ARCHIVE.pending_count() else ""))
+    else:
+        listing = LOG_DIRECTORY_INDEX.get_listing(ff)
+        result_list = listing.files
+        if c2.checkbox("Filter to latest", value=True):
+            result_list = listing.latest_per_group()
         
     format_fun = format_filename_win if os_type.current_os() == OsType.win else format_filename_linux
     sl = st.selectbox(
@@ -218,7 +253,11 @@ def _handle_k8s_log_selection(app: AppSettings):
     
     if selected_log and st.button("Select", use_container_width=True):
         with st.spinner("Downloading log file..."):
-            k8s_client.download_single_file_to_disk(app.k8s_namespace, selected_pod, selected_log)
+            try:
+                k8s_client.sync_single_file_to_disk(app.k8s_namespace, selected_pod, selected_log)
+            except Exception as ex:
+                st.error(f"Unable to download the log. {ex}")
+                return
             app.logs_k8s_file = selected_log
             app.logs_k8s_pod_name = selected_pod
             app.save()
@@ -251,21 +290,26 @@ def change_log_source_type_dialog(app: AppSettings):
         app.save()
         st.rerun()
 
-def refresh_current_log(app: AppSettings):
-    """Refresh the currently selected log file"""
-    if app.logs_source_type == LogSourceType.docker and app.logs_docker_file:
-        with st.spinner("Refreshing docker log..."):
-            DockerClient(StreamLogger(st.container())).download_single_file_to_disk(
-                app.logs_docker_container_name, 
-                app.logs_docker_file
-            )
-    elif app.logs_source_type == LogSourceType.k8s and app.logs_k8s_file:
-        with st.spinner("Refreshing k8s log..."):
-            K8sClient().download_single_file_to_disk(
-                app.k8s_namespace,
-                app.logs_k8s_pod_name,
-                app.logs_k8s_file
-            )
+def refresh_current_log(app: AppSettings) -> bool:
+    """Refresh the currently selected log file, only the lines appended since the last refresh are downloaded"""
+    try:
+        if app.logs_source_type == LogSourceType.docker and app.logs_docker_file:
+            with st.spinner("Refreshing docker log..."):
+                DockerClient(StreamLogger(st.container())).sync_single_file_to_disk(
+                    app.logs_docker_container_name,
+                    app.logs_docker_file
+                )
+        elif app.logs_source_type == LogSourceType.k8s and app.logs_k8s_file:
+            with st.spinner("Refreshing k8s log..."):
+                K8sClient().sync_single_file_to_disk(
+                    app.k8s_namespace,
+                    app.logs_k8s_pod_name,
+                    app.logs_k8s_file
+                )
+    except Exception as ex:
+        st.error(f"Unable to refresh the log. {ex}")
+        return False
+    return True
 
 def display_log_content(target_log: BridgeLogFile):
     """Display the contents of the log file"""
@@ -275,62 +319,48 @@ def display_log_content(target_log: BridgeLogFile):
         
     if target_log.content_type != ContentType.json:
         with st.expander("Log Content", expanded=True):
-            with open(target_log.full_path, "r") as f:
-                content = f.read()
+            with FileHelper.open_log(target_log.full_path) as f:
+                content = f.read().decode("utf-8", errors="replace")
             st.text_area("", content, height=500)
         return
         
-    # Load data first
+    # Filters are read from the widget state up front, so they are applied while the file is scanned
+    sev_val = st.session_state.get("log_filter_sev", "all")
+    selected_k = st.session_state.get("log_filter_k", [])
+    filter_val = str(st.session_state.get("log_filter_text", ""))
     with st.spinner("Loading log data..."):
-        with open(target_log.full_path) as f:
-            df = pd.read_json(f, lines=True)
-        
-        # Remove unnecessary columns
-        remove_cols = ['pid', 'tid', 'req', 'sess', 'site', 'user']
-        df = df.drop(columns=remove_cols, errors='ignore')
-        
+        scan = BridgeLogs.scan_json_log(target_log.full_path, None if sev_val == "all" else sev_val, selected_k, filter_val)
+
+    show_log_insights(target_log)
+
     # Handle JSON logs - Filters section
     with st.expander("Filters"):
         col1, col2 = st.columns(2)
-        filter_val = str(col2.text_input("Search in Value or Error columns", placeholder="Enter search text..."))
-        
-        # Setup filters
-        unique_k = sorted(df['k'].unique())
-        unique_sev = sorted(df['sev'].unique())
-        union_sev = ["all"] + list(unique_sev)
-        
-        sev_val = col1.radio("Severity", union_sev, horizontal=True)
-        selected_k = col1.multiselect("Key", unique_k)
-        
-        # Apply filters
-        filtered_df = df
-        if sev_val != "all":
-            filtered_df = df[df['sev'].str.contains(sev_val, case=False, na=False)]
-            
-        if selected_k:
-            filtered_df = filtered_df[filtered_df['k'].isin(selected_k)]
-            
-        if filter_val:
-            condition2 = filtered_df['v'].astype(str).str.contains(filter_val, case=False, na=False)
-            condition3 = filtered_df['e'].astype(str).str.contains(filter_val, case=False, na=False) if 'e' in filtered_df.columns else False
-            filtered_df = filtered_df[condition2 | condition3]
-    
+        col2.text_input("Search in Value or Error columns", placeholder="Enter search text...", key="log_filter_text",
+                        help="Case-insensitive regular expression, e.g. `timeout|refused`. Text that is not a valid expression is matched as is.")
+
+        # Setup filters, a selection that is not in the current file is reset
+        union_sev = ["all"] + sorted(scan.severities)
+        unique_k = sorted(scan.keys)
+        if sev_val not in union_sev:
+            st.session_state["log_filter_sev"] = "all"
+        st.session_state["log_filter_k"] = [k for k in selected_k if k in unique_k]
+        col1.radio("Severity", union_sev, horizontal=True, key="log_filter_sev")
+        col1.multiselect("Key", unique_k, key="log_filter_k")
+
     # Show filter summary outside the expander
     if any([sev_val != "all", selected_k, filter_val]):
-        st.markdown(f"**{len(filtered_df):,}** of **{len(df):,}** entries")
+        summary = f"**{scan.matched_rows:,}** of **{scan.total_rows:,}** entries"
     else:
-        st.markdown(f"**{len(df):,}** entries")
-    
+        summary = f"**{scan.total_rows:,}** entries"
+    if len(scan.df) < scan.matched_rows:
+        summary += f" • showing the most recent {len(scan.df):,}"
+    st.markdown(summary)
+
     # Display results
-    filtered_df = filtered_df.iloc[::-1].reset_index(drop=True)
-    filtered_df.rename(columns={
-        'ts': 'Time',
-        'k': 'Key',
-        'v': 'Value',
-        'sev': 'Severity',
-        'e': 'Error'
-    }, inplace=True)
-    
+    filtered_df = scan.df.iloc[::-1].reset_index(drop=True)
+    filtered_df.rename(columns=LOG_COLUMN_NAMES, inplace=True)
+
     st.dataframe(
         filtered_df,
         use_container_width=True,
@@ -338,6 +368,154 @@ def display_log_content(target_log: BridgeLogFile):
         height=700
     )
 
+def show_log_insights(target_log: BridgeLogFile):
+    """Summary of the log: counts per key and severity, error rate over time and durations of begin/end events"""
+    insights = PARSED_LOG_CACHE.get_insights(target_log.full_path)
+    if not insights.total_rows:
+        return
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Entries", f"{insights.total_rows:,}")
+    c2.metric("Errors", f"{insights.error_rows:,}", f"{100 * insights.error_rows / insights.total_rows:.2f}%", delta_color="off")
+    if insights.first_ts:
+        c3.metric("Time span", str((pd.Timestamp(insights.last_ts) - pd.Timestamp(insights.first_ts)).floor("s")))
+    if insights.durations:
+        slowest = insights.durations[0]
+        c4.metric("Most time in", slowest["event"], f"{slowest['total_ms'] / 1000:,.0f} s total", delta_color="off")
+    with st.expander(":material/insights: Insights"):
+        tab_errors, tab_keys, tab_sev, tab_durations = st.tabs(["Error rate", "Keys", "Severity", "Durations"])
+        if insights.error_rate:
+            tab_errors.caption(f"errors per {insights.bucket}")
+            tab_errors.bar_chart(pd.DataFrame(insights.error_rate), x="time", y=["errors"], height=250)
+            tab_errors.line_chart(pd.DataFrame(insights.error_rate), x="time", y=["error_pct"], height=200)
+        else:
+            tab_errors.info("No timestamps in this log")
+        tab_keys.dataframe(pd.DataFrame(insights.key_counts), use_container_width=True, hide_index=True)
+        tab_sev.bar_chart(pd.DataFrame(insights.severity_counts), x="sev", y="count", height=250)
+        if insights.durations:
+            tab_durations.caption("time between begin-x and end-x events, slowest total first")
+            tab_durations.dataframe(pd.DataFrame(insights.durations), use_container_width=True, hide_index=True)
+        else:
+            tab_durations.info("No begin/end events in this log")
+
+def get_log_follower(app: AppSettings, target_log: BridgeLogFile, follow_stdout: bool) -> LogFollowTask:
+    """Returns the follower of the selected log for this session, a follower of a previously selected log is stopped"""
+    parse_line = parse_json_log_line
+    if app.logs_source_type == LogSourceType.docker and follow_stdout:
+        key = (LogSourceType.docker, app.logs_docker_container_name, "stdout")
+        open_stream = lambda: DockerClient(BG_LOGGER).follow_stdout_logs(app.logs_docker_container_name)
+        parse_line = parse_stdout_log_line
+    elif app.logs_source_type == LogSourceType.docker:
+        key = (LogSourceType.docker, app.logs_docker_container_name, app.logs_docker_file)
+        open_stream = lambda: DockerClient(BG_LOGGER).follow_log_file(app.logs_docker_container_name, app.logs_docker_file)
+    elif app.logs_source_type == LogSourceType.k8s:
+        key = (LogSourceType.k8s, app.logs_k8s_pod_name, app.logs_k8s_file)
+        open_stream = lambda: K8sClient().follow_log_file(app.k8s_namespace, app.logs_k8s_pod_name, app.logs_k8s_file)
+    else:
+        key = (LogSourceType.disk, target_log.full_path)
+        open_stream = lambda: DiskLogStream(target_log.full_path)
+    follower = st.session_state.get("log_follower")
+    if follower and follower.key == key and follower.is_running():
+        return follower
+    if follower:
+        follower.stop()
+    follower = LogFollowTask(key, open_stream, parse_line)
+    follower.start()
+    st.session_state["log_follower"] = follower
+    return follower
+
+def stop_log_follower():
+    follower = st.session_state.pop("log_follower", None)
+    if follower:
+        follower.stop()
+
+def show_log_follow(app: AppSettings, target_log: BridgeLogFile):
+    """Follow mode, shows new lines of the selected log as they are written"""
+    follow_stdout = False
+    if app.logs_source_type == LogSourceType.docker:
+        follow_stdout = st.radio("Follow", ["Log file", "Container stdout"], horizontal=True, label_visibility="collapsed") == "Container stdout"
+    follower = get_log_follower(app, target_log, follow_stdout)
+
+    @st.fragment(run_every=LOG_FOLLOW_REFRESH_SECONDS)
+    def show_followed_lines():
+        follower.poll()
+        status = [f"following • **{follower.total_lines:,}** lines"]
+        if follower.dropped_lines:
+            status.append(f"showing the latest {len(follower.records):,}")
+        if follower.error:
+            status.append(f"stream ended: {follower.error}")
+        elif not follower.is_running():
+            status.append("stopped")
+        st.markdown(" • ".join(status))
+        df = pd.DataFrame(reversed(follower.records))
+        df = df.drop(columns=LOG_REMOVE_COLUMNS, errors='ignore').rename(columns=LOG_COLUMN_NAMES)
+        st.dataframe(df, use_container_width=True, hide_index=True, height=700)
+
+    show_followed_lines()
+
+def show_container_log_search(app: AppSettings):
+    """Search across all log files of the selected docker bridge container"""
+    with st.expander(f":material/search: Search all logs in `{app.logs_docker_container_name}`"):
+        with st.form(key="search_all_logs", border=False):
+            c1, c2, c3, c4 = st.columns([3,1,1,1])
+            search_text = c1.text_input("Search text", placeholder="Enter search text...")
+            case_sensitive = c2.checkbox("Match case")
+            is_regex = c3.checkbox("Regex")
+            max_records = c4.number_input("Max results", value=1000, min_value=1, max_value=100000)
+            is_search = st.form_submit_button("Search")
+        if not is_search or not search_text:
+            return
+        status = st.empty()
+        table = st.empty()
+        records = []
+        docker_client = DockerClient(StreamLogger(st.container()))
+        for r in docker_client.search_all_logs_for_text(app.logs_docker_container_name, search_text, max_records, case_sensitive, is_regex):
+            records.append(r)
+            if len(records) % 200 == 0: # stream partial results while the rest of the logs are scanned
+                status.caption(f"searching ... {len(records):,} matches")
+                table.dataframe(pd.DataFrame(records), use_container_width=True, hide_index=True, height=400)
+        status.caption(f"{len(records):,} matches" + (" (max results reached)" if len(records) >= max_records else ""))
+        if records:
+            table.dataframe(pd.DataFrame(records), use_container_width=True, hide_index=True, height=400)
+
+def get_index_log_paths(app: AppSettings) -> list:
+    """Downloaded docker and k8s logs, and the disk logs folder and its archived logs when browsing disk logs is allowed"""
+    folders = [str(TempLogsSettings.temp_bridge_logs_path)]
+    if app.logs_disk_path and app.streamlit_server_address == LOCALHOST:
+        folders.append(os.path.expanduser(app.logs_disk_path))
+    paths = []
+    for folder in folders:
+        if os.path.isdir(folder):
+            paths += [f.full_path for f in LOG_DIRECTORY_INDEX.get_listing(folder).filter(LOG_FILE_PATTERN) if not f.name.endswith(LOG_SYNC_STATE_SUFFIX)]
+            archive_path = LOG_ARCHIVE.get_archive_path(folder)
+            paths += [os.path.join(archive_path, a.archive_name) for a in LOG_ARCHIVE.list_archived(folder) if re.search(LOG_FILE_PATTERN, a.name)]
+    return paths
+
+def show_log_index_search(app: AppSettings):
+    """Indexed search across all downloaded and disk log files"""
+    with st.expander(":material/manage_search: Search all downloaded and disk logs"):
+        with st.form(key="search_log_index", border=False):
+            c1, c2 = st.columns([4,1])
+            search_text = c1.text_input("Search words", placeholder="all words must match, use word* for prefixes")
+            c2.write("")
+            is_search = c2.form_submit_button("Search")
+        if is_search: # index lines appended since the last search, only new data is read
+            LOG_INDEX.update_in_background(get_index_log_paths(app)).join(LOG_INDEX_WAIT_SECONDS)
+        if LOG_INDEX.is_updating():
+            st.caption(f"{LOG_INDEX.progress}, results may be incomplete")
+        if not search_text:
+            return
+        start = time.perf_counter()
+        hits = LOG_INDEX.search(search_text)
+        st.caption(f"{len(hits):,} matches in {(time.perf_counter() - start) * 1000:.0f} ms, select a row to open it in the log")
+        df = pd.DataFrame([{"File": os.path.basename(h.path), "Time": h.ts, "Severity": h.sev, "Key": h.k, "Value": h.v, "Error": h.e}
+                           for h in hits])
+        event = st.dataframe(df, use_container_width=True, hide_index=True, height=300, key="log_index_hits",
+                             on_select="rerun", selection_mode="single-row")
+        if event.selection.rows:
+            hit = hits[event.selection.rows[0]]
+            st.markdown(f"`{hit.path}` at byte {hit.offset:,}")
+            st.code("\n".join(LogIndex.read_context(hit.path, hit.offset)), language="json", wrap_lines=True)
+
 def show_file_details(target_log: BridgeLogFile, col1: st.columns):
     """Display file size and age details for the given log file"""
     file_stat = os.stat(target_log.full_path)
@@ -345,7 +523,8 @@ def show_file_details(target_log: BridgeLogFile, col1: st.columns):
     
     # Get last timestamp from file content for JSON logs
     last_ts = None
-    if target_log.content_type == ContentType.json:
+    is_archive = target_log.full_path.endswith(".gz")
+    if target_log.content_type == ContentType.json and not is_archive:
         try:
             with open(target_log.full_path, 'rb') as f:
                 f.seek(max(0, file_stat.st_size - 4096))
@@ -363,6 +542,8 @@ def show_file_details(target_log: BridgeLogFile, col1: st.columns):
         details.append(f"{short_ago} ago")
 
     details.append(f"{file_size_mb:.1f} MB")
+    if is_archive:
+        details.append("archived")
     col1.caption(" • ".join(details))
 
 def page_content():
@@ -422,10 +603,17 @@ def page_content():
     if not target_log:
         return
     
-    if c2.button("🔄", key="btn_refresh"):
-        refresh_current_log(app)
+    if c2.button("🔄", key="btn_refresh") and refresh_current_log(app):
         st.rerun()
-    
+    if c3.toggle("Follow", key="follow_log", help="Show new lines as they are written", disabled=target_log.full_path.endswith(".gz")):
+        show_log_follow(app, target_log)
+        return
+    stop_log_follower()
+
+    if app.logs_source_type == LogSourceType.docker:
+        show_container_log_search(app)
+    show_log_index_search(app)
+
     # Display log contents
     display_log_content(target_log)
 
@@ -5,7 +5,7 @@ from src.models import AppSettings
 from src.page.ui_lib.page_util import PageUtil
 from src.page.ui_lib.stream_logger import StreamLogger
 from src.cli.bridge_status_logic import get_or_fetch_site_id
-from src.lib.tc_api_client import TableauCloudLogin, TCApiLogic
+from src.lib.tc_api_client import TCApiLogic, TC_SESSION_CACHE
 from src.lib.tc_api_client_jobs import TCApiClientJobs
 
 import streamlit as st
@@ -29,12 +29,12 @@ def get_tasks(sl: StreamLogger, cont):
     cont.markdown(f"Tableau Cloud [Tasks]({tasks_link}) for 🌐 site `{token.sitename}`")
     
     with st.spinner("Fetching Extract Refresh Tasks..."):
-        login_result = TableauCloudLogin.login(token, True)
-        logic = TCApiLogic(login_result)
+        login_result = TC_SESSION_CACHE.login(token, True)
+        logic = TCApiLogic(login_result, token)
         logger = StreamLogger(st.container())
         site_id = get_or_fetch_site_id(logic.api, token, logger)
 
-        api = TCApiClientJobs(login_result)
+        api = TCApiClientJobs(login_result, token)
         tasks = api.get_tasks(site_id)
         
     task_names = []
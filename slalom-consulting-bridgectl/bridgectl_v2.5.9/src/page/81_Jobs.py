@@ -5,17 +5,20 @@ from datetime import datetime
 import pandas as pd
 import streamlit as st
 
+from src.cache_dto import JOB_DETAIL_CACHE
 from src.cli.bridge_status_logic import BridgeStatusLogic
 from src.lib.general_helper import TimezoneOptions
+from src.lib.job_store import JobStore
 from src.lib.prompt_library import PromptLibrary, PromptPrep
-from src.lib.tc_api_client import TableauCloudLogin, TCApiLogic
+from src.lib.tc_api_client import TCApiLogic, TC_SESSION_CACHE
 from src.lib.tc_api_client_jobs import TCApiClientJobs
 from src.models import AppSettings
 from src.page.ui_lib.page_util import PageUtil
 from src.page.ui_lib.stream_logger import StreamLogger
 from src.token_loader import TokenLoader
 
-JOBS_DETAILS_TO_SHOW = 10
+JOBS_DETAILS_TO_SHOW = 100
+JOB_HISTORY_DAYS_OPTIONS = [7, 30, 90, 180, 365]
 
 def convert_to_locale_datetime(iso_str):
     dt = datetime.fromisoformat(iso_str)
@@ -196,13 +199,50 @@ def show_retry_job_dialog(app: AppSettings):
             try:
                 s_logger = StreamLogger(st.container())
                 admin_token = TokenLoader(s_logger).get_token_admin_pat()
-                login_result = TableauCloudLogin.login(admin_token, True)
-                api = TCApiClientJobs(login_result)
+                login_result = TC_SESSION_CACHE.login(admin_token, True)
+                api = TCApiClientJobs(login_result, admin_token)
                 api.start_tasks([job_id])
                 st.success(f"Extract refresh started for job {job_id}")
             except Exception as e:
                 st.error(f"Failed to start extract refresh: {str(e)}")
 
+def show_job_history(site_id: str):
+    """
+    Long-range view over the local job store. Filters and aggregations run as indexed sqlite queries, so months of history
+    don't need to be re-fetched or re-parsed.
+    """
+    store = JobStore()
+    ch1, ch2, ch3, ch4 = st.columns([1,1,2,2])
+    days = ch1.selectbox("Days", JOB_HISTORY_DAYS_OPTIONS, index=1, key="history_days")
+    statuses = ["All"] + store.get_distinct_values(site_id, "status", days)
+    status = ch2.selectbox("Status", statuses, key="history_status")
+    agents = ["All Agents"] + store.get_distinct_values(site_id, "bridge_agent", days)
+    agent = ch3.selectbox("Bridge Agent", agents, key="history_agent")
+    sources = ["All Sources"] + store.get_distinct_values(site_id, "data_source_name", days)
+    source = ch4.selectbox("Data Source", sources, key="history_source")
+
+    rows = store.query_jobs(site_id, days,
+                            status=None if status == "All" else status,
+                            bridge_agent=None if agent == "All Agents" else agent,
+                            data_source_name=None if source == "All Sources" else source)
+    st.caption(f"Jobs: {len(rows):,} of {store.count_jobs(site_id):,} stored")
+    if rows:
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True, height=300)
+
+    col1, col2 = st.columns([1,1])
+    col1.markdown("#### Failure Rate per Agent per Day")
+    failure_rates = store.failure_rate_per_agent_per_day(site_id, days)
+    if failure_rates:
+        col1.dataframe(pd.DataFrame(failure_rates), hide_index=True, use_container_width=True)
+    else:
+        col1.caption("no bridge jobs in range")
+    col2.markdown("#### P95 Run Time per Data Source")
+    run_times = store.run_time_p95_per_data_source(site_id, days)
+    if run_times:
+        col2.dataframe(pd.DataFrame(run_times), hide_index=True, use_container_width=True)
+    else:
+        col2.caption("no run times in range")
+
 is_pool_enabled = False
 
 def page_content():
@@ -239,11 +279,10 @@ def page_content():
         jobs_report = logic.calculate_jobs_report(token, s_logger, jobs_details_num)
         # Fetch bridge-pool information
         if is_pool_enabled:
-            login_result = TableauCloudLogin.login(token, True)
-            tc_logic = TCApiLogic(login_result)
+            login_result = TC_SESSION_CACHE.login(token, True)
+            tc_logic = TCApiLogic(login_result, token)
             site_id = token.site_id
-            bpm_list = tc_logic.get_bridge_pool_mapping(site_id)
-            pool_map = {bap.agent_name: bap.pool_name for bap in bpm_list}
+            topology = tc_logic.get_site_topology(site_id)
     try:
         jobs = jobs_report['result']['backgroundJobs']
     except KeyError:
@@ -286,7 +325,7 @@ def page_content():
     jobs_df = jobs_df[order]
     if is_pool_enabled:
         if 'Bridge Agent' in jobs_df.columns:
-            jobs_df['Pool'] = jobs_df['Bridge Agent'].map(pool_map)
+            jobs_df['Pool'] = jobs_df['Bridge Agent'].map(topology.get_pool_name)
 
     jobs_df['Status'] = jobs_df['Status'].replace('Completed', '✅ Sent to Bridge')
     jobs_df['Status'] = jobs_df['Status'].replace('BridgeExtractionCompleted', '✅ Completed')
@@ -312,6 +351,9 @@ def page_content():
         jobs_df = jobs_df[jobs_df['Data Source Name'] == selected_source]
     filtered_row_count = len(jobs_df)
     cf4.caption(f"Jobs: {filtered_row_count:,} / {total_row_count:,}")
+    if show_job_details:
+        cs = JOB_DETAIL_CACHE.get_stats()
+        cf4.caption(f"Detail cache: {cs.hits:,} hits, {cs.misses:,} misses", help=f"{cs.entries:,} job details cached on disk")
     row_height = 35  # approximate height per row in pixels
     padding = 40  # extra padding for header and bottom space
     calculated_height = min(len(jobs_df) * row_height + padding, 800)
@@ -321,6 +363,10 @@ def page_content():
         if c4.button("Analyze with AI"):
             show_summary_analysis_dialog(jobs_df, app)
 
+    # STEP - Job History
+    with st.expander(":material/history: Job History", expanded=False):
+        show_job_history(token.site_id)
+
     # Add retry button after the dataframe
     # col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
     # if col4.button(":material/refresh: Retry Job"):
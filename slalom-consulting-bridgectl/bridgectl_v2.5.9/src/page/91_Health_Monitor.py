@@ -6,7 +6,7 @@ import streamlit as st
 from src.cli.app_config import APP_CONFIG, APP_NAME
 from src.cli.bridge_status_logic import get_or_fetch_site_id
 from src.lib.general_helper import StringUtils
-from src.lib.tc_api_client import TableauCloudLogin, TCApiLogic
+from src.lib.tc_api_client import TCApiLogic, TC_SESSION_CACHE
 from src.models import AppSettings
 from src.page.ui_lib.page_util import PageUtil
 from src.page.ui_lib.stream_logger import StreamLogger
@@ -157,8 +157,8 @@ def get_pool_list_helper():
     with st.spinner(""):
         token_loader = TokenLoader(StreamLogger(st.container()))
         admin_pat = token_loader.get_token_admin_pat()
-        login_result = TableauCloudLogin.login(admin_pat, True)
-        logic = TCApiLogic(login_result)
+        login_result = TC_SESSION_CACHE.login(admin_pat, True)
+        logic = TCApiLogic(login_result, admin_pat)
         site_id = get_or_fetch_site_id(logic.api, admin_pat, StreamLogger(st.container()))
         pool_list = logic.get_pool_list(site_id)
         return [x.name for x in pool_list]
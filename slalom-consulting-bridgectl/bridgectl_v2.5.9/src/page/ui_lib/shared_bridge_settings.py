@@ -13,7 +13,7 @@ from src.ecr_registry_private import EcrRegistryPrivate
 from src.enums import DEFAULT_POOL, ImageRegistryType
 from src.k8s_client import K8sSettings
 from src.lib.general_helper import StringUtils
-from src.lib.tc_api_client import TableauCloudLogin, TCApiLogic, BridgePool
+from src.lib.tc_api_client import TCApiLogic, BridgePool, TC_SESSION_CACHE
 from src.models import AppSettings, BridgeRequest, BridgeRpmSource
 from src.page.ui_lib.stream_logger import StreamLogger
 from src.token_loader import TokenLoader
@@ -57,8 +57,8 @@ def edit_mode_dialog():
         st.html(f"You can add PAT tokens on the <a href='/Settings'>Settings</a> page")
     else:
         with st.spinner("Fetching bridge pool information from Tableau API"):
-            login_result = TableauCloudLogin.login(admin_pat, True)
-            logic = TCApiLogic(login_result)
+            login_result = TC_SESSION_CACHE.login(admin_pat, True)
+            logic = TCApiLogic(login_result, admin_pat)
             with st.form(key="edit_bridge_pool", border=False):
                 site_id = get_or_fetch_site_id(logic.api, admin_pat, StreamLogger(st.container()))
                 pool_list = logic.get_pool_list(site_id)
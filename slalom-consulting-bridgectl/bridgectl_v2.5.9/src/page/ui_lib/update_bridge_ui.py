@@ -1,17 +1,20 @@
+import time
 from dataclasses import dataclass
 
+import pandas as pd
 import streamlit as st
 
-from src import bridge_settings_file_util
 from src.bridge_container_builder import BridgeContainerBuilder
-from src.bridge_container_runner import BridgeContainerRunner
 from src.docker_client import DockerClient, ContainerLabels
 from src.enums import BridgeContainerName
 from src.models import AppSettings
 from src.page.ui_lib.shared_bridge_settings import select_image_tags_local
 from src.page.ui_lib.stream_logger import StreamLogger
+from src.task.bulk_agent_task import BULK_AGENT_TASK, BULK_DEFAULT_PARALLELISM, BULK_MAX_PARALLELISM, BulkAgentTask, BulkOperationStatus
 from src.token_loader import TokenLoader
 
+BULK_PROGRESS_REFRESH_SECONDS = 2
+
 
 @st.dialog("Update Bridge Containers to New Image", width="large")
 def show_upgrade_dialog():
@@ -30,7 +33,8 @@ def show_upgrade_dialog():
         return
     # get list of local bridge containers
     docker_client = DockerClient(StreamLogger(st.container()))
-    containers = docker_client.get_containers_list(DockerClient.bridge_prefix)
+    containers = docker_client.query_containers()
+    image_names = docker_client.get_image_names(c.image_id for c in containers)
 
     containers_to_update = []
     containers_skip_update = []
@@ -38,8 +42,7 @@ def show_upgrade_dialog():
     for c in containers:
         pool_id = c.labels.get(ContainerLabels.tableau_pool_id)
         site_name = c.labels.get(ContainerLabels.tableau_sitename)
-        image_tags = c.image.attrs.get("RepoTags")
-        image_name = image_tags[0] if image_tags else None
+        image_name = image_names.get(c.image_id)
         bc = BridgeContainerToUpgrade(c.name,
                                       c.labels.get(ContainerLabels.tableau_sitename),
                                       c.labels.get(ContainerLabels.tableau_pool_id),
@@ -76,28 +79,16 @@ def show_upgrade_dialog():
         app.selected_image_tag = selected_image_tag
         app.save()
 
-    req = bridge_settings_file_util.load_settings()
     num = len(containers_to_update)
-    if st.button(f"Update containers to new image", disabled=num == 0):
-        with st.spinner(""):
-            cont_s = st.container()
-            for bc in containers_to_update:
-                bc: BridgeContainerToUpgrade = bc
-                if bc.image_name == app.selected_image_tag:
-                    cont_s.info(f"Container `{bc.name}` already using image")
-                    continue
-                logger = StreamLogger(cont_s)
-                BridgeContainerRunner.remove_bridge_container_in_docker(logger, bc.name)
-                token = TokenLoader(StreamLogger(cont_s)).get_token_by_name(bc.get_token_name())
-                if not token:
-                    cont_s.warning(f"Token {bc.get_token_name()} not found.")
-                    continue
-                runner = BridgeContainerRunner(StreamLogger(cont_s), req, token)
-                is_success = runner.run_bridge_container_in_docker(app)
-                if not is_success:
-                    cont_s.warning("Container Not Started")
-                else:
-                    cont_s.success("Container Started")
+    c1, c2, c3 = st.columns(3)
+    parallelism = c1.number_input("Parallel agents", 1, BULK_MAX_PARALLELISM, min(BULK_DEFAULT_PARALLELISM, max(num, 1)))
+    max_unavailable = c2.number_input("Max unavailable", 1, BULK_MAX_PARALLELISM, 1, help="Agents that may be down at the same time during the rolling update")
+    health_gate = c3.checkbox("Wait for CONNECTED", value=True, help="An updated agent must connect to Tableau Cloud before the next one is taken down, the update stops at the first agent that doesn't")
+    if st.button(f"Update containers to new image", disabled=num == 0 or BULK_AGENT_TASK.is_running()):
+        state = BulkAgentTask.plan_upgrade([(bc.name, bc.get_token_name()) for bc in containers_to_update],
+                                           f"Update {num} containers to {app.selected_image_tag}", parallelism, max_unavailable, health_gate)
+        BULK_AGENT_TASK.start(state)
+    show_bulk_operation_progress()
 
 
 @dataclass
@@ -139,7 +130,6 @@ def show_scale_up_dialog():
     bridge_containers = docker_client.get_containers_list(DockerClient.bridge_prefix)
     current_count = len(bridge_containers)
     cont.markdown(f"Current Bridge Container Count: `{current_count}`")
-    req = bridge_settings_file_util.load_settings()
     count_to_add = target_count - current_count
     existing_container_names = docker_client.get_bridge_container_names()
     token_loader = TokenLoader(StreamLogger(st.container()))
@@ -154,23 +144,11 @@ def show_scale_up_dialog():
         if count_to_add == 0:
             st.info("No containers to add")
         effective_count = count_to_add if count_to_add <= available_token_count else available_token_count
-        if st.button(f"Add {effective_count} containers", disabled=bool(count_to_add) == 0):
-            with st.spinner(""):
-                logger = StreamLogger(st.container())
-                for i in range(count_to_add):
-                    if not available_token_names:
-                        logger.info(f"No available Tokens found, unable to add agent container.")
-                        break
-                    token_name = available_token_names.pop(0)
-                    token = token_loader.get_token_by_name(token_name)
-                    logger.info(f"Adding agent container {BridgeContainerName.get_name(token.sitename, token_name)}")
-                    runner = BridgeContainerRunner(logger, req, token)
-                    is_success = runner.run_bridge_container_in_docker(app)
-                    if is_success:
-                        logger.info("SUCCESS: Container Started")
-                    else:
-                        logger.warning("Container Not Started")
-                st.page_link("src/page/50_Manage_Bridge.py", label="Close")
+        parallelism = cont.columns(3)[0].number_input("Parallel agents", 1, BULK_MAX_PARALLELISM, min(BULK_DEFAULT_PARALLELISM, max(effective_count, 1)))
+        if st.button(f"Add {effective_count} containers", disabled=effective_count == 0 or BULK_AGENT_TASK.is_running()):
+            state = BulkAgentTask.plan_scale(available_token_names[:effective_count], [], f"Add {effective_count} containers", parallelism)
+            BULK_AGENT_TASK.start(state)
+        show_bulk_operation_progress()
     else:
         count_to_remove = -1 * count_to_add
         containers = docker_client.get_containers_list(DockerClient.bridge_prefix)
@@ -178,11 +156,42 @@ def show_scale_up_dialog():
         for i in range(count_to_remove):
             names_to_remove.append(containers.pop(-1).name)
         st.info(f"Removing the oldest containers: {','.join(names_to_remove)}")
-        if st.button(f"Remove {count_to_remove} containers"):
-            with st.spinner(""):
-                logger = StreamLogger(st.container())
-                for name in names_to_remove:
-                   BridgeContainerRunner.remove_bridge_container_in_docker(logger, name)
-                st.page_link("src/page/50_Manage_Bridge.py", label="Close")
+        if st.button(f"Remove {count_to_remove} containers", disabled=BULK_AGENT_TASK.is_running()):
+            state = BulkAgentTask.plan_scale([], names_to_remove, f"Remove {count_to_remove} containers", BULK_DEFAULT_PARALLELISM)
+            BULK_AGENT_TASK.start(state)
+        show_bulk_operation_progress()
+
 
+def show_bulk_operation_progress():
+    """Progress of the running or last bulk operation per agent, refreshed while it runs. An operation interrupted by a restart can be resumed"""
+    if BULK_AGENT_TASK.state is None:
+        return
+
+    @st.fragment(run_every=BULK_PROGRESS_REFRESH_SECONDS if BULK_AGENT_TASK.is_running() else None)
+    def show_progress():
+        state = BULK_AGENT_TASK.state
+        if state is None:
+            return
+        counts = state.counts()
+        summary = ", ".join(f"{n} {status}" for status, n in counts.items())
+        st.markdown(f"**{state.title}**: `{state.status}` • {summary}")
+        if state.error:
+            st.error(state.error)
+        now = time.time()
+        st.dataframe(pd.DataFrame([{"Container": s.container_name, "Action": s.action, "Status": s.status,
+                                    "Seconds": round((s.finished or now) - s.started) if s.started else None,
+                                    "Last message": s.messages[-1] if s.messages else ""} for s in state.steps]),
+                     use_container_width=True, hide_index=True)
+        c1, c2, _ = st.columns([1,1,2])
+        if BULK_AGENT_TASK.is_running():
+            if c1.button("Cancel", key="bulk_cancel", help="Agents not yet started are skipped, running ones finish"):
+                BULK_AGENT_TASK.cancel()
+        else:
+            if state.status != BulkOperationStatus.completed:
+                if c1.button("Resume", key="bulk_resume", help="Run the unfinished and failed agents again"):
+                    BULK_AGENT_TASK.resume()
+            if c2.button("Dismiss", key="bulk_dismiss"):
+                BULK_AGENT_TASK.clear()
+                st.rerun()
 
+    show_progress()
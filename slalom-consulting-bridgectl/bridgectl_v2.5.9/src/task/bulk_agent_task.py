@@ -0,0 +1,365 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+from src import bridge_settings_file_util
+from src.bridge_container_runner import BridgeContainerRunner
+from src.cli.bridge_status_logic import get_or_fetch_site_id
+from src.docker_client import DockerClient
+from src.enums import SCRATCH_DIR, BridgeContainerName
+from src.lib.tc_api_client import TC_SESSION_CACHE, TCApiClient
+from src.models import AppSettings, LoggerInterface
+from src.task.background_task import BackgroundTask, BG_LOGGER
+from src.token_loader import TokenLoader
+
+BULK_STATE_PATH = SCRATCH_DIR / "bulk_agent_operation.json"
+BULK_DEFAULT_PARALLELISM = 4 # agents added, removed or replaced at the same time
+BULK_MAX_PARALLELISM = 10
+BULK_HEALTH_TIMEOUT_SECONDS = 600 # a new agent that is not CONNECTED after this long fails its step
+BULK_HEALTH_POLL_SECONDS = 10 # the connection status of all waiting agents is fetched once per interval
+BULK_STEP_MESSAGES = 20 # most recent log messages kept per agent
+
+
+class BulkStepAction:
+    add = "add"
+    remove = "remove"
+    replace = "replace" # remove the container and start it again with the target image, same token and pool
+
+
+class BulkStepStatus:
+    pending = "pending"
+    running = "running"
+    waiting_health = "waiting for CONNECTED"
+    done = "done"
+    failed = "failed"
+    skipped = "skipped"
+
+
+class BulkOperationStatus:
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+    cancelled = "cancelled"
+    interrupted = "interrupted" # the process stopped while the operation was running, it can be resumed
+
+
+@dataclass
+class BulkAgentStep:
+    container_name: str = None
+    token_name: str = None
+    action: str = None # BulkStepAction
+    status: str = BulkStepStatus.pending
+    messages: List[str] = field(default_factory=list)
+    started: float = 0
+    finished: float = 0
+
+    @property
+    def agent_name(self) -> str:
+        return f"bridge_{self.token_name}" # as set by BridgeContainerRunner
+
+    def is_finished(self) -> bool:
+        return self.status in (BulkStepStatus.done, BulkStepStatus.failed, BulkStepStatus.skipped)
+
+
+@dataclass
+class BulkOperationState:
+    title: str = None
+    parallelism: int = BULK_DEFAULT_PARALLELISM
+    max_unavailable: int = 1 # replaced agents that may be down at the same time
+    health_gate: bool = True # a started agent must report CONNECTED before its step is done
+    steps: List[BulkAgentStep] = field(default_factory=list)
+    status: str = BulkOperationStatus.running
+    error: str = None
+    created: float = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        data = {**data, "steps": [BulkAgentStep(**s) for s in data.get("steps", [])]}
+        return cls(**data)
+
+    def counts(self) -> dict:
+        counts = {}
+        for s in self.steps:
+            counts[s.status] = counts.get(s.status, 0) + 1
+        return counts
+
+
+class _StepLogger(LoggerInterface):
+    """ keeps the recent messages of one agent for the progress table, and writes them to the background task log """
+    def __init__(self, task: 'BulkAgentTask', step: BulkAgentStep):
+        self.task = task
+        self.step = step
+
+    def _add(self, msg: str):
+        self.step.messages = (self.step.messages + [str(msg)])[-BULK_STEP_MESSAGES:]
+        self.task.save_state()
+
+    def info(self, msg: str = ""):
+        BG_LOGGER.info(f"bulk {self.step.container_name}: {msg}")
+        self._add(msg)
+
+    def warning(self, msg: str):
+        BG_LOGGER.warning(f"bulk {self.step.container_name}: {msg}")
+        self._add(msg)
+
+    def error(self, msg: str, ex: Exception = None):
+        BG_LOGGER.error(f"bulk {self.step.container_name}: {msg}", ex)
+        self._add(msg)
+
+
+class BulkAgentTask:
+    """
+    Adds, removes and replaces bridge agent containers in local docker in parallel. Each agent is one step, run by a
+    pool of `parallelism` workers. Replacements are rolling: at most max_unavailable agents are down at a time, and with
+    the health gate a replaced agent must report CONNECTED to Tableau Cloud before the next one starts; the first agent
+    that fails stops the rollout. The state is saved to a json file after every change, so the progress can be shown
+    from any session, and steps are idempotent (they check what already exists in docker), so an operation interrupted
+    by a restart is resumed by running its unfinished steps again.
+    """
+    def __init__(self, state_path=BULK_STATE_PATH):
+        self.state_path = state_path
+        self.bg_task = BackgroundTask(self.run)
+        self.logger = BG_LOGGER
+        self._state: Optional[BulkOperationState] = None
+        self._halted = threading.Event()
+        self._lock = threading.RLock()
+        self._status_lock = threading.Lock()
+        self._connection_status = {}
+        self._status_time = 0 # monotonic time the cached connection status was requested at
+        self._admin_token = None
+        self._app = None
+        self._req = None
+        self._local_image_id = None
+        self._target_image_id = None # full "sha256:..." id of the target image, as in container.attrs["Image"]
+
+    @staticmethod
+    def plan_scale(token_names: List[str], container_names_to_remove: List[str], title: str,
+                   parallelism: int = BULK_DEFAULT_PARALLELISM, health_gate: bool = False) -> BulkOperationState:
+        steps = [BulkAgentStep(None, n, BulkStepAction.add) for n in token_names]
+        steps += [BulkAgentStep(n, None, BulkStepAction.remove) for n in container_names_to_remove]
+        state = BulkOperationState(title, parallelism, max(parallelism, 1), health_gate, steps, created=time.time())
+        loader = TokenLoader(BG_LOGGER)
+        for s in state.steps:
+            if s.action == BulkStepAction.add:
+                token = loader.get_token_by_name(s.token_name, False)
+                s.container_name = BridgeContainerName.get_name(token.sitename, token.name) if token else s.token_name
+        return state
+
+    @staticmethod
+    def plan_upgrade(containers: List[tuple], title: str, parallelism: int = BULK_DEFAULT_PARALLELISM,
+                     max_unavailable: int = 1, health_gate: bool = True) -> BulkOperationState:
+        """ containers are (container name, token name) pairs """
+        steps = [BulkAgentStep(name, token_name, BulkStepAction.replace) for name, token_name in containers]
+        return BulkOperationState(title, parallelism, max_unavailable, health_gate, steps, created=time.time())
+
+    @property
+    def state(self) -> Optional[BulkOperationState]:
+        """ the current or last operation, loaded from the state file after a restart """
+        if self._state is None:
+            try:
+                with open(self.state_path) as f:
+                    self._state = BulkOperationState.from_dict(json.load(f))
+            except (OSError, ValueError, TypeError):
+                return None
+        if self._state.status == BulkOperationStatus.running and not self.is_running():
+            self._state.status = BulkOperationStatus.interrupted
+        return self._state
+
+    def is_running(self) -> bool:
+        return self.bg_task.check_status()
+
+    def start(self, state: BulkOperationState) -> bool:
+        with self._lock:
+            if self.is_running():
+                self.logger.warning("a bulk agent operation is already running")
+                return False
+            self._state = state
+            state.status = BulkOperationStatus.running
+            self.bg_task.start()
+            self.save_state()
+            return True
+
+    def resume(self) -> bool:
+        state = self.state
+        if not state or state.status not in (BulkOperationStatus.interrupted, BulkOperationStatus.cancelled, BulkOperationStatus.failed):
+            return False
+        state.error = None
+        for s in state.steps:
+            if s.status != BulkStepStatus.done: # failed steps are retried
+                s.status = BulkStepStatus.pending
+        return self.start(state)
+
+    def cancel(self):
+        """ steps not yet started are skipped, running steps finish """
+        self.bg_task.stop_event.set()
+
+    def clear(self):
+        with self._lock:
+            if self.is_running():
+                return
+            self._state = None
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+
+    def save_state(self):
+        with self._lock:
+            state = self._state
+            if state is None:
+                return
+            SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
+            with open(f"{self.state_path}.part", "w") as f:
+                json.dump(state.to_dict(), f)
+            os.replace(f"{self.state_path}.part", self.state_path)
+
+    def run(self):
+        state = self._state
+        self._halted.clear()
+        try:
+            self._prepare(state)
+            unavailable = threading.Semaphore(max(state.max_unavailable, 1))
+            with ThreadPoolExecutor(max_workers=min(max(state.parallelism, 1), BULK_MAX_PARALLELISM), thread_name_prefix="bulk_agent") as executor:
+                futures = [executor.submit(self._run_step, s, unavailable) for s in state.steps if not s.is_finished()]
+                wait(futures)
+            if self.bg_task.stop_event.is_set():
+                state.status = BulkOperationStatus.cancelled
+            elif any(s.status == BulkStepStatus.failed for s in state.steps):
+                state.status = BulkOperationStatus.failed
+            else:
+                state.status = BulkOperationStatus.completed
+        except Exception as ex:
+            self.logger.error(f"bulk agent operation failed. {ex}", ex)
+            state.error = str(ex)
+            state.status = BulkOperationStatus.failed
+        self.save_state()
+        self.logger.info(f"bulk agent operation {state.title}: {state.status} {state.counts()}")
+
+    def _prepare(self, state: BulkOperationState):
+        """
+        Done once for the whole operation instead of per agent: the image lookup (or ECR pull), and the site and user
+        lookup of tokens that don't have them yet, which also writes the token file and so must not run concurrently.
+        """
+        self._app = AppSettings.load_static()
+        self._req = bridge_settings_file_util.load_settings()
+        self._admin_token = TokenLoader(self.logger).get_token_admin_pat() if state.health_gate else None
+        self._connection_status, self._status_time = {}, 0
+        starts = [s for s in state.steps if not s.is_finished() and s.action != BulkStepAction.remove]
+        if not starts:
+            return
+        self._local_image_id = BridgeContainerRunner(self.logger, self._req, None).resolve_local_image_id(self._app)
+        if not self._local_image_id:
+            raise Exception(f"bridge image {self._app.selected_image_tag} is not available")
+        # the resolved id is a short id or, for ECR, a registry reference, so look up the full id to compare with containers
+        self._target_image_id = DockerClient(self.logger).client.images.get(self._local_image_id).id
+        loader = TokenLoader(self.logger)
+        for s in starts:
+            token = loader.get_token_by_name(s.token_name, False)
+            if token and not token.user_email:
+                api = TCApiClient(TC_SESSION_CACHE.login(token, True), token)
+                get_or_fetch_site_id(api, token, self.logger)
+
+    def _run_step(self, step: BulkAgentStep, unavailable: threading.Semaphore):
+        stop_event = self.bg_task.stop_event
+        logger = _StepLogger(self, step)
+        is_replace = step.action == BulkStepAction.replace
+        acquired = False
+        while is_replace and not acquired and not stop_event.is_set() and not self._halted.is_set():
+            acquired = unavailable.acquire(timeout=1)
+        if stop_event.is_set() or self._halted.is_set():
+            step.status = BulkStepStatus.skipped
+            logger.info("skipped, the operation was cancelled" if stop_event.is_set() else "skipped, an earlier agent failed")
+            if acquired:
+                unavailable.release()
+            return
+        try:
+            step.status, step.started = BulkStepStatus.running, time.time()
+            logger.info(f"{step.action} {step.container_name}")
+            if step.action == BulkStepAction.add:
+                is_success = self._add(step, logger)
+            elif step.action == BulkStepAction.remove:
+                is_success = self._remove(step, logger)
+            else:
+                is_success = self._replace(step, logger)
+            if is_success and step.action != BulkStepAction.remove and self._admin_token:
+                step.status = BulkStepStatus.waiting_health
+                logger.info(f"waiting for agent {step.agent_name} to report CONNECTED")
+                is_success = self._wait_connected(step, logger)
+            step.status = BulkStepStatus.done if is_success else BulkStepStatus.failed
+        except Exception as ex:
+            logger.error(f"{step.action} failed. {ex}", ex)
+            step.status = BulkStepStatus.failed
+        finally:
+            step.finished = time.time()
+            if step.status == BulkStepStatus.failed and is_replace:
+                self._halted.set() # rolling upgrade: don't take down more agents after one didn't come back
+            if acquired:
+                unavailable.release()
+            self.save_state()
+
+    def _add(self, step: BulkAgentStep, logger: LoggerInterface) -> bool:
+        token = TokenLoader(logger).get_token_by_name(step.token_name, False)
+        if not token:
+            logger.warning(f"token {step.token_name} not found")
+            return False
+        if DockerClient(logger).get_container_by_name(step.container_name):
+            logger.info(f"container {step.container_name} already exists") # started before a restart of the operation
+            return True
+        runner = BridgeContainerRunner(logger, self._req, token)
+        return bool(runner.run_bridge_container_in_docker(self._app, self._local_image_id))
+
+    @staticmethod
+    def _remove(step: BulkAgentStep, logger: LoggerInterface) -> bool:
+        if not DockerClient(logger).get_container_by_name(step.container_name):
+            logger.info(f"container {step.container_name} already removed")
+            return True
+        BridgeContainerRunner.remove_bridge_container_in_docker(logger, step.container_name)
+        return True
+
+    def _replace(self, step: BulkAgentStep, logger: LoggerInterface) -> bool:
+        container = DockerClient(logger).get_container_by_name(step.container_name)
+        if container:
+            if container.attrs.get("Image") == self._target_image_id:
+                logger.info(f"container {step.container_name} already uses the target image")
+                return True
+            BridgeContainerRunner.remove_bridge_container_in_docker(logger, step.container_name)
+        return self._add(step, logger)
+
+    def _wait_connected(self, step: BulkAgentStep, logger: LoggerInterface) -> bool:
+        wait_start = time.monotonic() # after the container was (re)started, an earlier status may show the replaced agent
+        deadline = wait_start + BULK_HEALTH_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self._get_connection_status(wait_start).get(step.agent_name) == "CONNECTED":
+                logger.info(f"agent {step.agent_name} is CONNECTED")
+                return True
+            if self.bg_task.stop_event.wait(BULK_HEALTH_POLL_SECONDS / 2):
+                logger.warning("cancelled while waiting for the agent to connect")
+                return False
+        logger.warning(f"agent {step.agent_name} did not report CONNECTED within {BULK_HEALTH_TIMEOUT_SECONDS}s")
+        return False
+
+    def _get_connection_status(self, requested_after: float) -> dict:
+        """
+        agentName -> connectionStatus, shared by all waiting steps and fetched at most once per poll interval. Only a
+        status requested after requested_after (monotonic) is returned, an older one is fetched again, and {} if that fails.
+        """
+        with self._status_lock:
+            now = time.monotonic()
+            if self._status_time < requested_after or now - self._status_time >= BULK_HEALTH_POLL_SECONDS:
+                try:
+                    api = TCApiClient(TC_SESSION_CACHE.login(self._admin_token, True), self._admin_token)
+                    ret = api.get_agent_connection_status()
+                    self._connection_status = {a["agentName"]: a["connectionStatus"] for a in ret.get("result", {}).get("agents", [])}
+                    self._status_time = now
+                except Exception as ex:
+                    self.logger.warning(f"bulk agent operation: unable to get agent connection status. {ex}")
+                    return {}
+            return self._connection_status
+
+
+BULK_AGENT_TASK = BulkAgentTask()
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from docker.errors import NotFound
+from docker.models.containers import Container
+
+from src.docker_client import DOCKER_SHARED_CLIENT, DOCKER_FOLLOW_CLIENT, ContainerLabels, DockerClient
+from src.enums import BridgeContainerName
+from src.task.background_task import BackgroundTask, BG_LOGGER
+
+INVENTORY_NAME_PREFIX = DockerClient.bridge_prefix # bridge containers are recognized by name, older ones have no bridge labels
+INVENTORY_EVENTS = ["create", "start", "restart", "die", "stop", "pause", "unpause", "rename", "update", "destroy"]
+INVENTORY_READY_WAIT_SECONDS = 10 # how long a reader waits for the first listing before falling back to querying docker
+INVENTORY_RETRY_SECONDS = 5 # wait before listing again after the events stream failed, e.g. docker was restarted
+
+
+class ContainerInventorySnapshot:
+    """
+    Immutable view of the bridge containers at one point in time, with lookups by name, label, pool and token.
+    Containers are ordered newest first, like the docker container list.
+    """
+    def __init__(self, containers: List[Container], version: int):
+        self.version = version
+        self.containers = sorted(containers, key=lambda c: c.attrs.get("Created", ""), reverse=True)
+        self.by_name: Dict[str, Container] = {c.name: c for c in self.containers}
+        self._by_label = defaultdict(lambda: defaultdict(list)) # label -> value -> containers
+        for c in self.containers:
+            for k, v in c.labels.items():
+                self._by_label[k][v].append(c)
+
+    def get(self, name: str) -> Optional[Container]:
+        return self.by_name.get(name)
+
+    def with_label(self, label: str, value: str) -> List[Container]:
+        return list(self._by_label.get(label, {}).get(value, []))
+
+    def in_pool(self, pool_id: str) -> List[Container]:
+        return self.with_label(ContainerLabels.tableau_pool_id, pool_id)
+
+    def get_by_token(self, sitename: str, token_name: str) -> Optional[Container]:
+        return self.by_name.get(BridgeContainerName.get_name(sitename, token_name))
+
+    def names(self) -> List[str]:
+        return sorted(self.by_name)
+
+
+class ContainerInventoryTask:
+    """
+    In-process inventory of the bridge containers. It lists the containers named with the bridge prefix once and then
+    keeps the list current from the docker events stream, re-inspecting a container only when one of its lifecycle
+    events arrives. Readers get a consistent snapshot from memory instead of listing and inspecting every container on each
+    call. Events are requested from before the listing, so nothing is missed between the two, and after a stream
+    failure the containers are listed again.
+    """
+    def __init__(self):
+        self.bg_task = BackgroundTask(self.watch_loop)
+        self.logger = BG_LOGGER
+        self._containers: Dict[str, Container] = {} # container id -> container
+        self._snapshot: Optional[ContainerInventorySnapshot] = None
+        self._version = 0
+        self._ready = threading.Event()
+        self._attempted = threading.Event() # set after the first listing attempt, so readers don't wait when docker is down
+        self._events = None
+        self._lock = threading.Lock()
+
+    def check_status(self):
+        return self.bg_task.check_status()
+
+    def ensure_started(self):
+        if not self.bg_task.check_status():
+            self.logger.info("starting background task to track bridge containers from docker events")
+            self.bg_task.start()
+
+    def stop(self):
+        self.bg_task.stop_event.set()
+        self._close_events() # unblocks the events stream read
+        return self.bg_task.stop()
+
+    def get_snapshot(self, wait_seconds: float = INVENTORY_READY_WAIT_SECONDS) -> Optional[ContainerInventorySnapshot]:
+        """
+        The current snapshot, None if the inventory is not ready (e.g. docker is not running), callers then query docker.
+        """
+        self.ensure_started()
+        self._attempted.wait(wait_seconds)
+        return self._snapshot
+
+    def apply(self, container: Container):
+        """ adds or replaces a container changed by this process, so the caller's next read sees it before the event arrives """
+        if self._ready.is_set() and container.name.startswith(INVENTORY_NAME_PREFIX):
+            with self._lock:
+                self._containers[container.id] = container
+                self._publish()
+
+    def discard(self, name: str):
+        if self._ready.is_set():
+            with self._lock:
+                self._containers = {i: c for i, c in self._containers.items() if c.name != name}
+                self._publish()
+
+    def watch_loop(self):
+        stop_event = self.bg_task.stop_event
+        while not stop_event.is_set():
+            try:
+                since = int(time.time()) - 1 # events have second precision, replayed events are harmless
+                self._bootstrap()
+                self._consume_events(since)
+            except Exception as ex:
+                if not stop_event.is_set():
+                    self.logger.warning(f"container inventory: docker events stream failed, listing again. {ex}")
+            finally:
+                self._attempted.set()
+                self._close_events()
+            self._ready.clear()
+            self._snapshot = None # readers query docker directly until the inventory is rebuilt
+            stop_event.wait(INVENTORY_RETRY_SECONDS)
+        self.logger.info("Background task container inventory has stopped.")
+
+    def _bootstrap(self):
+        containers = DOCKER_SHARED_CLIENT.get().containers.list(all=True, filters={"name": INVENTORY_NAME_PREFIX}) # the daemon matches substrings
+        containers = [c for c in containers if c.name.startswith(INVENTORY_NAME_PREFIX)]
+        with self._lock:
+            self._containers = {c.id: c for c in containers}
+            self._publish()
+        self._ready.set()
+        self._attempted.set()
+
+    def _consume_events(self, since: int):
+        # the follow client has no read timeout, the stream can be quiet for hours. The daemon can't filter events on a
+        # name prefix, events of other containers are dropped in _apply_event without inspecting them
+        self._events = DOCKER_FOLLOW_CLIENT.get().events(
+            since=since, decode=True, filters={"type": "container", "event": INVENTORY_EVENTS})
+        for event in self._events:
+            if self.bg_task.stop_event.is_set():
+                return
+            self._apply_event(event)
+        if not self.bg_task.stop_event.is_set():
+            raise ConnectionError("docker events stream ended")
+
+    def _apply_event(self, event: dict):
+        container_id = event.get("Actor", {}).get("ID") or event.get("id")
+        if not container_id:
+            return
+        name = event.get("Actor", {}).get("Attributes", {}).get("name") or ""
+        if container_id not in self._containers and not name.startswith(INVENTORY_NAME_PREFIX):
+            return
+        container = None
+        if event.get("Action") != "destroy":
+            try:
+                container = DOCKER_SHARED_CLIENT.get().containers.get(container_id)
+            except NotFound: # removed since the event
+                pass
+        if container is not None and not container.name.startswith(INVENTORY_NAME_PREFIX): # renamed away from the prefix
+            container = None
+        with self._lock:
+            if container is None:
+                self._containers.pop(container_id, None)
+            else:
+                self._containers[container_id] = container
+            self._publish()
+
+    def _publish(self):
+        self._version += 1
+        self._snapshot = ContainerInventorySnapshot(list(self._containers.values()), self._version)
+
+    def _close_events(self):
+        events, self._events = self._events, None
+        if events is not None:
+            try:
+                events.close()
+            except Exception:
+                pass
+
+
+CONTAINER_INVENTORY = ContainerInventoryTask()
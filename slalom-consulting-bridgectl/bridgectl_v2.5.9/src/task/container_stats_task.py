@@ -0,0 +1,170 @@
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import docker
+
+from src.docker_client import DockerClient, ContainerSummary, DOCKER_API_TIMEOUT, CONTAINER_DISK_USAGE
+from src.task.background_task import BackgroundTask, BG_LOGGER
+
+STATS_RING_SIZE = 720 # samples kept per container, with one sample every STATS_SAMPLE_INTERVAL_SECONDS this is one hour
+STATS_SAMPLE_INTERVAL_SECONDS = 5 # docker streams a sample every second, only every ~5th is kept
+STATS_DISCOVERY_INTERVAL_SECONDS = 15 # how often new or removed bridge containers are picked up
+STATS_MAX_CONTAINERS = 50 # upper bound on subscriptions (and docker connections) held open
+STATS_MAX_AGE_SECONDS = 3 * STATS_SAMPLE_INTERVAL_SECONDS # older latest samples are treated as missing, e.g. a stopped container
+
+
+@dataclass
+class ContainerStatsSample:
+    timestamp: float = 0
+    cpu_usage_pct: float = 0
+    mem_usage_mb: float = 0
+    net_rx_kbps: float = 0
+    net_tx_kbps: float = 0
+
+
+class StatsRing:
+    """
+    Fixed size ring buffer of stats samples stored in compact float arrays, so memory per container is constant.
+    """
+    fields = ["timestamp", "cpu_usage_pct", "mem_usage_mb", "net_rx_kbps", "net_tx_kbps"]
+
+    def __init__(self, size: int = STATS_RING_SIZE):
+        self.size = size
+        self.count = 0
+        self._next = 0
+        self._arrays = {f: array("d", bytes(8 * size)) for f in self.fields}
+        self._lock = threading.Lock()
+
+    def append(self, sample: ContainerStatsSample):
+        with self._lock:
+            for f in self.fields:
+                self._arrays[f][self._next] = getattr(sample, f)
+            self._next = (self._next + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+
+    def latest(self) -> Optional[ContainerStatsSample]:
+        with self._lock:
+            if not self.count:
+                return None
+            i = (self._next - 1) % self.size
+            return ContainerStatsSample(**{f: self._arrays[f][i] for f in self.fields})
+
+    def history(self, max_samples: int = None) -> Dict[str, list]:
+        """
+        Returns the most recent samples oldest first, as one list per field.
+        """
+        with self._lock:
+            n = min(max_samples or self.count, self.count)
+            start = (self._next - n) % self.size
+            idx = [(start + k) % self.size for k in range(n)]
+            return {f: [self._arrays[f][i] for i in idx] for f in self.fields}
+
+
+class ContainerStatsTask:
+    """
+    Background collector holding one streaming docker stats subscription per running bridge container. The latest values
+    and short histories are served from memory, so readers don't pay the ~1-2s sampling delay of stats(stream=False).
+    """
+    def __init__(self):
+        self.bg_task = BackgroundTask(self.discover_loop)
+        self.logger = BG_LOGGER
+        self._rings: Dict[str, StatsRing] = {}
+        self._subscribers: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._client = None
+
+    def check_status(self):
+        return self.bg_task.check_status()
+
+    def ensure_started(self):
+        if not self.bg_task.check_status():
+            self.logger.info("starting background task to collect bridge container stats")
+            self.bg_task.start()
+
+    def stop(self):
+        return self.bg_task.stop()
+
+    def get_latest(self, container_name: str, max_age_seconds: float = STATS_MAX_AGE_SECONDS) -> Optional[ContainerStatsSample]:
+        ring = self._rings.get(container_name)
+        sample = ring.latest() if ring else None
+        if sample and time.time() - sample.timestamp <= max_age_seconds:
+            return sample
+        return None
+
+    def get_history(self, container_name: str, max_samples: int = None) -> Optional[Dict[str, list]]:
+        ring = self._rings.get(container_name)
+        return ring.history(max_samples) if ring else None
+
+    def discover_loop(self):
+        stop_event = self.bg_task.stop_event
+        while not stop_event.is_set():
+            try:
+                self.sync_subscriptions()
+                CONTAINER_DISK_USAGE.refresh_if_stale() # keeps the disk usage warm for the Manage Bridge page
+            except Exception as ex:
+                self.logger.warning(f"container stats: unable to list containers. {ex}")
+            stop_event.wait(STATS_DISCOVERY_INTERVAL_SECONDS)
+        self.logger.info("Background task container stats has stopped.")
+
+    def sync_subscriptions(self):
+        if self._client is None:
+            # dedicated client, each streaming subscription holds a connection open and would otherwise drain the shared pool
+            self._client = docker.from_env(version="auto", timeout=DOCKER_API_TIMEOUT, max_pool_size=STATS_MAX_CONTAINERS)
+        # filtered by the daemon and not inspected, discovery costs the same however many other containers the host runs
+        containers = DockerClient(self.logger).query_containers(status="running")[:STATS_MAX_CONTAINERS]
+        names = {c.name for c in containers}
+        with self._lock:
+            for name in list(self._subscribers):
+                if not self._is_subscribed(name): # the stream ended, e.g. the container stopped or was removed
+                    del self._subscribers[name]
+            for name in list(self._rings):
+                if name not in names and name not in self._subscribers: # forget removed containers so memory stays bounded
+                    del self._rings[name]
+            for c in containers:
+                if not self._is_subscribed(c.name):
+                    self._rings.setdefault(c.name, StatsRing())
+                    t = threading.Thread(target=self.subscribe, args=(c,), daemon=True, name=f"stats_{c.name}")
+                    self._subscribers[c.name] = t
+                    t.start()
+
+    def _is_subscribed(self, name: str) -> bool:
+        t = self._subscribers.get(name)
+        return t is not None and t.is_alive()
+
+    def subscribe(self, container: ContainerSummary):
+        ring = self._rings[container.name]
+        calc = DockerClient(self.logger)
+        last_kept = 0
+        last_net = None
+        try:
+            stream = self._client.api.stats(container.id, stream=True, decode=True)
+            for stats in stream: # ends when the container stops
+                if self.bg_task.stop_event.is_set():
+                    break
+                now = time.time()
+                rx, tx = self._net_bytes(stats)
+                if now - last_kept < STATS_SAMPLE_INTERVAL_SECONDS:
+                    continue
+                sample = ContainerStatsSample(now, calc.calc_cpu_usage_pct(stats),
+                                              stats.get("memory_stats", {}).get("usage", 0) / 1024 / 1024)
+                if last_net:
+                    elapsed = now - last_net[0]
+                    sample.net_rx_kbps = max(rx - last_net[1], 0) / 1024 / elapsed
+                    sample.net_tx_kbps = max(tx - last_net[2], 0) / 1024 / elapsed
+                last_net = (now, rx, tx)
+                last_kept = now
+                ring.append(sample)
+        except Exception as ex:
+            self.logger.warning(f"container stats: subscription for {container.name} ended. {ex}")
+
+    @staticmethod
+    def _net_bytes(stats: dict) -> (int, int):
+        networks = stats.get("networks") or {}
+        return (sum(n.get("rx_bytes", 0) for n in networks.values()),
+                sum(n.get("tx_bytes", 0) for n in networks.values()))
+
+
+CONTAINER_STATS_TASK = ContainerStatsTask()
@@ -0,0 +1,4 @@
+from src.lib.log_archive import LogArchive
+from src.task.background_task import BG_LOGGER
+
+LOG_ARCHIVE = LogArchive(BG_LOGGER) # compresses archived logs on a small worker pool, failures go to the background task log
@@ -0,0 +1,180 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from src.task.background_task import BG_LOGGER
+
+LOG_FOLLOW_BUFFER_LINES = 5000 # parsed lines kept for the table, older lines are dropped
+LOG_FOLLOW_QUEUE_LINES = 10000 # raw lines waiting for the UI. When full the reader stops reading, which throttles the remote stream
+LOG_FOLLOW_IDLE_TIMEOUT_SECONDS = 60 # a follower the UI hasn't read from for this long (e.g. the browser tab was closed) stops itself
+LOG_FOLLOW_IDLE_CHECK_SECONDS = 5 # how often the watchdog checks the idle timeout, also while the stream is quiet
+LOG_FOLLOW_REFRESH_SECONDS = 2 # how often the Logs page reads new lines in follow mode
+LOG_FOLLOW_MAX_LINE_BYTES = 1024 * 1024 # longer lines are cut, so a runaway line can't exhaust memory
+DISK_LOG_POLL_SECONDS = 0.5 # how often a followed disk log is checked for new data
+DISK_LOG_BACKFILL_BYTES = 64 * 1024 # tail of a disk log that is shown when following starts
+
+
+def parse_json_log_line(line: bytes) -> dict:
+    text = line.decode("utf-8", errors="replace")
+    try:
+        record = json.loads(text)
+        if isinstance(record, dict):
+            return record
+    except ValueError:
+        pass
+    return {"v": text}
+
+
+def parse_stdout_log_line(line: bytes) -> dict:
+    """ docker stdout lines with timestamps=True, `<rfc3339 timestamp> <message>` """
+    ts, _, text = line.decode("utf-8", errors="replace").partition(" ")
+    return {"ts": ts, "v": text}
+
+
+class DiskLogStream:
+    """
+    Follows a local log file like `tail -F`: yields the last DISK_LOG_BACKFILL_BYTES and then new data as it is written,
+    and reopens the file from the start when it is rotated (new inode) or truncated.
+    """
+    def __init__(self, path: str, backfill_bytes: int = DISK_LOG_BACKFILL_BYTES):
+        self.path = path
+        self.backfill_bytes = backfill_bytes
+        self._closed = threading.Event()
+
+    def close(self):
+        self._closed.set()
+
+    def __iter__(self):
+        f = open(self.path, "rb")
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if size > self.backfill_bytes:
+                f.seek(size - self.backfill_bytes)
+                f.readline() # skip the partial first line
+            while not self._closed.is_set():
+                chunk = f.read(LOG_FOLLOW_MAX_LINE_BYTES)
+                if chunk:
+                    yield chunk
+                    continue
+                if self._is_rotated(f):
+                    f.close()
+                    f = open(self.path, "rb")
+                    continue
+                self._closed.wait(DISK_LOG_POLL_SECONDS)
+        finally:
+            f.close()
+
+    def _is_rotated(self, f) -> bool:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError: # between the rename and the creation of the new file
+            return False
+        return st.st_ino != os.fstat(f.fileno()).st_ino or st.st_size < f.tell()
+
+
+class LogFollowTask:
+    """
+    Follows a growing log for the Logs page. A reader thread splits the stream into lines and hands them to the UI through
+    a bounded queue, the UI parses only the new lines on each poll into a bounded buffer of records. If the UI falls
+    behind the reader blocks on the full queue, so memory stays bounded and the remote stream is throttled, and if the
+    UI stops polling a watchdog thread stops the follower and closes the stream. Closing the stream unblocks the reader
+    even when no lines arrive, and releases its follow client connection. A remote `tail -F` exits on its next write
+    to the closed connection.
+    """
+    def __init__(self, key: tuple, open_stream: Callable[[], Iterable[bytes]], parse_line: Callable[[bytes], dict] = parse_json_log_line,
+                 buffer_lines: int = LOG_FOLLOW_BUFFER_LINES, queue_lines: int = LOG_FOLLOW_QUEUE_LINES):
+        self.key = key
+        self.open_stream = open_stream
+        self.parse_line = parse_line
+        self.records = deque(maxlen=buffer_lines)
+        self.total_lines = 0
+        self.error: Optional[str] = None
+        self.logger = BG_LOGGER
+        self.stop_event = threading.Event()
+        self._queue = queue.Queue(maxsize=queue_lines)
+        self._stream = None
+        self._thread = None
+        self._watchdog = None
+        self._last_poll = time.monotonic()
+
+    def start(self):
+        self._last_poll = time.monotonic()
+        self._thread = threading.Thread(target=self._read_loop, daemon=True, name=f"log_follow_{self.key[-1]}")
+        self._thread.start()
+        self._watchdog = threading.Thread(target=self._watch_loop, daemon=True, name=f"log_follow_watch_{self.key[-1]}")
+        self._watchdog.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self._close_stream()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def dropped_lines(self) -> int:
+        return max(self.total_lines - len(self.records), 0)
+
+    def poll(self) -> int:
+        """
+        Parses the lines received since the last poll into records. Returns the number of new lines.
+        """
+        self._last_poll = time.monotonic()
+        count = 0
+        while True:
+            try:
+                line = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self.records.append(self.parse_line(line))
+            count += 1
+        self.total_lines += count
+        return count
+
+    def _watch_loop(self):
+        while not self.stop_event.wait(LOG_FOLLOW_IDLE_CHECK_SECONDS) and self.is_running():
+            if time.monotonic() - self._last_poll > LOG_FOLLOW_IDLE_TIMEOUT_SECONDS:
+                self.logger.info(f"log follow {self.key}: no reader for {LOG_FOLLOW_IDLE_TIMEOUT_SECONDS}s, stopping")
+                self.stop()
+
+    def _read_loop(self):
+        try:
+            self._stream = self.open_stream()
+            if self.stop_event.is_set(): # stopped while the stream was opening
+                return
+            rest = b""
+            for chunk in self._stream:
+                if self.stop_event.is_set():
+                    break
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()[-LOG_FOLLOW_MAX_LINE_BYTES:]
+                for line in lines:
+                    if line and not self._put(line[:LOG_FOLLOW_MAX_LINE_BYTES]):
+                        return
+        except Exception as ex:
+            if not self.stop_event.is_set():
+                self.error = str(ex)
+                self.logger.warning(f"log follow {self.key}: stream ended. {ex}")
+        finally:
+            self._close_stream()
+
+    def _put(self, line: bytes) -> bool:
+        while not self.stop_event.is_set():
+            try:
+                self._queue.put(line, timeout=1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _close_stream(self):
+        stream = self._stream
+        if stream is not None and hasattr(stream, "close"):
+            try:
+                stream.close()
+            except Exception:
+                pass
@@ -84,6 +84,7 @@ class TokenLoader:
             tokens = []
         available_token_names = []
         in_use_token_names = []
+        existing_container_names = set(existing_container_names)
         for t in tokens:
             if t.is_admin_token():
                 continue
@@ -0,0 +1,154 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.task import bulk_agent_task
+from src.task.bulk_agent_task import BulkAgentTask, BulkOperationStatus, BulkStepStatus
+
+TARGET_IMAGE_ID = "sha256:" + "a" * 64
+OLD_IMAGE_ID = "sha256:" + "b" * 64
+
+
+class FakeDocker:
+    def __init__(self, containers: dict):
+        self.containers = containers # name -> image id
+        self.removed = []
+        self.started = []
+
+    def container(self, name):
+        if name not in self.containers:
+            return None
+        return SimpleNamespace(name=name, attrs={"Image": self.containers[name]})
+
+
+@pytest.fixture
+def docker(monkeypatch):
+    fake = FakeDocker({})
+
+    class FakeDockerClient:
+        def __init__(self, logger):
+            self.client = SimpleNamespace(images=SimpleNamespace(get=self._get_image))
+
+        @staticmethod
+        def _get_image(name):
+            assert name == TARGET_IMAGE_ID[:17]
+            return SimpleNamespace(id=TARGET_IMAGE_ID)
+
+        @staticmethod
+        def get_container_by_name(name):
+            return fake.container(name)
+
+    class FakeRunner:
+        def __init__(self, logger, req, token):
+            self.token = token
+
+        @staticmethod
+        def resolve_local_image_id(app):
+            return TARGET_IMAGE_ID[:17] # a short id, like Image.short_id
+
+        def run_bridge_container_in_docker(self, app, local_image_id):
+            name = f"bridge_{self.token.name}"
+            fake.started.append(name)
+            fake.containers[name] = TARGET_IMAGE_ID
+            return True
+
+        @staticmethod
+        def remove_bridge_container_in_docker(logger, name):
+            fake.removed.append(name)
+            del fake.containers[name]
+
+    class FakeTokenLoader:
+        def __init__(self, logger):
+            pass
+
+        @staticmethod
+        def get_token_by_name(name, _):
+            return SimpleNamespace(name=name, sitename="site", user_email="a@b.c")
+
+        @staticmethod
+        def get_token_admin_pat():
+            return None
+
+    monkeypatch.setattr(bulk_agent_task, "DockerClient", FakeDockerClient)
+    monkeypatch.setattr(bulk_agent_task, "BridgeContainerRunner", FakeRunner)
+    monkeypatch.setattr(bulk_agent_task, "TokenLoader", FakeTokenLoader)
+    monkeypatch.setattr(bulk_agent_task.AppSettings, "load_static", staticmethod(lambda: SimpleNamespace(selected_image_tag="bridge:latest")))
+    monkeypatch.setattr(bulk_agent_task.bridge_settings_file_util, "load_settings", lambda: None)
+    return fake
+
+
+def _write_interrupted_upgrade(path):
+    state = BulkAgentTask.plan_upgrade([(f"bridge_t{i}", f"t{i}") for i in range(3)], "upgrade", parallelism=1, health_gate=False)
+    state.steps[0].status = BulkStepStatus.done
+    state.steps[1].status = BulkStepStatus.running # the process stopped after this agent was replaced
+    with open(path, "w") as f:
+        json.dump(state.to_dict(), f)
+
+
+def _resume(path) -> BulkAgentTask:
+    task = BulkAgentTask(path)
+    assert task.state.status == BulkOperationStatus.interrupted
+    assert task.resume()
+    task.bg_task.thread.join(10)
+    return task
+
+
+def test_resume_keeps_agents_already_on_target_image(tmp_path, docker):
+    path = tmp_path / "bulk.json"
+    _write_interrupted_upgrade(path)
+    docker.containers.update({"bridge_t0": TARGET_IMAGE_ID, "bridge_t1": TARGET_IMAGE_ID, "bridge_t2": OLD_IMAGE_ID})
+
+    task = _resume(path)
+
+    assert task.state.status == BulkOperationStatus.completed
+    assert [s.status for s in task.state.steps] == [BulkStepStatus.done] * 3
+    assert docker.removed == ["bridge_t2"]
+    assert docker.started == ["bridge_t2"]
+
+
+def test_resume_state_is_reloaded_from_file(tmp_path, docker):
+    path = tmp_path / "bulk.json"
+    _write_interrupted_upgrade(path)
+    docker.containers.update({"bridge_t0": TARGET_IMAGE_ID, "bridge_t1": OLD_IMAGE_ID, "bridge_t2": OLD_IMAGE_ID})
+
+    _resume(path)
+
+    with open(path) as f:
+        saved = json.load(f)
+    assert saved["status"] == BulkOperationStatus.completed
+    assert sorted(docker.removed) == ["bridge_t1", "bridge_t2"]
+
+
+class _Logger:
+    def info(self, msg=""):
+        pass
+
+    def warning(self, msg):
+        pass
+
+
+def test_health_gate_ignores_status_fetched_before_the_step(tmp_path, monkeypatch):
+    responses = [[("bridge_t0", "DISCONNECTED")], [("bridge_t0", "CONNECTED")]]
+    calls = []
+
+    class FakeApi:
+        def __init__(self, session, token):
+            pass
+
+        @staticmethod
+        def get_agent_connection_status():
+            calls.append(time.monotonic())
+            agents = responses.pop(0) if len(responses) > 1 else responses[0]
+            return {"result": {"agents": [{"agentName": n, "connectionStatus": s} for n, s in agents]}}
+
+    monkeypatch.setattr(bulk_agent_task, "TCApiClient", FakeApi)
+    monkeypatch.setattr(bulk_agent_task.TC_SESSION_CACHE, "login", lambda token, is_admin: None)
+    monkeypatch.setattr(bulk_agent_task, "BULK_HEALTH_POLL_SECONDS", 0.1)
+    task = BulkAgentTask(tmp_path / "state.json")
+    # fetched just before the step replaced the container, still shows the old agent as CONNECTED
+    task._connection_status, task._status_time = {"bridge_t0": "CONNECTED"}, time.monotonic()
+    step = SimpleNamespace(agent_name="bridge_t0")
+    assert task._wait_connected(step, _Logger())
+    assert len(calls) == 2 # the cached status was not used, the first fresh one was DISCONNECTED
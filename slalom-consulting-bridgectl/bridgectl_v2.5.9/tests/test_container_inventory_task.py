@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+from docker.errors import NotFound
+
+from src.docker_client import DockerClient, ContainerLabels
+from src.task import container_inventory_task
+from src.task.container_inventory_task import ContainerInventoryTask
+
+
+def container(container_id, name, labels=None):
+    return SimpleNamespace(id=container_id, name=name, labels=labels or {}, attrs={"Created": container_id})
+
+
+class FakeContainers:
+    def __init__(self, containers):
+        self.by_id = {c.id: c for c in containers}
+        self.get_calls = []
+
+    def list(self, all=False, filters=None):
+        return [c for c in self.by_id.values() if filters["name"] in c.name]
+
+    def get(self, container_id):
+        self.get_calls.append(container_id)
+        if container_id not in self.by_id:
+            raise NotFound("gone")
+        return self.by_id[container_id]
+
+
+@pytest.fixture
+def containers(monkeypatch):
+    fake = FakeContainers([container("1", "bridge_site_a", {ContainerLabels.tableau_bridge_agent_name: "a"}),
+                           container("2", "bridge_site_b"), # started before the bridge labels existed
+                           container("3", "postgres"),
+                           container("4", "my_bridge")])
+    monkeypatch.setattr(container_inventory_task.DOCKER_SHARED_CLIENT, "get", lambda: SimpleNamespace(containers=fake))
+    return fake
+
+
+def event(container_id, name, action="start"):
+    return {"Action": action, "Actor": {"ID": container_id, "Attributes": {"name": name}}}
+
+
+def test_inventory_tracks_containers_by_name_prefix(containers):
+    task = ContainerInventoryTask()
+    task._bootstrap()
+    assert task._snapshot.names() == ["bridge_site_a", "bridge_site_b"]
+
+
+def test_inventory_events(containers):
+    task = ContainerInventoryTask()
+    task._bootstrap()
+    task._apply_event(event("3", "postgres"))
+    assert containers.get_calls == [] # other containers are not inspected
+    containers.by_id["5"] = container("5", "bridge_site_c")
+    task._apply_event(event("5", "bridge_site_c", "create"))
+    containers.by_id["2"] = container("2", "renamed")
+    task._apply_event(event("2", "renamed", "rename"))
+    task._apply_event(event("1", "bridge_site_a", "destroy"))
+    assert task._snapshot.names() == ["bridge_site_c"]
+
+
+def test_get_containers_list_does_not_wait_for_inventory(containers, monkeypatch):
+    task = ContainerInventoryTask()
+    monkeypatch.setattr(task, "ensure_started", lambda: None) # never becomes ready
+    monkeypatch.setattr(container_inventory_task, "CONTAINER_INVENTORY", task)
+    monkeypatch.setattr(DockerClient, "client", property(lambda self: SimpleNamespace(containers=containers)))
+    names = [c.name for c in DockerClient(None).get_containers_list(DockerClient.bridge_prefix)]
+    assert sorted(names) == ["bridge_site_a", "bridge_site_b"]
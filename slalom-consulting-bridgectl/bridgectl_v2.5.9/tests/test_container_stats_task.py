@@ -0,0 +1,67 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.task import container_stats_task
+from src.task.container_stats_task import ContainerStatsTask, ContainerStatsSample, StatsRing, STATS_SAMPLE_INTERVAL_SECONDS
+
+
+def running(name):
+    return SimpleNamespace(id=f"id_{name}", name=name)
+
+
+@pytest.fixture
+def task(monkeypatch):
+    containers = []
+
+    class FakeDockerClient:
+        def __init__(self, logger):
+            pass
+
+        @staticmethod
+        def query_containers(status=None):
+            assert status == "running"
+            return list(containers)
+
+    monkeypatch.setattr(container_stats_task, "DockerClient", FakeDockerClient)
+    t = ContainerStatsTask()
+    t._client = object()
+    t.containers = containers
+    return t
+
+
+def fill(t: ContainerStatsTask, name, cpu_pct, seconds, alive=True):
+    ring = t._rings.setdefault(name, StatsRing())
+    now = time.time()
+    for i in range(int(seconds / STATS_SAMPLE_INTERVAL_SECONDS), -1, -1):
+        ring.append(ContainerStatsSample(now - i * STATS_SAMPLE_INTERVAL_SECONDS, cpu_pct, 100))
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait, daemon=True)
+    thread.start()
+    if not alive:
+        stop.set()
+        thread.join()
+    t._subscribers[name] = thread
+    return stop
+
+
+def test_sync_subscriptions_forgets_removed_containers(task, monkeypatch):
+    monkeypatch.setattr(ContainerStatsTask, "subscribe", lambda self, c: None) # the stream ends right away
+    task.containers.append(running("bridge_a"))
+    task.sync_subscriptions()
+    task._subscribers["bridge_a"].join()
+    task.containers.clear()
+    task.sync_subscriptions()
+    assert task._subscribers == {}
+    assert task._rings == {}
+
+
+def test_sync_subscriptions_keeps_running_subscription(task):
+    stop = fill(task, "bridge_a", 5, 60)
+    task.containers.append(running("bridge_a"))
+    task.sync_subscriptions()
+    assert list(task._subscribers) == ["bridge_a"]
+    assert task._rings["bridge_a"].count
+    stop.set()
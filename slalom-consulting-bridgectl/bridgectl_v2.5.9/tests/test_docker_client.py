@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+from docker.errors import NotFound
+
+from src.docker_client import DockerClient
+
+BASE_IMAGE_ID = "sha256:" + "a" * 64
+DERIVED_IMAGE_ID = "sha256:" + "b" * 64
+
+
+def test_is_image_in_use_ignores_descendant_images(monkeypatch):
+    images = {"tableau_bridge:base": BASE_IMAGE_ID, "tableau_bridge:derived": DERIVED_IMAGE_ID}
+    rows = [{"Id": "1", "Names": ["/bridge_a"], "Image": "tableau_bridge:base", "ImageID": BASE_IMAGE_ID},
+            {"Id": "2", "Names": ["/bridge_b"], "Image": "tableau_bridge:derived", "ImageID": DERIVED_IMAGE_ID},
+            {"Id": "3", "Names": ["/bridge_c"], "Image": BASE_IMAGE_ID[:19], "ImageID": BASE_IMAGE_ID},
+            {"Id": "4", "Names": ["/postgres"], "Image": "postgres", "ImageID": "sha256:" + "c" * 64}]
+
+    def get_image(name):
+        if name not in images:
+            raise NotFound(name)
+        return SimpleNamespace(id=images[name])
+
+    queries = []
+
+    def containers(all, filters):
+        queries.append(filters)
+        return [r for r in rows if r["ImageID"] in (BASE_IMAGE_ID, DERIVED_IMAGE_ID)] # the ancestor filter includes descendants
+
+    client = SimpleNamespace(images=SimpleNamespace(get=get_image), api=SimpleNamespace(containers=containers))
+    monkeypatch.setattr(DockerClient, "client", property(lambda self: client))
+    docker_client = DockerClient(None)
+    assert docker_client.is_image_in_use("tableau_bridge:base") == ["bridge_a", "bridge_c"]
+    assert docker_client.is_image_in_use("tableau_bridge:derived") == ["bridge_b"]
+    assert docker_client.is_image_in_use("missing") == []
+    assert queries == [{"ancestor": BASE_IMAGE_ID}, {"ancestor": DERIVED_IMAGE_ID}] # filtered by the daemon
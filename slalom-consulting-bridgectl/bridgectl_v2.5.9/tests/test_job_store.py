@@ -0,0 +1,130 @@
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from src.cache_dto import JobStatus
+from src.cli.bridge_status_logic import BridgeStatusLogic
+from src.lib.job_store import JobStore, JobSyncState
+from src.task.background_task import BG_LOGGER
+
+SITE = "site1"
+NOW = datetime.now(timezone.utc)
+
+
+def make_job(i: int, status: str = JobStatus.completed) -> dict:
+    requested = (NOW - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {"jobId": f"job{i}", "jobRequestedTime": requested, "status": status, "taskType": "Extract",
+            "jobDescription": f"Bridge Client: agent{i % 3}\ndatasource: ds{i % 5}", "currentRunTime": "10"}
+
+
+class FakeJobsApi:
+    """ the getBackgroundJobs list, newest first """
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.reads = 0
+        self.id_lookups = []
+
+    def add_new_jobs(self, count: int):
+        start = min(int(j["jobId"][3:]) for j in self.jobs) if self.jobs else 0
+        self.jobs = [make_job(start - count + i) for i in range(count)] + self.jobs
+
+    def iter_jobs(self, site_id, page_size, start_index=0):
+        for job in self.jobs[start_index:]:
+            self.reads += 1
+            yield job
+
+    def get_jobs_by_ids(self, site_id, job_ids):
+        self.id_lookups.append(list(job_ids))
+        return [j for j in self.jobs if j["jobId"] in job_ids]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / "jobs.db")
+
+
+def sync(api, store, max_items=1000) -> int:
+    return BridgeStatusLogic(BG_LOGGER).sync_jobs(api, SITE, store, max_items)
+
+
+def stored_ids(store) -> set:
+    return {j["jobId"] for j in store.get_latest_jobs(SITE, 100000)}
+
+
+def test_upsert_parses_and_replaces(store):
+    job = make_job(1, JobStatus.in_progress)
+    BridgeStatusLogic(BG_LOGGER).add_bridge_agent_and_dsn({"result": {"backgroundJobs": [job]}})
+    store.upsert_jobs(SITE, [job])
+    store.upsert_jobs(SITE, [{**job, "status": JobStatus.failed}])
+    rows = store.query_jobs(SITE, 1)
+    assert len(rows) == 1
+    assert rows[0]["status"] == JobStatus.failed
+    assert rows[0]["bridge_agent"] == "agent1"
+    assert rows[0]["data_source_name"] == "ds1"
+    assert rows[0]["run_time_sec"] == 10
+
+
+def test_sync_state_round_trip(store):
+    assert store.get_sync_state(SITE) == JobSyncState()
+    store.save_sync_state(SITE, JobSyncState("2026-01-01T00:00:00Z", "2026-01-02T00:00:00Z", 42))
+    assert store.get_sync_state(SITE) == JobSyncState("2026-01-01T00:00:00Z", "2026-01-02T00:00:00Z", 42)
+    assert store.get_sync_state("other") == JobSyncState()
+
+
+def test_running_job_ids_are_recent_and_not_terminal(store):
+    old = {**make_job(0, JobStatus.pending), "jobId": "old", "jobRequestedTime": "2020-01-01T00:00:00Z"}
+    store.upsert_jobs(SITE, [make_job(1, JobStatus.pending), make_job(2, JobStatus.in_progress), make_job(3), old])
+    assert sorted(store.get_running_job_ids(SITE)) == ["job1", "job2"]
+
+
+def test_incremental_sync_reads_only_new_jobs(store):
+    api = FakeJobsApi([make_job(i) for i in range(100, 200)])
+    assert sync(api, store) == 100
+    api.reads = 0
+    api.add_new_jobs(5)
+    assert sync(api, store) == 6 # the 5 new jobs and the newest stored one, read to find the watermark
+    assert api.reads == 7
+    assert len(stored_ids(store)) == 105
+
+
+def test_running_jobs_are_refetched_by_id_without_moving_the_watermark(store):
+    api = FakeJobsApi([make_job(i) for i in range(100, 200)])
+    api.jobs[50]["status"] = JobStatus.in_progress
+    sync(api, store)
+    watermark = store.get_sync_state(SITE).watermark
+    api.jobs[50] = {**api.jobs[50], "status": JobStatus.completed}
+    api.reads = 0
+
+    sync(api, store)
+
+    assert api.reads == 2 # only down to the watermark, not back to the running job
+    assert api.id_lookups == [["job150"]]
+    assert store.get_sync_state(SITE).watermark == watermark
+    assert store.get_running_job_ids(SITE) == []
+
+
+def test_capped_sync_continues_without_gaps(store):
+    api = FakeJobsApi([make_job(i) for i in range(1000, 1050)])
+    sync(api, store)
+    watermark = store.get_sync_state(SITE).watermark
+    api.add_new_jobs(250)
+
+    sync(api, store, max_items=100)
+    state = store.get_sync_state(SITE)
+    assert state.watermark == watermark # not moved past the jobs that were not fetched yet
+    assert state.pending_watermark == api.jobs[0]["jobRequestedTime"]
+
+    api.add_new_jobs(10)
+    sync(api, store, max_items=100)
+    sync(api, store, max_items=1000)
+
+    assert stored_ids(store) == {j["jobId"] for j in api.jobs}
+    state = store.get_sync_state(SITE)
+    assert state == JobSyncState(api.jobs[0]["jobRequestedTime"])
+
+
+def test_first_sync_is_complete_at_the_cap(store):
+    api = FakeJobsApi([make_job(i) for i in range(100, 200)])
+    sync(api, store, max_items=30)
+    assert len(stored_ids(store)) == 30
+    assert store.get_sync_state(SITE) == JobSyncState(api.jobs[0]["jobRequestedTime"])
@@ -0,0 +1,155 @@
+import gzip
+import os
+import time
+
+import pytest
+
+from src.bridge_logs import BridgeLogFile
+from src.lib.general_helper import FileHelper
+from src.lib.log_archive import LogArchive, LOG_ARCHIVE_MANIFEST
+
+
+class ListLogger:
+    def __init__(self):
+        self.messages = []
+
+    def info(self, msg=""):
+        self.messages.append(msg)
+
+    def warning(self, msg):
+        self.messages.append(msg)
+
+    def error(self, msg, ex=None):
+        self.messages.append(msg)
+
+
+def write_log(folder, name, content: bytes, age_days: float = 0):
+    path = folder / name
+    path.write_bytes(content)
+    mod_time = time.time() - age_days * 24 * 3600
+    os.utime(path, (mod_time, mod_time))
+    return BridgeLogFile(str(path))
+
+
+def archive(log_archive: LogArchive, folder, files):
+    count, archive_path = log_archive.archive_files(ListLogger(), str(folder), files)
+    log_archive._executor.shutdown(wait=True)
+    log_archive._executor = None
+    return count, archive_path
+
+
+@pytest.fixture
+def logger():
+    return ListLogger()
+
+
+def test_archive_compresses_and_keeps_mod_time(tmp_path, logger):
+    content = b'{"ts":"2024-01-01","k":"msg","v":"hello"}\n' * 1000
+    f = write_log(tmp_path, "stdout_1.log", content, age_days=1)
+    log_archive = LogArchive(logger)
+    count, archive_path = archive(log_archive, tmp_path, [f])
+    assert count == 1
+    assert not os.path.exists(f.full_path)
+    [entry] = log_archive.list_archived(str(tmp_path))
+    assert entry.archive_name == "stdout_1.log.gz" and entry.prefix == "stdout" and entry.size == len(content)
+    assert entry.compressed_size < entry.size
+    gz_path = os.path.join(archive_path, entry.archive_name)
+    assert abs(os.path.getmtime(gz_path) - f.mod_time) < 1
+    with FileHelper.open_log(gz_path) as r:
+        assert r.read() == content
+    assert logger.messages == []
+
+
+def test_archive_name_is_unique(tmp_path, logger):
+    log_archive = LogArchive(logger)
+    archive(log_archive, tmp_path, [write_log(tmp_path, "stdout_1.log", b"first\n")])
+    archive(log_archive, tmp_path, [write_log(tmp_path, "stdout_1.log", b"second\n")])
+    names = sorted(e.archive_name for e in log_archive.list_archived(str(tmp_path)))
+    assert names == ["stdout_1.log.1.gz", "stdout_1.log.gz"]
+
+
+def test_retention_per_prefix_group(tmp_path, logger):
+    log_archive = LogArchive(logger, max_group_bytes=2500, max_age_days=30, workers=1)
+    files = [write_log(tmp_path, f"stdout_{i}.log", os.urandom(1000), age_days=3 - i) for i in range(3)] # not compressible
+    files.append(write_log(tmp_path, "jprotocolserver_1.log", os.urandom(1000), age_days=5))
+    archive(log_archive, tmp_path, files[:2] + files[3:])
+    archive(log_archive, tmp_path, files[2:3])
+    names = sorted(e.name for e in log_archive.list_archived(str(tmp_path)))
+    assert names == ["jprotocolserver_1.log", "stdout_1.log", "stdout_2.log"] # the oldest is over the size budget
+    archive_path = log_archive.get_archive_path(str(tmp_path))
+    assert sorted(os.listdir(archive_path)) == sorted([LOG_ARCHIVE_MANIFEST, "jprotocolserver_1.log.gz", "stdout_1.log.gz", "stdout_2.log.gz"])
+
+
+def test_batch_over_budget_is_kept_until_the_next_batch(tmp_path, logger):
+    log_archive = LogArchive(logger, max_group_bytes=10)
+    archive(log_archive, tmp_path, [write_log(tmp_path, f"stdout_{i}.log", os.urandom(1000), age_days=i) for i in range(3)])
+    assert len(log_archive.list_archived(str(tmp_path))) == 3
+    archive(log_archive, tmp_path, [write_log(tmp_path, "stdout_new.log", os.urandom(1000))])
+    assert [e.name for e in log_archive.list_archived(str(tmp_path))] == ["stdout_new.log"]
+
+
+def test_manifest_is_loaded_and_written_once_per_batch(tmp_path, logger, monkeypatch):
+    calls = {"load": 0, "save": 0}
+    load, save = LogArchive._load_manifest, LogArchive._save_manifest
+
+    def counting_load(self, archive_path):
+        calls["load"] += 1
+        return load(self, archive_path)
+
+    def counting_save(archive_path, manifest):
+        calls["save"] += 1
+        save(archive_path, manifest)
+
+    monkeypatch.setattr(LogArchive, "_load_manifest", counting_load)
+    monkeypatch.setattr(LogArchive, "_save_manifest", staticmethod(counting_save))
+    log_archive = LogArchive(logger)
+    (tmp_path / "sub").mkdir()
+    files = [write_log(tmp_path, f"stdout_{i}.log", b"line\n") for i in range(200)]
+    files.append(write_log(tmp_path / "sub", "stdout_0.log", b"same name\n")) # compressed at the same time as stdout_0.log
+    archive(log_archive, tmp_path, files)
+    assert calls == {"load": 1, "save": 1}
+    names = [e.archive_name for e in log_archive.list_archived(str(tmp_path))]
+    assert len(names) == 201 and "stdout_0.log.1.gz" in names
+
+
+def test_old_log_is_kept_when_archived(tmp_path, logger):
+    log_archive = LogArchive(logger, max_group_bytes=10, max_age_days=90)
+    archive(log_archive, tmp_path, [write_log(tmp_path, "TabBridgeClientJob_1.log", os.urandom(1000), age_days=100)])
+    assert [e.name for e in log_archive.list_archived(str(tmp_path))] == ["TabBridgeClientJob_1.log"]
+
+
+def test_age_budget_counts_from_archived_time(tmp_path, logger):
+    log_archive = LogArchive(logger, max_age_days=30)
+    archive(log_archive, tmp_path, [write_log(tmp_path, "stdout_1.log", b"old\n", age_days=100),
+                                    write_log(tmp_path, "stdout_2.log", b"new\n", age_days=100)])
+    archive_path = log_archive.get_archive_path(str(tmp_path))
+    manifest = log_archive._load_manifest(archive_path)
+    manifest["stdout_1.log.gz"].archived_time = time.time() - 31 * 24 * 3600
+    log_archive._save_manifest(archive_path, manifest)
+    assert log_archive.enforce_retention(str(tmp_path)) == 1
+    assert [e.name for e in log_archive.list_archived(str(tmp_path))] == ["stdout_2.log"]
+    assert not os.path.exists(os.path.join(archive_path, "stdout_1.log.gz"))
+
+
+def test_manifest_picks_up_files_not_in_it(tmp_path, logger):
+    log_archive = LogArchive(logger)
+    archive_path = tmp_path / "archive_logs"
+    archive_path.mkdir()
+    write_log(archive_path, "stdout_old.log", b"moved there by an earlier version\n", age_days=2) # uncompressed
+    with gzip.open(archive_path / "stdout_copied.log.gz", "wb") as f:
+        f.write(b"copied in\n")
+    (archive_path / "stdout_partial.log.gz.part").write_bytes(b"") # interrupted archive
+    entries = {e.archive_name: e for e in log_archive.list_archived(str(tmp_path))}
+    assert sorted(entries) == ["stdout_copied.log.gz", "stdout_old.log"]
+    assert entries["stdout_copied.log.gz"].name == "stdout_copied.log"
+    assert entries["stdout_old.log"].prefix == "stdout"
+    os.remove(archive_path / "stdout_old.log") # deleted outside of the archive
+    assert [e.archive_name for e in log_archive.list_archived(str(tmp_path))] == ["stdout_copied.log.gz"]
+
+
+def test_archive_failure_goes_to_logger(tmp_path, logger):
+    log_archive = LogArchive(logger)
+    missing = BridgeLogFile(str(tmp_path / "stdout_gone.log"), time.time(), 0)
+    archive(log_archive, tmp_path, [missing])
+    assert log_archive.pending_count() == 0
+    assert len(logger.messages) == 1 and "stdout_gone.log" in logger.messages[0]
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from src.task import log_follow_task
+from src.task.log_follow_task import LogFollowTask
+
+
+class QuietStream:
+    """ a followed stream that sends nothing and blocks until it is closed, like a socket read """
+    def __init__(self, chunks=()):
+        self.chunks = list(chunks)
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        yield from self.chunks
+        self.closed.wait()
+        raise OSError("connection closed")
+
+    def close(self):
+        self.closed.set()
+
+
+@pytest.fixture(autouse=True)
+def short_timeouts(monkeypatch):
+    monkeypatch.setattr(log_follow_task, "LOG_FOLLOW_IDLE_TIMEOUT_SECONDS", 0.3)
+    monkeypatch.setattr(log_follow_task, "LOG_FOLLOW_IDLE_CHECK_SECONDS", 0.05)
+
+
+def test_idle_follower_closes_quiet_stream():
+    stream = QuietStream()
+    follower = LogFollowTask(("docker", "bridge_a", "stdout"), lambda: stream)
+    follower.start()
+    assert stream.closed.wait(5), "the idle follower did not close its stream"
+    follower._thread.join(5)
+    assert not follower.is_running()
+    assert follower.error is None
+
+
+def test_polled_follower_keeps_running():
+    stream = QuietStream([b'{"k":"a"}\n{"k":"b"}\n'])
+    follower = LogFollowTask(("docker", "bridge_a", "stdout"), lambda: stream)
+    follower.start()
+    for _ in range(10):
+        follower.poll()
+        assert not stream.closed.wait(0.1)
+    assert [r["k"] for r in follower.records] == ["a", "b"]
+    follower.stop()
+    follower._thread.join(5)
+    assert not follower.is_running()
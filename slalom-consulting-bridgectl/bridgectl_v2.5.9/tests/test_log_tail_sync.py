@@ -0,0 +1,152 @@
+import io
+import tarfile
+from types import SimpleNamespace
+
+import pytest
+
+from src.docker_client import DockerClient, TempLogsSettings, ContainerLabels
+from src.lib.log_tail_sync import LogTailSync, LogSyncState, RemoteFileStat
+from src.task.background_task import BG_LOGGER
+
+LOGS_PATH = "/home/tableau/Documents/My_Tableau_Bridge_Repository/Logs"
+LOG_NAME = "bridge.log"
+
+
+def test_parse_stat_output():
+    assert RemoteFileStat.parse("123 456\n") == RemoteFileStat(123, 456)
+    with pytest.raises(ValueError, match="unexpected stat output: stat: cannot stat"):
+        RemoteFileStat.parse("stat: cannot stat 'x': No such file or directory")
+
+
+def test_append_truncates_on_failure(tmp_path):
+    local = tmp_path / LOG_NAME
+    local.write_bytes(b"line1\n")
+    state = LogSyncState("c", 1, 6)
+
+    def failing_chunks():
+        yield b"tail: error text\n"
+        raise Exception("tail exit code 1")
+
+    with pytest.raises(Exception, match="exit code 1"):
+        LogTailSync.append(local, failing_chunks(), state)
+    assert local.read_bytes() == b"line1\n"
+    assert state.offset == 6
+    assert LogTailSync.append(local, [b"line2\n"], state) == 6
+    assert local.read_bytes() == b"line1\nline2\n"
+    assert LogTailSync.load_state(local).offset == 12
+
+
+class FakeContainer:
+    id = "c1"
+    labels = {ContainerLabels.tableau_bridge_logs_path: LOGS_PATH}
+
+    def __init__(self, content: bytes = None, inode: int = 7):
+        self.content = content # None when the file doesn't exist
+        self.inode = inode
+        self.tail_exit_code = 0
+
+    def exec_run(self, cmd, stderr=True):
+        if self.content is None:
+            return 1, b""
+        return 0, f"{self.inode} {len(self.content)}\n".encode()
+
+    def get_archive(self, path):
+        if self.content is None:
+            raise Exception(f"Could not find the file {path} in container")
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            info = tarfile.TarInfo(LOG_NAME)
+            info.size = len(self.content)
+            tar.addfile(info, io.BytesIO(self.content))
+        return [buf.getvalue()], {}
+
+
+class FakeApi:
+    def __init__(self, container: FakeContainer):
+        self.container = container
+        self.commands = {}
+
+    def exec_create(self, container_id, cmd, stdout, stderr):
+        self.commands["e1"] = cmd
+        return {"Id": "e1"}
+
+    def exec_start(self, exec_id, stream):
+        if self.container.tail_exit_code:
+            yield b"tail: cannot open file\n"
+            return
+        offset = int(self.commands[exec_id][2][1:]) - 1
+        yield self.container.content[offset:]
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": self.container.tail_exit_code}
+
+
+@pytest.fixture
+def container(tmp_path, monkeypatch):
+    c = FakeContainer(b"line1\n")
+    client = SimpleNamespace(containers=SimpleNamespace(get=lambda name: c), api=FakeApi(c))
+    monkeypatch.setattr(DockerClient, "client", property(lambda self: client))
+    monkeypatch.setattr(TempLogsSettings, "temp_bridge_logs_path", tmp_path)
+    return c
+
+
+def sync() -> bytes:
+    with open(DockerClient(BG_LOGGER).sync_single_file_to_disk("bridge_x", LOG_NAME), "rb") as f:
+        return f.read()
+
+
+def test_docker_sync_appends_new_bytes(container):
+    assert sync() == b"line1\n"
+    container.content += b"line2\n"
+    assert sync() == b"line1\nline2\n"
+
+
+def test_docker_sync_failed_tail_downloads_whole_file(container):
+    sync()
+    container.content += b"line2\n"
+    container.tail_exit_code = 1
+    assert sync() == b"line1\nline2\n" # not the tail error message
+
+
+def test_docker_sync_rotated_log_downloads_whole_file(container):
+    sync()
+    container.content, container.inode = b"new1\n", 8
+    assert sync() == b"new1\n"
+
+
+def test_docker_sync_missing_file_raises(container):
+    sync()
+    container.content = None
+    with pytest.raises(Exception, match=f"unable to download log file {LOGS_PATH}/{LOG_NAME}"):
+        sync()
+
+
+class FakeWsResponse:
+    """ a finished pod exec, as returned by kubernetes.stream with _preload_content=False """
+    def __init__(self, stdout: bytes, returncode):
+        self.stdout = stdout
+        self._returncode = returncode
+
+    def is_open(self):
+        return False
+
+    def read_stdout(self):
+        out, self.stdout = self.stdout, b""
+        return out
+
+    def read_stderr(self):
+        return b""
+
+    @property
+    def returncode(self):
+        if self._returncode is None:
+            raise TypeError("'NoneType' object is not subscriptable") # no status on the error channel
+        return self._returncode
+
+
+def test_k8s_exec_output_is_checked():
+    from src.k8s_client import K8sClient
+    assert list(K8sClient._iter_exec_stdout_checked(FakeWsResponse(b"data", 0))) == [b"data"]
+    for returncode in (1, None):
+        with pytest.raises(Exception, match=f"exit code {returncode}"):
+            list(K8sClient._iter_exec_stdout_checked(FakeWsResponse(b"tail: error", returncode)))
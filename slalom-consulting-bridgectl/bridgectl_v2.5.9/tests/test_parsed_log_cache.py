@@ -0,0 +1,99 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.bridge_logs import BridgeLogs
+from src.lib import parsed_log_cache
+from src.lib.parsed_log_cache import ParsedLogCache
+
+SEVERITIES = ["info", "warn", "error", "debug"]
+
+
+def write_log(path, start: int, count: int, mode: str = "w"):
+    with open(path, mode) as f:
+        for i in range(start, start + count):
+            record = {"ts": f"2026-10-18T10:{i // 60 % 60:02d}:{i % 60:02d}.000", "k": f"key{i % 7}", "sev": SEVERITIES[i % 4],
+                      "v": f"value {i} Connection Refused" if i % 11 == 0 else {"n": i, "text": f"value {i}"}}
+            if i % 13 == 0:
+                record["e"] = f"timeout after {i} ms"
+            f.write(json.dumps(record) + "\n")
+
+
+def reference(path, severity=None, keys=None, search_text=None) -> pd.DataFrame:
+    """ the pandas filters the Logs page used before the parsed snapshots """
+    df = pd.read_json(path, lines=True, dtype=False)
+    df["v"] = df["v"].map(lambda x: x if isinstance(x, str) else json.dumps(x))
+    if severity:
+        df = df[df["sev"].str.contains(severity, case=False, na=False)]
+    if keys:
+        df = df[df["k"].isin(keys)]
+    if search_text:
+        df = df[df["v"].astype(str).str.contains(search_text, case=False, na=False) |
+                df["e"].str.contains(search_text, case=False, na=False)]
+    return df
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(parsed_log_cache, "PARSED_LOG_BATCH_LINES", 500)
+    monkeypatch.setattr(parsed_log_cache, "PARSED_LOG_MAX_PARTS", 3)
+    cache = ParsedLogCache(tmp_path / "parsed")
+    monkeypatch.setattr(parsed_log_cache, "PARSED_LOG_CACHE", cache)
+    return cache
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"severity": "err"},
+    {"keys": ["key1", "key3"]},
+    {"search_text": "refused|timeout"},
+    {"search_text": "VALUE 4.?2"},
+    {"severity": "warn", "search_text": "value"},
+])
+def test_scan_matches_pandas_filters(tmp_path, cache, filters):
+    log = tmp_path / "bridge.log"
+    write_log(log, 0, 3000)
+    expected = reference(log, **filters)
+
+    scan = BridgeLogs.scan_json_log(str(log), window_rows=700, **filters)
+
+    assert scan.total_rows == 3000
+    assert scan.matched_rows == len(expected)
+    assert len(scan.df) == min(700, len(expected))
+    assert scan.df["v"].tolist() == expected["v"].tail(700).tolist()
+    assert scan.severities == set(SEVERITIES)
+    assert scan.keys == {f"key{i}" for i in range(7)}
+
+
+def test_invalid_expression_is_matched_literally(tmp_path, cache):
+    log = tmp_path / "bridge.log"
+    write_log(log, 0, 100)
+    with open(log, "a") as f:
+        f.write(json.dumps({"k": "x", "sev": "info", "v": "open (paren"}) + "\n")
+    scan = BridgeLogs.scan_json_log(str(log), search_text="(paren")
+    assert scan.df["v"].tolist() == ["open (paren"]
+
+
+def test_appended_lines_are_parsed_and_parts_compacted(tmp_path, cache):
+    log = tmp_path / "bridge.log"
+    write_log(log, 0, 1200)
+    BridgeLogs.scan_json_log(str(log))
+    for start in range(1200, 1500, 50): # small appends, each a new part
+        write_log(log, start, 50, "a")
+        BridgeLogs.scan_json_log(str(log))
+
+    with cache.open_snapshot(str(log)) as snapshot:
+        assert snapshot.state.parts <= 3
+        assert snapshot.state.rows == 1500
+        assert all(rows <= 500 for rows, _ in snapshot.iter_row_groups())
+    scan = BridgeLogs.scan_json_log(str(log), search_text="refused")
+    assert scan.matched_rows == len(reference(log, search_text="refused"))
+
+
+def test_insights_read_from_snapshot(tmp_path, cache):
+    log = tmp_path / "bridge.log"
+    write_log(log, 0, 1200)
+    insights = cache.get_insights(str(log))
+    assert insights.total_rows == 1200
+    assert insights.error_rows == 300
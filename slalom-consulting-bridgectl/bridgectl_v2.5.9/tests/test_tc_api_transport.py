@@ -0,0 +1,57 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.lib.tc_api_transport import TCApiTransport
+
+
+class _UnavailableHandler(BaseHTTPRequestHandler):
+    calls = []
+
+    def _reply(self):
+        self.calls.append(self.command)
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    _UnavailableHandler.calls = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _UnavailableHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport():
+    t = TCApiTransport(max_retries=2, backoff_factor=0)
+    yield t
+    t.close()
+
+
+def test_post_is_sent_once(server_url, transport):
+    r = transport.post(f"{server_url}/vizportal/api/web/v1/runExtractTasks", json={})
+    assert r.status_code == 503
+    assert _UnavailableHandler.calls == ["POST"]
+
+
+def test_idempotent_post_is_retried(server_url, transport):
+    r = transport.post(f"{server_url}/vizportal/api/web/v1/getBackgroundJobs", json={}, idempotent=True)
+    assert r.status_code == 503
+    assert _UnavailableHandler.calls == ["POST"] * 3
+
+
+def test_get_is_retried(server_url, transport):
+    transport.get(f"{server_url}/api/3.24/sites/x/jobs")
+    assert _UnavailableHandler.calls == ["GET"] * 3